@@ -1,4 +1,5 @@
 from reversion.views import create_revision
+from project.resolver import permission_resolvers
 
 
 class RevisionMiddleware:
@@ -15,3 +16,15 @@ class RevisionMiddleware:
         if request.path in self.skip_paths:
             return self.original_get_response(request)
         return self.get_response(request)
+
+
+class PermissionResolverMiddleware:
+    """
+    Load project memberships of each user only once per request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with permission_resolvers():
+            return self.get_response(request)
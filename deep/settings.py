@@ -94,6 +94,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'deep.middleware.RevisionMiddleware',
+    'deep.middleware.PermissionResolverMiddleware',
 ]
 
 ROOT_URLCONF = 'deep.urls'
@@ -253,6 +254,11 @@ CELERY_BROKER_URL = CELERY_REDIS_URL
 CELERY_RESULT_BACKEND = CELERY_REDIS_URL
 CELERY_TIMEZONE = TIME_ZONE
 
+# Exports of more entries than this are sent to a separate queue
+# so that they don't hold up the small ones
+EXPORT_LARGE_ENTRIES_THRESHOLD = 5000
+EXPORT_LARGE_QUEUE = 'export_large'
+
 # REDIS STORE CONFIG "redis://:{password}@{host}:{port}/{db}"
 CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL', 'redis://redis:6379')
 
@@ -421,6 +427,38 @@ MAX_FILE_CACHE_AGE = GALLERY_FILE_EXPIRE - (60 * 60)
 # Lead website fetch timeout
 LEAD_WEBSITE_FETCH_TIMEOUT = 15
 
+# Maximum concurrent libreoffice conversions of report exports, shared by
+# all workers
+REPORT_PDF_CONVERSION_WORKERS = 2
+# Report pdf conversion timeout in seconds
+REPORT_PDF_CONVERSION_TIMEOUT = 10 * 60
+
+# Lead extraction: timeout in seconds of each download,
+# size limits in bytes and concurrent downloads per worker
+EXTRACTOR_REQUEST_TIMEOUT = 30
+EXTRACTOR_MAX_DOCUMENT_SIZE = 100 * 1024 * 1024
+EXTRACTOR_MAX_IMAGE_SIZE = 10 * 1024 * 1024
+EXTRACTOR_MAX_IMAGES = 50
+EXTRACTOR_FETCH_WORKERS = 8
+# Pdf extraction: max pages, time budget in seconds and
+# processes to extract page ranges in parallel
+EXTRACTOR_PDF_MAX_PAGES = 1000
+EXTRACTOR_PDF_TIMEOUT = 10 * 60
+EXTRACTOR_PDF_PROCESSES = 1
+
+# Max zoom level of geo area vector tiles
+GEO_TILE_MAX_ZOOM = 22
+
+# Seconds to cache project memberships of users in redis, 0 to disable
+PROJECT_PERMISSION_CACHE_TIMEOUT = 0 if TESTING else 10 * 60
+
+# Seconds to cache users of access tokens in redis, 0 to disable
+JWT_USER_CACHE_TIMEOUT = 0 if TESTING else 60
+
+# Project memberships are reconciled in a background task when more than
+# these many user-project pairs can change
+PROJECT_MEMBERSHIP_ASYNC_THRESHOLD = 500
+
 # Max login attempts to allow before using captcha
 MAX_LOGIN_ATTEMPTS_FOR_CAPTCHA = 3
 # Max login attempts to allow before preventing further logins
@@ -1,4 +1,6 @@
 import autofixture
+from contextlib import contextmanager
+from django.db import connection
 from rest_framework import (
     test,
     status,
@@ -61,6 +63,23 @@ class TestCase(test.APITestCase):
     def assert_403(self, response):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def assert_404(self, response):
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @contextmanager
+    def execute_on_commit(self):
+        """
+        Run the transaction.on_commit callbacks registered within this
+        context, which are otherwise never run in the transaction of
+        the test
+        """
+        start = len(connection.run_on_commit)
+        yield
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
+
     def create(self, model, **kwargs):
         if not kwargs.get('created_by'):
             kwargs['created_by'] = self.user
@@ -45,8 +45,10 @@ from geo.views import (
     RegionViewSet,
     GeoAreasLoadTriggerView,
     GeoJsonView,
+    GeoTileView,
     GeoBoundsView,
     GeoOptionsView,
+    GeoAreaSearchView,
 )
 from lead.views import (
     LeadGroupViewSet,
@@ -339,8 +341,14 @@ urlpatterns = [
         GeoJsonView.as_view()),
     url(get_api_path(r'admin-levels/(?P<admin_level_id>\d+)/geojson/bounds/$'),
         GeoBoundsView.as_view()),
+    url(get_api_path(
+        r'admin-levels/(?P<admin_level_id>\d+)/tiles/'
+        r'(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)/$'
+    ), GeoTileView.as_view()),
     url(get_api_path(r'geo-options/$'),
         GeoOptionsView.as_view()),
+    url(get_api_path(r'geo-areas/search/$'),
+        GeoAreaSearchView.as_view()),
 
     # Clone apis
     url(get_api_path(r'clone-region/(?P<region_id>\d+)/$'),
@@ -46,7 +46,10 @@ if [ "$EBS_ENV_TYPE" == "worker" ]; then
         # Start celery
         mkdir -p /var/log/celery/
         celery flower -A deep --basic_auth=${FLOWER_BASIC_AUTHS} --address=0.0.0.0 --port=80 &
-        celery -A deep worker --quiet -l info --logfile=/var/log/celery/celery.log
+        # Separate worker for large exports so that they don't hold up other tasks
+        celery -A deep worker --quiet -l info -Q export_large -c 1 -n export_large@%h \
+            --logfile=/var/log/celery/celery_export_large.log &
+        celery -A deep worker --quiet -l info -Q celery --logfile=/var/log/celery/celery.log
     elif [ "$WORKER_TYPE" == "channel" ]; then
         echo '>> Starting Django Channels'
         # Start channels
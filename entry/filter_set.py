@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields.jsonb import KeyTransform
 
 from analysis_framework.models import Filter
 from lead.models import Lead
@@ -85,9 +86,41 @@ def get_filtered_entries(user, queries):
         modified_at__gt = datetime.fromtimestamp(modified_at__gt * ONE_DAY)
         entries = entries.filter(modified_at__gte=modified_at__gt)
 
+    return filter_entries_by_index(entries, filters, queries)\
+        .order_by('-lead__created_by', 'lead')
+
+
+def _get_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_entries_by_index(entries, filters, queries):
+    """
+    Filter entries with all active analysis framework filters
+
+    All filter predicates are compiled against the entry's filter index
+    so that only a single join is needed whatever the number of filters.
+    """
+    annotations = {}
+    conditions = []
+    compiled_keys = set()
+
+    def _index_lookup(filter, field):
+        name = '_filter_index_{}_{}'.format(len(annotations), field)
+        annotations[name] = KeyTransform(
+            field, KeyTransform(filter.key, 'filter_index__data'),
+        )
+        return name
+
     for filter in filters:
         # For each filter, see if there is a query for that filter
-        # and then perform filtering based on that query.
+        # and then add the condition based on that query.
+        if (filter.key, filter.filter_type) in compiled_keys:
+            continue
+        compiled_keys.add((filter.key, filter.filter_type))
 
         query = queries.get(filter.key)
         query_lt = queries.get(
@@ -98,51 +131,69 @@ def get_filtered_entries(user, queries):
         )
 
         if filter.filter_type == Filter.NUMBER:
-            if query:
-                entries = entries.filter(
-                    filterdata__filter=filter,
-                    filterdata__number=query,
-                )
-            if query_lt:
-                entries = entries.filter(
-                    filterdata__filter=filter,
-                    filterdata__number__lte=query_lt,
-                )
-            if query_gt:
-                entries = entries.filter(
-                    filterdata__filter=filter,
-                    filterdata__number__gte=query_gt,
-                )
+            query = _get_number(query)
+            query_lt = _get_number(query_lt)
+            query_gt = _get_number(query_gt)
+
+            if query is not None or query_lt is not None or \
+                    query_gt is not None:
+                number = _index_lookup(filter, 'number')
+            if query is not None:
+                conditions.append(models.Q(**{number: query}))
+            if query_lt is not None:
+                conditions.append(models.Q(**{
+                    number + '__lte': query_lt,
+                }))
+            if query_gt is not None:
+                conditions.append(models.Q(**{
+                    number + '__gte': query_gt,
+                }))
 
         if filter.filter_type == Filter.INTERSECTS:
-            if query:
-                entries = entries.filter(
-                    filterdata__filter=filter,
-                    filterdata__from_number__lte=query,
-                    filterdata__to_number__gte=query,
-                )
-
-            if query_lt and query_gt:
-                q = models.Q(
-                    filterdata__from_number__lte=query_lt,
-                    filterdata__to_number__gte=query_lt,
-                ) | models.Q(
-                    filterdata__from_number__lte=query_gt,
-                    filterdata__to_number__gte=query_gt,
-                ) | models.Q(
-                    filterdata__from_number__gte=query_gt,
-                    filterdata__to_number__lte=query_lt,
-                )
-                entries = entries.filter(q, filterdata__filter=filter)
+            query = _get_number(query)
+            query_lt = _get_number(query_lt)
+            query_gt = _get_number(query_gt)
+
+            if query is not None or (
+                query_lt is not None and query_gt is not None
+            ):
+                from_number = _index_lookup(filter, 'from_number')
+                to_number = _index_lookup(filter, 'to_number')
+
+            if query is not None:
+                conditions.append(models.Q(**{
+                    from_number + '__lte': query,
+                    to_number + '__gte': query,
+                }))
+
+            if query_lt is not None and query_gt is not None:
+                conditions.append(models.Q(**{
+                    from_number + '__lte': query_lt,
+                    to_number + '__gte': query_lt,
+                }) | models.Q(**{
+                    from_number + '__lte': query_gt,
+                    to_number + '__gte': query_gt,
+                }) | models.Q(**{
+                    from_number + '__gte': query_gt,
+                    to_number + '__lte': query_lt,
+                }))
 
         if filter.filter_type == Filter.LIST and query:
             if not isinstance(query, list):
                 query = query.split(',')
 
-            if len(query) > 0:
-                entries = entries.filter(
-                    filterdata__filter=filter,
-                    filterdata__values__overlap=query,
-                )
-
-    return entries.order_by('-lead__created_by', 'lead')
+            # Overlap as a union of containments so that the GIN index
+            # on the filter index can be used
+            q = models.Q()
+            for value in query:
+                q |= models.Q(filter_index__data__contains={
+                    filter.key: {'values': [value]},
+                })
+            if q:
+                conditions.append(q)
+
+    if annotations:
+        entries = entries.annotate(**annotations)
+    if conditions:
+        entries = entries.filter(*conditions)
+    return entries
@@ -0,0 +1,126 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from entry.models import Entry
+from entry.tasks import (
+    clear_checkpoints,
+    update_entry_data,
+    _update_entry_data,
+)
+
+from multiprocessing import Pool
+import time
+
+
+def _init_worker():
+    # Forked processes must not share the parent's database connections
+    connections.close_all()
+
+
+def _process_partition(args):
+    project_id, analysis_framework_id, chunk_size = args
+    count, duration = _update_entry_data(
+        project_id, analysis_framework_id, chunk_size,
+    )
+    return project_id, analysis_framework_id, count, duration
+
+
+class Command(BaseCommand):
+    help = 'Rebuild filter and export data of entry attributes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            type=int,
+            nargs='*',
+            help='Only rebuild entries of these projects',
+        )
+        parser.add_argument(
+            '--analysis-framework',
+            type=int,
+            nargs='*',
+            help='Only rebuild entries of these analysis frameworks',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue from the checkpoints of an interrupted run',
+        )
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            help='Queue each partition as a celery task instead',
+        )
+
+    def get_partitions(self, projects, analysis_frameworks):
+        entries = Entry.objects.all()
+        if projects:
+            entries = entries.filter(project_id__in=projects)
+        if analysis_frameworks:
+            entries = entries.filter(
+                analysis_framework_id__in=analysis_frameworks,
+            )
+        return list(
+            entries.order_by('project_id', 'analysis_framework_id')
+            .values_list('project_id', 'analysis_framework_id')
+            .distinct()
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+
+        if not kwargs['resume']:
+            clear_checkpoints()
+
+        partitions = self.get_partitions(
+            kwargs['project'],
+            kwargs['analysis_framework'],
+        )
+        total = len(partitions)
+
+        if kwargs['celery']:
+            for project_id, analysis_framework_id in partitions:
+                update_entry_data.delay(
+                    project_id, analysis_framework_id, chunk_size,
+                )
+            print('Queued {} partitions'.format(total))
+            return
+
+        # Close connections before forking the workers
+        connections.close_all()
+
+        start = time.time()
+        count = 0
+        with Pool(kwargs['processes'], initializer=_init_worker) as pool:
+            results = pool.imap_unordered(_process_partition, [
+                (project_id, analysis_framework_id, chunk_size)
+                for project_id, analysis_framework_id in partitions
+            ])
+            for i, result in enumerate(results):
+                project_id, analysis_framework_id, p_count, duration = result
+                count += p_count
+                elapsed = time.time() - start
+                print(
+                    '{} out of {}: project {}, framework {}, '
+                    '{} attributes in {:.2f}s '
+                    '({:.0f} attributes/s overall)'.format(
+                        i + 1, total,
+                        project_id, analysis_framework_id,
+                        p_count, duration,
+                        count / elapsed if elapsed else 0,
+                    )
+                )
+
+        print('Updated {} attributes in {:.2f}s'.format(
+            count, time.time() - start,
+        ))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_filter_index(apps, schema_editor):
+    Entry = apps.get_model('entry', 'Entry')
+    FilterData = apps.get_model('entry', 'FilterData')
+    EntryFilterIndex = apps.get_model('entry', 'EntryFilterIndex')
+
+    # Same logic as entry.utils.get_filter_index_data
+    indexes = {}
+    filter_data_list = FilterData.objects.values_list(
+        'entry_id', 'filter__key',
+        'values', 'number', 'from_number', 'to_number',
+    ).iterator()
+    for entry_id, key, values, number, from_number, to_number in \
+            filter_data_list:
+        item = {
+            'values': values,
+            'number': number,
+            'from_number': from_number,
+            'to_number': to_number,
+        }
+        indexes.setdefault(entry_id, {})[key] = {
+            k: v for k, v in item.items() if v is not None
+        }
+
+    EntryFilterIndex.objects.bulk_create([
+        EntryFilterIndex(entry_id=entry_id, data=indexes.get(entry_id, {}))
+        for entry_id in Entry.objects.values_list('id', flat=True).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry', '0015_auto_20181031_0602'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryFilterIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict)),
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='filter_index', to='entry.Entry')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entryfilterindex',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['data'], name='entry_filter_index_data'),
+        ),
+        migrations.RunPython(
+            build_filter_index,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -1,9 +1,11 @@
 from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.dispatch import receiver
 
 from project.mixins import ProjectEntityMixin
+from project.models import ProjectStats
 from user_resource.models import UserResource
 from lead.models import Lead
 from analysis_framework.models import (
@@ -72,7 +74,14 @@ class Attribute(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         from .utils import update_entry_attribute
+        from .widgets.utils import invalidate_export_cache
         update_entry_attribute(self)
+        invalidate_export_cache([self.entry_id])
+
+    def delete(self, *args, **kwargs):
+        from .widgets.utils import invalidate_export_cache
+        invalidate_export_cache([self.entry_id])
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
         return 'Attribute ({}, {})'.format(
@@ -142,6 +151,35 @@ class FilterData(models.Model):
         )
 
 
+class EntryFilterIndex(models.Model):
+    """
+    Denormalized filter data of an entry
+
+    Holds all filter data of an entry in a single document keyed by
+    filter key, so that entries can be filtered with all filters in
+    one pass instead of joining filter data once per filter:
+
+    {
+        "<filter key>": {
+            "values": [...],
+            "number": 1,
+            "from_number": 1,
+            "to_number": 2
+        }
+    }
+    """
+    entry = models.OneToOneField(Entry, related_name='filter_index')
+    data = JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['data'], name='entry_filter_index_data'),
+        ]
+
+    def __str__(self):
+        return 'Filter index ({})'.format(self.entry_id)
+
+
 class ExportData(models.Model):
     """
     Export data for an entry
@@ -181,3 +219,23 @@ def on_entry_saved(sender, **kwargs):
     # TODO After `project` is added to Entry
     # this should not use lead
     lead.project.update_status()
+    ProjectStats.bump(lead.project_id)
+
+
+@receiver(models.signals.post_delete, sender=Entry)
+def on_entry_deleted(sender, instance, **kwargs):
+    # The lead may be being deleted as well
+    ProjectStats.bump(instance.project_id)
+
+
+@receiver(models.signals.post_save, sender=FilterData)
+def on_filter_data_saved(sender, **kwargs):
+    from .utils import update_entry_filter_index
+    update_entry_filter_index(kwargs.get('instance').entry_id)
+
+
+@receiver(models.signals.post_delete, sender=FilterData)
+def on_filter_data_deleted(sender, **kwargs):
+    from .utils import update_entry_filter_index
+    # Don't create the index here: the entry itself may be being deleted
+    update_entry_filter_index(kwargs.get('instance').entry_id, create=False)
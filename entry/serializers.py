@@ -9,12 +9,14 @@ from project.serializers import ProjectEntitySerializer
 from lead.serializers import LeadSerializer
 from lead.models import Lead
 from analysis_framework.serializers import AnalysisFrameworkSerializer
-from geo.serializers import GeoOptionSerializer, SimpleRegionSerializer
+from geo.serializers import SimpleRegionSerializer
+from geo.utils import get_geo_options
 from .models import (
     Entry, Attribute, FilterData, ExportData
 )
 from project.models import Project
 from .utils import validate_image_for_entry
+from .widgets.utils import attribute_data_batch
 
 
 class AttributeSerializer(RemoveNullFieldsMixin,
@@ -111,7 +113,9 @@ class EntrySerializer(RemoveNullFieldsMixin,
                 request=self.context['request'],
             )
 
-        return super().create(validated_data)
+        # Filter and export data of all attributes are written in bulk
+        with attribute_data_batch():
+            return super().create(validated_data)
 
     def update(self, instance, validated_data):
         image = validated_data.get('image')
@@ -121,7 +125,8 @@ class EntrySerializer(RemoveNullFieldsMixin,
                 project=validated_data['lead'].project,
                 request=self.context['request'],
             )
-        entry = super().update(instance, validated_data)
+        with attribute_data_batch():
+            entry = super().update(instance, validated_data)
         return entry
 
 
@@ -146,8 +151,5 @@ class EditEntriesDataSerializer(RemoveNullFieldsMixin,
         # TODO Check if geo option is required based on analysis framework
         options = {}
         for region in lead.project.regions.all():
-            options[str(region.id)] = GeoOptionSerializer(
-                region.get_geo_areas(),
-                many=True,
-            ).data
+            options[str(region.id)] = get_geo_options(region)
         return options
@@ -0,0 +1,82 @@
+from celery import shared_task
+from redis_store import redis
+
+from entry.models import Attribute
+from entry.utils import update_attributes
+
+import time
+
+import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = 'update_entry_data_checkpoints'
+CHECKPOINT_DONE = 'done'
+
+
+def get_partition_key(project_id, analysis_framework_id):
+    return '{}-{}'.format(project_id, analysis_framework_id)
+
+
+def clear_checkpoints():
+    redis.get_connection().delete(CHECKPOINT_KEY)
+
+
+def get_checkpoint(project_id, analysis_framework_id):
+    checkpoint = redis.get_connection().hget(
+        CHECKPOINT_KEY,
+        get_partition_key(project_id, analysis_framework_id),
+    )
+    return checkpoint and checkpoint.decode('utf-8')
+
+
+def _update_entry_data(project_id, analysis_framework_id, chunk_size):
+    """
+    Rebuild filter and export data of all attributes of entries in given
+    project and analysis framework.
+
+    Progress is checkpointed in redis after each chunk so that the
+    rebuild can resume from the last processed entry.
+    """
+    client = redis.get_connection()
+    partition_key = get_partition_key(project_id, analysis_framework_id)
+
+    checkpoint = get_checkpoint(project_id, analysis_framework_id)
+    if checkpoint == CHECKPOINT_DONE:
+        return 0, 0
+
+    attributes = Attribute.objects.filter(
+        entry__project_id=project_id,
+        entry__analysis_framework_id=analysis_framework_id,
+    )
+    if checkpoint:
+        attributes = attributes.filter(entry_id__gt=int(checkpoint))
+
+    stats = {'count': 0}
+    start = time.time()
+
+    def _on_chunk(last_entry_id, count):
+        client.hset(CHECKPOINT_KEY, partition_key, last_entry_id)
+        stats['count'] += count
+
+    update_attributes(attributes, chunk_size=chunk_size, on_chunk=_on_chunk)
+    client.hset(CHECKPOINT_KEY, partition_key, CHECKPOINT_DONE)
+
+    return stats['count'], time.time() - start
+
+
+@shared_task
+def update_entry_data(project_id, analysis_framework_id, chunk_size=1000):
+    try:
+        count, duration = _update_entry_data(
+            project_id, analysis_framework_id, chunk_size,
+        )
+        logger.info(
+            'Updated %s attributes of project %s in %.2fs',
+            count, project_id, duration,
+        )
+        return True
+    except Exception:
+        logger.error(traceback.format_exc())
+        return False
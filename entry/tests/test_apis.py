@@ -8,9 +8,12 @@ from analysis_framework.models import (
 )
 from entry.models import (
     Entry,
+    EntryFilterIndex,
     Attribute,
     FilterData,
+    ExportData,
 )
+from entry.widgets.utils import attribute_data_batch, set_filter_data
 
 
 class EntryTests(TestCase):
@@ -241,6 +244,75 @@ class EntryTests(TestCase):
         attribute2 = attributes[str(widget2.pk)]
         self.assertEqual(attribute2['data']['e'], 'f')
 
+    def test_attribute_filter_and_export_data(self):
+        entry = self.create_entry()
+        widget = self.create(
+            Widget,
+            analysis_framework=entry.analysis_framework,
+            widget_id='numberWidget',
+            key='test_number',
+            title='Test Number',
+            properties={},
+        )
+
+        url = '/api/v1/entries/{}/'.format(entry.id)
+        data = {
+            'attributes': {
+                widget.pk: {
+                    'data': {'value': 500},
+                },
+            },
+        }
+
+        self.authenticate()
+        response = self.client.patch(url, data)
+        self.assert_200(response)
+
+        filter_data = FilterData.objects.get(entry=entry)
+        self.assertEqual(filter_data.number, 500)
+        export_data = ExportData.objects.get(entry=entry)
+        self.assertEqual(export_data.data['excel']['value'], '500')
+        self.filter_test('test_number=500')
+
+        data['attributes'][widget.pk]['data']['value'] = 600
+        response = self.client.patch(url, data)
+        self.assert_200(response)
+
+        filter_data = FilterData.objects.get(entry=entry)
+        self.assertEqual(filter_data.number, 600)
+        self.filter_test('test_number=500', 0)
+        self.filter_test('test_number=600')
+
+    def test_batch_filter_values(self):
+        entry = self.create_entry()
+        widget = self.create(
+            Widget,
+            analysis_framework=entry.analysis_framework,
+            key='test_list',
+        )
+        self.create(
+            Filter,
+            analysis_framework=entry.analysis_framework,
+            widget_key=widget.key,
+            key=widget.key,
+        )
+
+        # Values are stored and indexed as strings
+        with attribute_data_batch():
+            set_filter_data(entry, widget, values=[1, 2])
+        self.assertEqual(FilterData.objects.get(entry=entry).values,
+                         ['1', '2'])
+        index = EntryFilterIndex.objects.get(entry=entry)
+        self.assertEqual(index.data['test_list']['values'], ['1', '2'])
+
+        # and unchanged values are not rewritten
+        EntryFilterIndex.objects.filter(entry=entry).delete()
+        with attribute_data_batch():
+            set_filter_data(entry, widget, values=[1, 2])
+        self.assertFalse(
+            EntryFilterIndex.objects.filter(entry=entry).exists()
+        )
+
     def test_options(self):
         url = '/api/v1/entry-options/'
 
@@ -309,9 +381,106 @@ class EntryTests(TestCase):
         self.both_filter_test('test_list_filter=ghi,def', 1)
         self.both_filter_test('test_list_filter=uml,hij', 0)
 
+        filter = self.create(
+            Filter,
+            analysis_framework=entry.analysis_framework,
+            widget_key='test_intersects_filter',
+            key='test_intersects_filter',
+            title='Test Intersects Filter',
+            filter_type=Filter.INTERSECTS,
+        )
+        self.create(FilterData, entry=entry, filter=filter,
+                    from_number=100, to_number=200)
+
+        self.both_filter_test('test_intersects_filter=150')
+        self.both_filter_test('test_intersects_filter=250', 0)
+
+        # All filters together
+        self.filter_test(
+            'test_filter=500&test_list_filter=abc'
+            '&test_intersects_filter=150'
+        )
+        self.filter_test(
+            'test_filter=500&test_list_filter=abc'
+            '&test_intersects_filter=250',
+            0,
+        )
+
         entry.excerpt = 'hello'
         entry.save()
         self.post_filter_test({'search': 'el'}, 1)
         self.post_filter_test({'search': 'pollo'}, 0)
 
+    def test_pagination_by_lead(self):
+        project = self.create_project()
+        leads = [self.create(Lead, project=project) for i in range(3)]
+        for lead in leads:
+            for i in range(2):
+                self.create(
+                    Entry, lead=lead, project=project,
+                    analysis_framework=project.analysis_framework,
+                )
+
+        url = '/api/v1/entries/?project={}&limit=2'.format(project.id)
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']['leads']), 2)
+        self.assertEqual(len(response.data['results']['entries']), 4)
+        lead_ids = [lead['id'] for lead in response.data['results']['leads']]
+
+        response = self.client.get('{}&cursor={}'.format(
+            url, response.data['next_cursor'],
+        ))
+        self.assert_200(response)
+
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']['leads']), 1)
+        self.assertEqual(len(response.data['results']['entries']), 2)
+        self.assertNotIn(
+            response.data['results']['leads'][0]['id'], lead_ids,
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_pagination_by_lead_ordering(self):
+        project = self.create_project()
+        for title in ['b', 'a', 'c']:
+            lead = self.create(Lead, project=project, title=title)
+            self.create(
+                Entry, lead=lead, project=project,
+                analysis_framework=project.analysis_framework,
+            )
+
+        url = '/api/v1/entries/?project={}&limit=2&ordering=-title'.format(
+            project.id,
+        )
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertEqual(
+            [lead['title'] for lead in response.data['results']['leads']],
+            ['c', 'b'],
+        )
+
+        response = self.client.get('{}&cursor={}'.format(
+            url, response.data['next_cursor'],
+        ))
+        self.assert_200(response)
+        self.assertEqual(
+            [lead['title'] for lead in response.data['results']['leads']],
+            ['a'],
+        )
+
+        # Orderings the cursor can't follow are rejected
+        response = self.client.get(
+            '/api/v1/entries/?project={}&ordering=assignee'.format(
+                project.id,
+            )
+        )
+        self.assert_400(response)
+
     # TODO: test export data and filter data apis
@@ -0,0 +1,83 @@
+from django.core.management import call_command
+from django.test import override_settings
+
+from deep.tests import TestCase
+from project.models import Project
+from lead.models import Lead
+from analysis_framework.models import AnalysisFramework, Widget
+from entry.models import Entry, Attribute
+from entry.tasks import (
+    CHECKPOINT_DONE,
+    CHECKPOINT_KEY,
+    clear_checkpoints,
+    get_checkpoint,
+    get_partition_key,
+    _update_entry_data,
+)
+from redis_store import redis
+
+
+class UpdateEntryDataTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        clear_checkpoints()
+
+        analysis_framework = self.create(AnalysisFramework)
+        self.project = self.create(
+            Project, analysis_framework=analysis_framework,
+            role=self.admin_role,
+        )
+        lead = self.create(Lead, project=self.project)
+        widget = self.create(Widget, analysis_framework=analysis_framework)
+
+        self.entries = []
+        for _ in range(3):
+            entry = self.create(
+                Entry, lead=lead, project=self.project,
+                analysis_framework=analysis_framework,
+            )
+            self.create(
+                Attribute, entry=entry, widget=widget, data={'a': 'b'},
+            )
+            self.entries.append(entry)
+
+    def tearDown(self):
+        clear_checkpoints()
+        super().tearDown()
+
+    def test_update_entry_data(self):
+        af_id = self.project.analysis_framework_id
+
+        count, _ = _update_entry_data(self.project.id, af_id, 2)
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            get_checkpoint(self.project.id, af_id),
+            CHECKPOINT_DONE,
+        )
+
+        # Finished partitions are skipped when resuming
+        count, _ = _update_entry_data(self.project.id, af_id, 2)
+        self.assertEqual(count, 0)
+
+    def test_resume_from_checkpoint(self):
+        af_id = self.project.analysis_framework_id
+        redis.get_connection().hset(
+            CHECKPOINT_KEY,
+            get_partition_key(self.project.id, af_id),
+            self.entries[0].id,
+        )
+
+        count, _ = _update_entry_data(self.project.id, af_id, 1)
+        self.assertEqual(count, 2)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_command_celery(self):
+        af_id = self.project.analysis_framework_id
+        call_command(
+            'update_entry_data', '--celery',
+            '--project', str(self.project.id),
+        )
+        self.assertEqual(
+            get_checkpoint(self.project.id, af_id),
+            CHECKPOINT_DONE,
+        )
@@ -1,8 +1,9 @@
-from entry.models import Attribute
+from entry.models import Attribute, FilterData, EntryFilterIndex
 from gallery.models import File
 from django.urls import reverse
 from utils.image import decode_base64_if_possible
 from .widgets.store import widget_store
+from .widgets.utils import attribute_data_batch
 
 
 def update_entry_attribute(attribute):
@@ -19,11 +20,80 @@ def update_entry_attribute(attribute):
                                        data, widget_data or {})
 
 
-def update_attributes():
-    attributes = Attribute.objects.all()
+def update_entry_attributes(attributes):
+    """
+    Update filter and export data of many attributes writing them in bulk
+    """
+    with attribute_data_batch():
+        for attribute in attributes:
+            update_entry_attribute(attribute)
 
-    for attribute in attributes:
-        update_entry_attribute(attribute)
+
+def update_attributes(attributes=None, chunk_size=1000, on_chunk=None):
+    """
+    Update filter and export data of attributes in chunks
+
+    Chunks always contain all attributes of their entries. After each
+    chunk is written, `on_chunk(last_entry_id, attributes_count)` is
+    called, which can be used to record a checkpoint.
+    """
+    if attributes is None:
+        attributes = Attribute.objects.all()
+    # Data migrations call this against older schemas, where the related
+    # models can't be queried, and there's nothing to update anyway
+    if not attributes.exists():
+        return
+    attributes = attributes.select_related('entry', 'widget')\
+        .order_by('entry_id', 'id')
+
+    chunk = []
+
+    def _flush():
+        if not chunk:
+            return
+        update_entry_attributes(chunk)
+        if on_chunk:
+            on_chunk(chunk[-1].entry_id, len(chunk))
+        chunk.clear()
+
+    # iterator() uses a server side cursor in postgres
+    for attribute in attributes.iterator():
+        if len(chunk) >= chunk_size and \
+                chunk[-1].entry_id != attribute.entry_id:
+            _flush()
+        chunk.append(attribute)
+    _flush()
+
+
+def get_filter_index_data(filter_data_list):
+    """
+    Build the filter index document from (filter key, values, number,
+    from_number, to_number) tuples of an entry's filter data
+    """
+    data = {}
+    for key, values, number, from_number, to_number in filter_data_list:
+        item = {
+            'values': values,
+            'number': number,
+            'from_number': from_number,
+            'to_number': to_number,
+        }
+        data[key] = {k: v for k, v in item.items() if v is not None}
+    return data
+
+
+def update_entry_filter_index(entry_id, create=True):
+    data = get_filter_index_data(
+        FilterData.objects.filter(entry_id=entry_id).values_list(
+            'filter__key', 'values', 'number', 'from_number', 'to_number',
+        )
+    )
+
+    updated = EntryFilterIndex.objects.filter(
+        entry_id=entry_id,
+    ).update(data=data)
+    if not updated and create:
+        EntryFilterIndex.objects.create(entry_id=entry_id, data=data)
 
 
 def validate_image_for_entry(image, project, request):
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.db import models
 from rest_framework import (
+    exceptions,
     filters,
     generics,
     pagination,
@@ -9,6 +11,7 @@ from rest_framework import (
     views,
     viewsets,
 )
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from deep.permissions import ModifyPermission
 
 from project.models import Project
@@ -16,7 +19,7 @@ from lead.models import Lead
 from lead.serializers import SimpleLeadSerializer
 
 from .models import (
-    Attribute, FilterData, ExportData
+    Entry, Attribute, FilterData, ExportData
 )
 from .serializers import (
     EntrySerializer, AttributeSerializer,
@@ -25,11 +28,41 @@ from .serializers import (
 )
 from .filter_set import EntryFilterSet, get_filtered_entries
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from collections import OrderedDict
+import binascii
 import django_filters
+import json
+
+
+class SubqueryCount(models.Subquery):
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+
+    def __init__(self, queryset, **extra):
+        super().__init__(queryset, output_field=models.IntegerField(),
+                         **extra)
 
 
 class EntryPaginationByLead(pagination.LimitOffsetPagination):
+    """
+    Paginate entries by their leads
+
+    Leads of the page are selected in a subquery of the entries query,
+    which also counts all leads, so that leads and entries of a page are
+    fetched together.
+
+    Leads are ordered by the `ordering` query param, one of the
+    ORDERING_FIELDS of leads, optionally prefixed by `-`, and then by id.
+
+    Besides limit/offset, a `cursor` pointing just after the last lead
+    of the previous page can be used to fetch next pages without
+    scanning all previous leads.
+    """
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    ORDERING_FIELDS = ('created_at', 'published_on', 'title')
+    DEFAULT_ORDERING = '-created_at'
+
     def paginate_queryset(self, queryset, request, view=None):
         self.limit = int(request.query_params.get('limit', self.default_limit))
         self.leads = None
@@ -38,20 +71,134 @@ class EntryPaginationByLead(pagination.LimitOffsetPagination):
 
         self.request = request
         self.offset = int(request.query_params.get('offset', 0))
-
-        lead_ids = queryset.values_list('lead__id', flat=True).distinct()
-        self.count = lead_ids.count()
+        self.set_ordering(request.query_params.get(
+            self.ordering_query_param, self.DEFAULT_ORDERING,
+        ))
+        self.cursor = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+
+        all_leads = Lead.objects.filter(
+            id__in=queryset.order_by().values('lead_id'),
+        )
+        leads = all_leads.order_by(*self.get_ordering())
+        if self.cursor:
+            leads = leads.filter(self.get_after_query(*self.cursor))
+            self.offset = 0
+
+        entries = list(
+            queryset.filter(
+                lead_id__in=leads[self.offset:self.offset + self.limit]
+                .values('id'),
+            ).annotate(
+                leads_count=SubqueryCount(all_leads.values('id')),
+            ).order_by(
+                # Entries of each lead together, in the order of leads,
+                # so that the last lead ends the page for the cursor
+                *(self.get_ordering('lead__') + tuple(Entry._meta.ordering))
+            ).select_related('lead').prefetch_related('attribute_set')
+        )
+
+        if entries:
+            self.count = entries[0].leads_count
+        else:
+            self.count = all_leads.count()
 
         if self.count > self.limit and self.template is not None:
             self.display_page_controls = True
 
-        if self.count == 0 or self.offset > self.count:
-            return []
+        self.leads = list(OrderedDict(
+            (entry.lead_id, entry.lead) for entry in entries
+        ).values())
+        return entries
+
+    def set_ordering(self, ordering):
+        self.descending = ordering.startswith('-')
+        self.ordering_field = ordering.lstrip('-')
+        if self.ordering_field not in self.ORDERING_FIELDS:
+            raise exceptions.ValidationError({
+                self.ordering_query_param: 'Unsupported ordering: {}'.format(
+                    ordering,
+                ),
+            })
 
-        lead_ids = list(lead_ids[self.offset:self.offset + self.limit])
-        self.leads = Lead.objects.filter(pk__in=lead_ids).distinct()
+    def get_ordering(self, prefix=''):
+        direction = '-' if self.descending else ''
+        return (
+            direction + prefix + self.ordering_field,
+            direction + prefix + 'id',
+        )
+
+    def get_after_query(self, value, lead_id):
+        """
+        Query for leads after the lead with the given ordering field
+        value and id
+
+        Nulls are ordered last in ascending and first in descending
+        order, as by postgres.
+        """
+        field = self.ordering_field
+        lookup = 'lt' if self.descending else 'gt'
+        id_after = models.Q(**{'id__{}'.format(lookup): lead_id})
+        is_null = models.Q(**{'{}__isnull'.format(field): True})
+
+        if value is None:
+            after = is_null & id_after
+            if self.descending:
+                after |= ~is_null
+            return after
+
+        after = models.Q(**{field: value}) & id_after | models.Q(**{
+            '{}__{}'.format(field, lookup): value,
+        })
+        if not self.descending:
+            after |= is_null
+        return after
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, lead_id = json.loads(
+                urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            )
+            if value is not None:
+                value = Lead._meta.get_field(
+                    self.ordering_field,
+                ).to_python(value)
+            return (value, int(lead_id))
+        except (TypeError, ValueError, ValidationError, binascii.Error):
+            raise exceptions.NotFound('Invalid cursor')
+
+    def encode_cursor(self, lead):
+        value = getattr(lead, self.ordering_field)
+        if value is not None and not isinstance(value, str):
+            value = value.isoformat()
+        return urlsafe_b64encode(
+            json.dumps([value, lead.id]).encode('utf-8')
+        ).decode('ascii')
+
+    def get_next_cursor(self):
+        if not self.leads or len(self.leads) < self.limit:
+            return None
+        return self.encode_cursor(self.leads[-1])
 
-        return list(queryset.filter(lead__pk__in=lead_ids))
+    def get_next_link(self):
+        if not self.cursor:
+            return super().get_next_link()
+
+        next_cursor = self.get_next_cursor()
+        if not next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, next_cursor)
+
+    def get_previous_link(self):
+        # Cursors only go forward
+        if self.cursor:
+            return None
+        return super().get_previous_link()
 
     def get_paginated_response(self, data):
         if self.leads:
@@ -62,6 +209,7 @@ class EntryPaginationByLead(pagination.LimitOffsetPagination):
             ('count', self.count),
             ('next', self.get_next_link()),
             ('previous', self.get_previous_link()),
+            ('next_cursor', self.get_next_cursor()),
             ('results', {
                 'leads': leads,
                 'entries': data,
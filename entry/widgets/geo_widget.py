@@ -1,13 +1,23 @@
+from geo.models import GeoArea
+
 from .utils import set_filter_data, set_export_data
 
 
 def update_attribute(entry, widget, data, widget_data):
     values = data.get('value', [])
 
+    # Also filter by all ancestors of the selected geo areas, so that
+    # filtering with a geo area matches the geo areas within it
+    geo_area_ids = [int(v) for v in values if str(v).isdigit()]
+    ancestor_ids = GeoArea.get_ancestor_ids(geo_area_ids)
+
     set_filter_data(
         entry,
         widget,
-        values=values,
+        values=values + [
+            str(id) for id in sorted(ancestor_ids)
+            if str(id) not in values
+        ],
     )
 
     set_export_data(
@@ -1,5 +1,228 @@
+from contextlib import contextmanager
+import threading
+
+from django.db import transaction
+
 from analysis_framework.models import Filter, Exportable
-from entry.models import FilterData, ExportData
+from entry.models import FilterData, ExportData, EntryFilterIndex
+
+
+_local = threading.local()
+
+
+class AttributeDataBatch:
+    """
+    Collects filter and export data set by widgets for many attributes
+    and writes them all at once.
+
+    Filters and exportables are resolved from a per-framework cache and
+    only the filter/export data that actually changed are written.
+    Rendered exports of changed entries are invalidated at once too.
+    """
+    FILTER_FIELDS = ('values', 'number', 'from_number', 'to_number')
+
+    def __init__(self):
+        self.filter_data = {}
+        self.export_data = {}
+        self.filters = {}
+        self.exportables = {}
+        # Entries whose rendered exports are invalidated
+        self.entry_ids = set()
+
+    def get_filter(self, widget, key):
+        af_id = widget.analysis_framework_id
+        if af_id not in self.filters:
+            self.filters[af_id] = {
+                (f.widget_key, f.key): f
+                for f in Filter.objects.filter(analysis_framework_id=af_id)
+            }
+        return self.filters[af_id].get((widget.key, key))
+
+    def get_exportable(self, widget):
+        af_id = widget.analysis_framework_id
+        if af_id not in self.exportables:
+            self.exportables[af_id] = {
+                e.widget_key: e
+                for e in Exportable.objects.filter(
+                    analysis_framework_id=af_id,
+                )
+            }
+        return self.exportables[af_id].get(widget.key)
+
+    def add_filter_data(self, entry, widget, key, **kwargs):
+        filter = self.get_filter(widget, key)
+        if not filter:
+            return
+
+        data = {
+            field: FilterData._meta.get_field(field).to_python(
+                kwargs.get(field)
+            )
+            for field in self.FILTER_FIELDS
+        }
+        # Array fields don't coerce their elements, which are stored
+        # as strings
+        if data['values'] is not None:
+            data['values'] = [str(v) for v in data['values']]
+        self.filter_data[(entry.id, filter.id)] = (filter, data)
+
+    def add_export_data(self, entry, widget, data):
+        exportable = self.get_exportable(widget)
+        if not exportable:
+            return
+        self.export_data[(entry.id, exportable.id)] = data
+
+    def save(self):
+        with transaction.atomic():
+            self.save_filter_data()
+            self.save_export_data()
+            self.save_export_cache()
+
+    def save_export_cache(self):
+        if self.entry_ids:
+            _delete_export_cache(self.entry_ids)
+
+    def save_filter_data(self):
+        if not self.filter_data:
+            return
+
+        entry_ids = set(entry_id for entry_id, _ in self.filter_data)
+        existing = {}
+        index_data = {entry_id: {} for entry_id in entry_ids}
+        for filter_data in FilterData.objects.filter(
+            entry_id__in=entry_ids,
+        ).select_related('filter'):
+            key = (filter_data.entry_id, filter_data.filter_id)
+            existing.setdefault(key, []).append(filter_data)
+            index_data[filter_data.entry_id][filter_data.filter.key] = {
+                field: getattr(filter_data, field)
+                for field in self.FILTER_FIELDS
+            }
+
+        new_filter_data = []
+        changed_entry_ids = set()
+        for (entry_id, filter_id), (filter, data) in self.filter_data.items():
+            old_filter_data = existing.get((entry_id, filter_id))
+            index_data[entry_id][filter.key] = data
+
+            if not old_filter_data:
+                new_filter_data.append(FilterData(
+                    entry_id=entry_id,
+                    filter_id=filter_id,
+                    **data
+                ))
+                changed_entry_ids.add(entry_id)
+                continue
+
+            if any(
+                getattr(f, field) != data[field]
+                for f in old_filter_data
+                for field in self.FILTER_FIELDS
+            ):
+                FilterData.objects.filter(
+                    id__in=[f.id for f in old_filter_data],
+                ).update(**data)
+                changed_entry_ids.add(entry_id)
+
+        FilterData.objects.bulk_create(new_filter_data)
+        self.save_filter_index(changed_entry_ids, index_data)
+
+    def save_filter_index(self, entry_ids, index_data):
+        from entry.utils import get_filter_index_data
+
+        if not entry_ids:
+            return
+
+        existing_ids = set(EntryFilterIndex.objects.filter(
+            entry_id__in=entry_ids,
+        ).values_list('entry_id', flat=True))
+
+        new_indexes = []
+        for entry_id in entry_ids:
+            data = get_filter_index_data(
+                (key, *[item[field] for field in self.FILTER_FIELDS])
+                for key, item in index_data[entry_id].items()
+            )
+            if entry_id in existing_ids:
+                EntryFilterIndex.objects.filter(
+                    entry_id=entry_id,
+                ).update(data=data)
+            else:
+                new_indexes.append(
+                    EntryFilterIndex(entry_id=entry_id, data=data)
+                )
+
+        EntryFilterIndex.objects.bulk_create(new_indexes)
+
+    def save_export_data(self):
+        if not self.export_data:
+            return
+
+        existing = {}
+        for export_data in ExportData.objects.filter(
+            entry_id__in=set(entry_id for entry_id, _ in self.export_data),
+        ):
+            key = (export_data.entry_id, export_data.exportable_id)
+            existing.setdefault(key, []).append(export_data)
+
+        new_export_data = []
+        changed_entry_ids = set()
+        for (entry_id, exportable_id), data in self.export_data.items():
+            old_export_data = existing.get((entry_id, exportable_id))
+            if not old_export_data:
+                new_export_data.append(ExportData(
+                    entry_id=entry_id,
+                    exportable_id=exportable_id,
+                    data=data,
+                ))
+                changed_entry_ids.add(entry_id)
+            elif any(e.data != data for e in old_export_data):
+                ExportData.objects.filter(
+                    id__in=[e.id for e in old_export_data],
+                ).update(data=data)
+                changed_entry_ids.add(entry_id)
+
+        ExportData.objects.bulk_create(new_export_data)
+        self.entry_ids.update(changed_entry_ids)
+
+
+def _delete_export_cache(entry_ids):
+    from export.models import EntryExportCache
+    EntryExportCache.objects.filter(entry_id__in=entry_ids).delete()
+
+
+def invalidate_export_cache(entry_ids):
+    """
+    Invalidate rendered exports of the entries, once when the current
+    batch is written if any
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch:
+        batch.entry_ids.update(entry_ids)
+        return
+    _delete_export_cache(entry_ids)
+
+
+@contextmanager
+def attribute_data_batch():
+    """
+    Within this context, filter and export data set by widgets are
+    collected and written in bulk when the context exits.
+
+    Nested contexts join the outermost batch.
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch:
+        yield batch
+        return
+
+    batch = AttributeDataBatch()
+    _local.batch = batch
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.save()
 
 
 def set_filter_data(
@@ -9,6 +232,16 @@ def set_filter_data(
         values=None,
 ):
     key = key or widget.key
+    batch = getattr(_local, 'batch', None)
+    if batch:
+        batch.add_filter_data(
+            entry, widget, key,
+            number=number,
+            from_number=from_number, to_number=to_number,
+            values=values,
+        )
+        return None
+
     filter = Filter.objects.filter(
         widget_key=widget.key,
         analysis_framework=widget.analysis_framework,
@@ -28,6 +261,11 @@ def set_filter_data(
 
 
 def set_export_data(entry, widget, data):
+    batch = getattr(_local, 'batch', None)
+    if batch:
+        batch.add_export_data(entry, widget, data)
+        return None
+
     exportable = Exportable.objects.get(
         widget_key=widget.key,
         analysis_framework=widget.analysis_framework,
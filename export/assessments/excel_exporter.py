@@ -143,5 +143,5 @@ class ExcelExporter:
         export_entity.pending = False
         export_entity.mime_type = EXCEL_MIME_TYPE
 
-        export_entity.file.save(filename, ContentFile(buffer))
-        export_entity.save()
+        export_entity.file.save(filename, ContentFile(buffer), save=False)
+        export_entity.save_exported()
@@ -0,0 +1,69 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+
+from export.models import EntryExportCache
+
+import hashlib
+import json
+
+
+def get_signature(*args):
+    """
+    Hash of everything other than the entry itself that a rendered export
+    depends on: exportables, regions, export options, etc.
+    """
+    return hashlib.sha1(json.dumps(
+        args, sort_keys=True, cls=DjangoJSONEncoder,
+    ).encode('utf-8')).hexdigest()
+
+
+def get_entry_version(entry):
+    return '{}-{}'.format(
+        entry.modified_at.isoformat(),
+        entry.lead.modified_at.isoformat(),
+    )
+
+
+def load_cached_entries(entries, export_type, signature):
+    """
+    Return entry id -> cached data for given entries
+    whose caches are still valid
+    """
+    versions = {entry.id: get_entry_version(entry) for entry in entries}
+    return {
+        entry_id: data
+        for entry_id, version, data in EntryExportCache.objects.filter(
+            entry__in=entries,
+            export_type=export_type,
+            signature=signature,
+        ).values_list('entry_id', 'version', 'data')
+        if versions.get(entry_id) == version
+    }
+
+
+def save_cached_entries(rendered, export_type, signature):
+    """
+    Cache rendered data of entries
+    @rendered: list of (entry, data)
+    """
+    if not rendered:
+        return
+
+    try:
+        with transaction.atomic():
+            EntryExportCache.objects.filter(
+                entry__in=[entry for entry, _ in rendered],
+                export_type=export_type,
+            ).delete()
+            EntryExportCache.objects.bulk_create([
+                EntryExportCache(
+                    entry=entry,
+                    export_type=export_type,
+                    signature=signature,
+                    version=get_entry_version(entry),
+                    data=data,
+                ) for entry, data in rendered
+            ])
+    except IntegrityError:
+        # Another export cached these entries at the same time
+        pass
@@ -1,15 +1,32 @@
-from django.core.files.base import ContentFile
+from collections import OrderedDict
 
+from django.contrib.auth.models import User
+from django.core.files.base import File
+from django.db.models import Prefetch, prefetch_related_objects
+
+from export.entries.cache import (
+    get_signature,
+    load_cached_entries,
+    save_cached_entries,
+)
 from export.formats.xlsx import WorkBook, RowsBuilder
 from export.mime_types import EXCEL_MIME_TYPE
+from export.models import EntryExportCache
 from entry.models import Entry, ExportData
 from geo.models import GeoArea
-from utils.common import format_date, generate_filename
+from utils.common import (
+    format_date,
+    generate_filename,
+    iterate_in_chunks,
+)
+
+import tempfile
 
 
 class ExcelExporter:
     def __init__(self, decoupled=True):
-        self.wb = WorkBook()
+        # Rows are streamed to temporary files to keep memory constant
+        self.wb = WorkBook(write_only=True)
 
         # Create two worksheets
         if decoupled:
@@ -34,9 +51,26 @@ class ExcelExporter:
 
     def load_exportables(self, exportables, regions=None):
         # Take all exportables that contains excel info
-        exportables = exportables.filter(
+        exportables = list(exportables.filter(
             data__excel__isnull=False,
-        )
+        ))
+
+        # Load admin levels of all regions and their geo areas once,
+        # geo area id -> (admin level id, title)
+        self.admin_levels = []
+        self.geo_areas = {}
+        if regions:
+            for region in regions:
+                # Columns of each region in the order of admin levels
+                self.admin_levels.extend(
+                    region.adminlevel_set.order_by('level', 'id')
+                )
+            self.geo_areas = {
+                id: (admin_level_id, title)
+                for id, admin_level_id, title in GeoArea.objects.filter(
+                    admin_level__in=self.admin_levels,
+                ).values_list('id', 'admin_level_id', 'title')
+            }
 
         # information_date_index = 1
         for exportable in exportables:
@@ -54,10 +88,8 @@ class ExcelExporter:
             #     information_date_index += 1
 
             if export_type == 'geo' and regions:
-                for region in regions:
-                    admin_levels = region.adminlevel_set.all()
-                    for admin_level in admin_levels:
-                        self.titles.append(admin_level.title)
+                for admin_level in self.admin_levels:
+                    self.titles.append(admin_level.title)
 
             elif export_type == 'multiple':
                 self.titles.extend(data.get('titles'))
@@ -75,97 +107,150 @@ class ExcelExporter:
 
         self.exportables = exportables
         self.regions = regions
+
+        # Rendered rows can be reused only if they were rendered
+        # with the same exportables, geo areas and options
+        self.signature = get_signature(
+            self.decoupled,
+            [(e.id, e.data) for e in exportables],
+            [a.id for a in self.admin_levels],
+            sorted(self.geo_areas.items()),
+        )
         return self
 
-    def add_entries(self, entries):
-        for entry in entries:
-            # Export each entry
-            # Start building rows and export data for each exportable
+    def add_entries(self, entries, chunk_size=500, progress=None):
+        entries = entries.select_related(
+            'lead', 'created_by__profile',
+        )
 
+        for chunk in iterate_in_chunks(entries, chunk_size):
+            self.add_entries_chunk(chunk)
+            if progress:
+                progress.update(len(chunk))
+        return self
+
+    def add_entries_chunk(self, entries):
+        # Reuse rows rendered by previous exports for unchanged entries
+        cached = load_cached_entries(
+            entries, EntryExportCache.EXCEL, self.signature,
+        )
+        rendered = []
+        export_data_map = self.get_export_data_map([
+            entry for entry in entries if entry.id not in cached
+        ])
+
+        for entry in entries:
             rows = RowsBuilder(self.split, self.group, self.decoupled)
-            rows.add_value(format_date(entry.lead.published_on))
-
-            # TODO Check for information dates
-
-            assignee = entry.lead.get_assignee()
-            rows.add_value_list([
-                entry.created_by.profile.get_display_name(),
-                format_date(entry.created_at.date()),
-                entry.lead.title,
-                entry.lead.source,
-                assignee and assignee.profile.get_display_name(),
-                entry.excerpt
-                if entry.entry_type == Entry.EXCERPT
-                else 'IMAGE',
-            ])
-
-            for exportable in self.exportables:
-                # Get export data for this entry corresponding to this
-                # exportable
-
-                # And write some value based on type and data
-                # or empty strings if no data
-
-                data = exportable.data.get('excel')
-                export_data = ExportData.objects.filter(
-                    exportable=exportable,
-                    entry=entry,
-                    data__excel__isnull=False,
-                ).first()
-
-                export_data = export_data and export_data.data.get('excel')
-                export_type = data.get('type')
-
-                if export_type == 'multiple':
-                    col_span = len(data.get('titles'))
-                    if export_data:
-                        if export_data.get('type') == 'lists':
-                            rows.add_rows_of_value_lists(
-                                export_data.get('values'),
-                                col_span,
-                            )
-                        else:
-                            rows.add_value_list(
-                                export_data.get('values'),
-                            )
-                    else:
-                        rows.add_value_list([''] * col_span)
-
-                elif export_type == 'geo' and self.regions:
-                    values = []
-                    if export_data:
-                        values = export_data.get('values', [])
-                        values = [int(v) for v in values]
-
-                    for region in self.regions:
-                        admin_levels = region.adminlevel_set.all()
-
-                        for admin_level in admin_levels:
-                            geo_data = GeoArea.objects.filter(
-                                admin_level=admin_level,
-                                id__in=values,
-                            ).distinct()
-                            if geo_data.count() > 0:
-                                rows.add_rows_of_values([
-                                    g.title for g in geo_data
-                                ])
-                            else:
-                                rows.add_value('')
+            data = cached.get(entry.id)
+            if data:
+                rows.set_rows(data['rows'], data['group_rows'])
+            else:
+                self.render_entry(rows, entry, export_data_map)
+                rendered.append((entry, {
+                    'rows': rows.rows,
+                    'group_rows': rows.group_rows,
+                }))
+            rows.apply()
+
+        save_cached_entries(
+            rendered, EntryExportCache.EXCEL, self.signature,
+        )
+
+    def get_export_data_map(self, entries):
+        if not entries:
+            return {}
+
+        prefetch_related_objects(entries, Prefetch(
+            'lead__assignee',
+            queryset=User.objects.select_related('profile').order_by('pk'),
+        ))
+
+        # Export data of all given entries:
+        # (entry id, exportable id) -> excel export data
+        return {
+            (entry_id, exportable_id): data.get('excel')
+            for entry_id, exportable_id, data in ExportData.objects.filter(
+                entry__in=entries,
+                exportable__in=self.exportables,
+                data__excel__isnull=False,
+            ).values_list('entry_id', 'exportable_id', 'data')
+        }
+
+    def render_entry(self, rows, entry, export_data_map):
+        """
+        Build rows and export data for each exportable of an entry
+        """
+        rows.add_value(format_date(entry.lead.published_on))
+
+        # TODO Check for information dates
+
+        assignee = next(iter(entry.lead.assignee.all()), None)
+        rows.add_value_list([
+            entry.created_by.profile.get_display_name(),
+            format_date(entry.created_at.date()),
+            entry.lead.title,
+            entry.lead.source,
+            assignee and assignee.profile.get_display_name(),
+            entry.excerpt
+            if entry.entry_type == Entry.EXCERPT
+            else 'IMAGE',
+        ])
+
+        for exportable in self.exportables:
+            # Get export data for this entry corresponding to this
+            # exportable
+
+            # And write some value based on type and data
+            # or empty strings if no data
+
+            data = exportable.data.get('excel')
+            export_data = export_data_map.get((entry.id, exportable.id))
+            export_type = data.get('type')
 
+            if export_type == 'multiple':
+                col_span = len(data.get('titles'))
+                if export_data:
+                    if export_data.get('type') == 'lists':
+                        rows.add_rows_of_value_lists(
+                            export_data.get('values'),
+                            col_span,
+                        )
+                    else:
+                        rows.add_value_list(
+                            export_data.get('values'),
+                        )
                 else:
-                    if export_data:
-                        if export_data.get('type') == 'list':
-                            rows.add_rows_of_values(export_data.get('value'))
-                        else:
-                            rows.add_value(export_data.get('value'))
+                    rows.add_value_list([''] * col_span)
+
+            elif export_type == 'geo' and self.regions:
+                values = []
+                if export_data:
+                    values = export_data.get('values', [])
+                    values = list(OrderedDict.fromkeys(
+                        int(v) for v in values
+                    ))
+
+                for admin_level in self.admin_levels:
+                    geo_titles = [
+                        self.geo_areas[v][1] for v in values
+                        if v in self.geo_areas and
+                        self.geo_areas[v][0] == admin_level.id
+                    ]
+                    if geo_titles:
+                        rows.add_rows_of_values(geo_titles)
                     else:
                         rows.add_value('')
 
-            rows.apply()
-        return self
+            else:
+                if export_data:
+                    if export_data.get('type') == 'list':
+                        rows.add_rows_of_values(export_data.get('value'))
+                    else:
+                        rows.add_value(export_data.get('value'))
+                else:
+                    rows.add_value('')
 
     def export(self, export_entity):
-        buffer = self.wb.save()
         filename = generate_filename('Entries Export', 'xlsx')
 
         export_entity.title = filename
@@ -174,5 +259,8 @@ class ExcelExporter:
         export_entity.pending = False
         export_entity.mime_type = EXCEL_MIME_TYPE
 
-        export_entity.file.save(filename, ContentFile(buffer))
-        export_entity.save()
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            self.wb.save_to_file(f)
+            f.seek(0)
+            export_entity.file.save(filename, File(f), save=False)
+        export_entity.save_exported()
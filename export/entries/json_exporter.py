@@ -1,76 +1,158 @@
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.core.serializers.json import DjangoJSONEncoder
-
-from export.mime_types import JSON_MIME_TYPE
+from django.db.models import prefetch_related_objects
+
+from export.entries.cache import (
+    get_signature,
+    load_cached_entries,
+    save_cached_entries,
+)
+from export.mime_types import JSON_MIME_TYPE, JSON_LINES_MIME_TYPE
 from analysis_framework.models import Widget
-from utils.common import generate_filename
-from export.models import Export
+from utils.common import generate_filename, iterate_in_chunks
+from export.models import Export, EntryExportCache
 
 import json
+import tempfile
+import textwrap
 
 
 class JsonExporter:
-    def __init__(self):
-        self.data = {}
+    """
+    Export entries as json, streaming them to a temporary file chunk by
+    chunk instead of building the whole document in memory.
+
+    With json_lines, the first line contains the widgets and each
+    following line is an entry.
+    """
+    def __init__(self, json_lines=False):
+        self.json_lines = json_lines
+        self.file = tempfile.NamedTemporaryFile(mode='w+', encoding='utf-8')
+        self.widgets = []
+
+    def _dumps(self, data, indent=None):
+        return json.dumps(data, sort_keys=True, indent=indent,
+                          cls=DjangoJSONEncoder)
 
     def load_exportables(self, exportables):
         self.exportables = exportables
-        self.widget_ids = []
 
-        self.data['widgets'] = []
+        widgets = {
+            (widget.analysis_framework_id, widget.key): widget
+            for widget in Widget.objects.filter(
+                analysis_framework__exportable__in=exportables,
+            ).distinct()
+        }
+
+        self.widgets = []
         for exportable in self.exportables:
-            widget = Widget.objects.get(
-                analysis_framework=exportable.analysis_framework,
-                key=exportable.widget_key,
-            )
-            self.widget_ids.append(widget.id)
+            widget = widgets[
+                (exportable.analysis_framework_id, exportable.widget_key)
+            ]
 
             data = {}
             data['id'] = widget.key
             data['widget_type'] = widget.widget_id
             data['title'] = widget.title
             data['properties'] = widget.properties
-            self.data['widgets'].append(data)
+            self.widgets.append(data)
 
         return self
 
-    def add_entries(self, entries):
-        self.data['entries'] = []
-        for entry in entries:
-            data = {}
-            data['id'] = entry.id
-            data['lead_id'] = entry.lead.id
-            data['lead'] = entry.lead.title
-            data['source'] = entry.lead.source
-            data['date'] = entry.lead.published_on
-            data['excerpt'] = entry.excerpt
-            data['image'] = entry.image
-            data['attributes'] = []
-
-            for attribute in entry.attribute_set.all():
-                attribute_data = {}
-                attribute_data['widget_id'] = attribute.widget.key
-                attribute_data['data'] = attribute.data
-                data['attributes'].append(attribute_data)
-            self.data['entries'].append(data)
+    def _get_entry_data(self, entry):
+        data = {}
+        data['id'] = entry.id
+        data['lead_id'] = entry.lead.id
+        data['lead'] = entry.lead.title
+        data['source'] = entry.lead.source
+        data['date'] = entry.lead.published_on
+        data['excerpt'] = entry.excerpt
+        data['image'] = entry.image
+        data['attributes'] = []
+
+        for attribute in entry.attribute_set.all():
+            attribute_data = {}
+            attribute_data['widget_id'] = attribute.widget.key
+            attribute_data['data'] = attribute.data
+            data['attributes'].append(attribute_data)
+        return data
+
+    def add_entries(self, entries, chunk_size=500, progress=None):
+        entries = entries.select_related('lead')
+
+        if self.json_lines:
+            self.file.write(self._dumps({'widgets': self.widgets}))
+            self.file.write('\n')
+        else:
+            self.file.write('{\n  "entries": [')
+
+        # Entry data only depends on the entry, its lead and attributes
+        signature = get_signature()
+
+        first = True
+        for chunk in iterate_in_chunks(entries, chunk_size):
+            # Reuse data rendered by previous exports for unchanged entries
+            cached = load_cached_entries(
+                chunk, EntryExportCache.JSON, signature,
+            )
+            rendering = [entry for entry in chunk if entry.id not in cached]
+            prefetch_related_objects(rendering, 'attribute_set__widget')
+
+            rendered = []
+            for entry in chunk:
+                data = cached.get(entry.id)
+                if data is None:
+                    # Through json so that cached and rendered data
+                    # are the same
+                    data = json.loads(self._dumps(
+                        self._get_entry_data(entry)
+                    ))
+                    rendered.append((entry, data))
+
+                if self.json_lines:
+                    self.file.write(self._dumps(data))
+                    self.file.write('\n')
+                    continue
+
+                self.file.write('\n' if first else ',\n')
+                self.file.write(textwrap.indent(
+                    self._dumps(data, indent=2), '    ',
+                ))
+                first = False
+
+            save_cached_entries(rendered, EntryExportCache.JSON, signature)
+            if progress:
+                progress.update(len(chunk))
+
+        if not self.json_lines:
+            self.file.write('\n  ],\n  "widgets": ')
+            self.file.write(textwrap.indent(
+                self._dumps(self.widgets, indent=2), '  ',
+            ).lstrip())
+            self.file.write('\n}')
+
         return self
 
     def export(self, export_entity):
         """
         Export and save in export_entity
         """
-        filename = generate_filename('Entries JSON Export', 'json')
-
-        json_data = json.dumps(self.data, sort_keys=True, indent=2,
-                               cls=DjangoJSONEncoder).encode('utf-8')
-
-        export_entity.file.save(filename, ContentFile(json_data))
-
-        export_entity.format = Export.JSON
-        export_entity.mime_type = JSON_MIME_TYPE
+        if self.json_lines:
+            filename = generate_filename('Entries JSON Export', 'jsonl')
+            export_entity.format = Export.JSON_LINES
+            export_entity.mime_type = JSON_LINES_MIME_TYPE
+        else:
+            filename = generate_filename('Entries JSON Export', 'json')
+            export_entity.format = Export.JSON
+            export_entity.mime_type = JSON_MIME_TYPE
+
+        self.file.flush()
+        with open(self.file.name, 'rb') as f:
+            export_entity.file.save(filename, File(f), save=False)
+        self.file.close()
 
         export_entity.title = filename
         export_entity.type = Export.ENTRIES
         export_entity.pending = False
 
-        export_entity.save()
+        export_entity.save_exported()
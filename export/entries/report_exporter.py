@@ -1,8 +1,9 @@
 from django.conf import settings
 from django.core.files.base import ContentFile, File
-from django.db.models import Case, When, Q
+from django.db.models import Case, When
 
 from export.formats.docx import Document
+from export.formats.pdf import convert_docx_to_pdf
 from export.mime_types import (
     DOCX_MIME_TYPE,
     PDF_MIME_TYPE,
@@ -13,12 +14,13 @@ from lead.models import Lead
 from utils.common import generate_filename
 from export.models import Export
 
-from subprocess import call
 import os
 import tempfile
 
 
 class ReportExporter:
+    CHUNK_SIZE = 1000
+
     def __init__(self):
         self.doc = Document(
             os.path.join(settings.BASE_DIR, 'static/doc_export/template.docx')
@@ -171,11 +173,7 @@ class ReportExporter:
                 )
 
     def _generate_for_uncategorized(self, entries):
-        entries = entries.exclude(
-            Q(exportdata__data__report__keys__isnull=False) |
-            Q(exportdata__data__report__keys__len__gt=0)
-        )
-        if entries.count() == 0:
+        if not entries:
             return
 
         self.doc.add_heading('Uncategorized', 2)
@@ -184,7 +182,7 @@ class ReportExporter:
         if entries:
             [self._generate_for_entry(entry) for entry in entries]
 
-    def add_entries(self, entries):
+    def add_entries(self, entries, progress=None):
         """
         Add entries and generate parapgraphs for all entries
         """
@@ -203,27 +201,49 @@ class ReportExporter:
             ])
             exportables = exportables.filter(pk__in=ids).order_by(order)
 
+        exportables = list(exportables)
+        entries = list(entries.select_related('lead', 'lead__attachment'))
+
+        # Report keys of all entries,
+        # (entry id, exportable id) -> keys
+        report_keys = {}
+        categorized_entry_ids = set()
+        entry_ids = [entry.id for entry in entries]
+        for i in range(0, len(entry_ids), self.CHUNK_SIZE):
+            export_data_list = ExportData.objects.filter(
+                entry_id__in=entry_ids[i:i + self.CHUNK_SIZE],
+                data__report__keys__isnull=False,
+            ).values_list('entry_id', 'exportable_id', 'data')
+
+            for entry_id, exportable_id, data in export_data_list:
+                categorized_entry_ids.add(entry_id)
+                report_keys[(entry_id, exportable_id)] = set(
+                    data.get('report').get('keys') or []
+                )
+
+        # Map all entries into levels of each exportable in one pass
+        # exportable id -> (level entries map, valid levels)
+        exportable_levels = {
+            exportable.id: ({}, []) for exportable in exportables
+        }
+        for entry in entries:
+            for exportable in exportables:
+                keys = report_keys.get((entry.id, exportable.id))
+                if not keys:
+                    continue
+
+                level_entries_map, valid_levels = \
+                    exportable_levels[exportable.id]
+                self._load_into_levels(
+                    entry, keys,
+                    exportable.data.get('report').get('levels'),
+                    level_entries_map, valid_levels,
+                )
+
         for exportable in exportables:
             levels = exportable.data.get('report').get('levels')
-
-            level_entries_map = {}
-            valid_levels = []
-            for entry in entries:
-                # TODO
-                # Set entry.report_data to all exportdata for all exportable
-                # for this entry for later use
-
-                export_data = ExportData.objects.filter(
-                    entry=entry,
-                    exportable=exportable,
-                    data__report__keys__isnull=False,
-                ).first()
-
-                if export_data:
-                    self._load_into_levels(
-                        entry, export_data.data.get('report').get('keys'),
-                        levels, level_entries_map, valid_levels,
-                    )
+            level_entries_map, valid_levels = \
+                exportable_levels[exportable.id]
 
             structures = self.structure and next((
                 s.get('levels') for s in self.structure
@@ -233,7 +253,13 @@ class ReportExporter:
                                       valid_levels, structures)
 
         if uncategorized:
-            self._generate_for_uncategorized(entries)
+            self._generate_for_uncategorized([
+                entry for entry in entries
+                if entry.id not in categorized_entry_ids
+            ])
+
+        if progress:
+            progress.update(len(entries))
 
         return self
 
@@ -244,7 +270,8 @@ class ReportExporter:
 
         # Get all leads to generate Bibliography
         lead_ids = list(set(self.lead_ids))
-        leads = Lead.objects.filter(id__in=lead_ids)
+        leads = Lead.objects.filter(id__in=lead_ids)\
+            .select_related('attachment')
 
         self.doc.add_paragraph().add_horizontal_line()
         self.doc.add_paragraph()
@@ -281,28 +308,23 @@ class ReportExporter:
         self.doc.add_page_break()
 
         if pdf:
-            temp_doc = tempfile.NamedTemporaryFile(dir=settings.BASE_DIR)
-            self.doc.save_to_file(temp_doc)
-
-            filename = temp_doc.name.split('/')[-1]
-            temp_pdf = os.path.join(settings.BASE_DIR,
-                                    '{}.pdf'.format(filename))
-
-            call(['libreoffice', '--headless', '--convert-to',
-                  'pdf', temp_doc.name, '--outdir', settings.BASE_DIR])
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                docx_path = os.path.join(tmp_dir, 'report.docx')
+                with open(docx_path, 'wb') as f:
+                    self.doc.save_to_file(f)
 
-            filename = generate_filename('Entries General Export', 'pdf')
-            export_entity.file.save(filename, File(open(temp_pdf, 'rb')))
+                pdf_path = convert_docx_to_pdf(docx_path, tmp_dir)
 
-            os.unlink(temp_pdf)
-            temp_doc.close()
+                filename = generate_filename('Entries General Export', 'pdf')
+                with open(pdf_path, 'rb') as f:
+                    export_entity.file.save(filename, File(f), save=False)
 
             export_entity.format = Export.PDF
             export_entity.mime_type = PDF_MIME_TYPE
         else:
             buffer = self.doc.save()
             filename = generate_filename('Entries General Export', 'docx')
-            export_entity.file.save(filename, ContentFile(buffer))
+            export_entity.file.save(filename, ContentFile(buffer), save=False)
 
             export_entity.format = Export.DOCX
             export_entity.mime_type = DOCX_MIME_TYPE
@@ -311,4 +333,4 @@ class ReportExporter:
         export_entity.type = Export.ENTRIES
         export_entity.pending = False
 
-        export_entity.save()
+        export_entity.save_exported()
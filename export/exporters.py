@@ -34,7 +34,7 @@ class JsonExporter(Exporter):
 
         json_data = json.dumps(self.data, sort_keys=True, indent=2,
                                cls=DjangoJSONEncoder).encode('utf-8')
-        export_entity.file.save(filename, ContentFile(json_data))
+        export_entity.file.save(filename, ContentFile(json_data), save=False)
 
         export_entity.format = Export.JSON
         export_entity.mime_type = JSON_MIME_TYPE
@@ -42,4 +42,4 @@ class JsonExporter(Exporter):
         export_entity.title = filename
         export_entity.pending = False
 
-        export_entity.save()
+        export_entity.save_exported()
@@ -8,6 +8,7 @@ from PIL import Image
 import docx
 import requests
 import io
+import os
 import re
 import tempfile
 import base64
@@ -15,6 +16,21 @@ import base64
 from utils.common import get_valid_xml_string as xstr
 
 
+# Template file contents cached across exports in a worker
+# path -> (modified time, contents)
+_templates = {}
+
+
+def _load_template(path):
+    mtime = os.path.getmtime(path)
+    cached = _templates.get(path)
+    if not cached or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, f.read())
+        _templates[path] = cached
+    return io.BytesIO(cached[1])
+
+
 def _write_file(r, fp):
     for chunk in r.iter_content(chunk_size=1024):
         if chunk:
@@ -143,6 +159,8 @@ class Document:
     A docx document representation
     """
     def __init__(self, template=None):
+        if template:
+            template = _load_template(template)
         self.doc = docx.Document(template)
 
     def add_paragraph(self, text=None):
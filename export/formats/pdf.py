@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from django.conf import settings
+
+from redis_store import redis
+
+import os
+import subprocess
+import tempfile
+import time
+
+
+# Libreoffice conversions are limited across all workers by holding one of
+# REPORT_PDF_CONVERSION_WORKERS redis locks while converting
+SLOT_KEY = 'report_pdf_conversion_slot_{}'
+SLOT_WAIT_INTERVAL = 1
+
+
+@contextmanager
+def conversion_slot(timeout):
+    """
+    Wait for a free conversion slot and hold it within the context
+
+    Raises subprocess.TimeoutExpired if no slot is freed within timeout.
+    """
+    start = time.time()
+    while True:
+        for i in range(settings.REPORT_PDF_CONVERSION_WORKERS):
+            # Expire the slot a bit after the conversion is killed in case
+            # the worker dies while holding it
+            lock = redis.get_lock(SLOT_KEY.format(i), timeout=timeout + 60)
+            if lock.acquire(blocking=False):
+                try:
+                    yield
+                finally:
+                    lock.release()
+                return
+
+        if time.time() - start >= timeout:
+            raise subprocess.TimeoutExpired('libreoffice', timeout)
+        time.sleep(SLOT_WAIT_INTERVAL)
+
+
+def _convert(docx_path, outdir, timeout):
+    # Each conversion uses its own libreoffice profile, otherwise
+    # concurrent conversions block on the shared profile lock
+    with tempfile.TemporaryDirectory() as profile_dir:
+        subprocess.run([
+            'libreoffice',
+            '-env:UserInstallation=file://{}'.format(profile_dir),
+            '--headless', '--convert-to', 'pdf',
+            docx_path, '--outdir', outdir,
+        ], timeout=timeout, check=True)
+
+    filename, _ = os.path.splitext(os.path.basename(docx_path))
+    return os.path.join(outdir, '{}.pdf'.format(filename))
+
+
+def convert_docx_to_pdf(docx_path, outdir, timeout=None):
+    """
+    Convert a docx file to pdf in outdir and return path of the pdf
+
+    Raises subprocess.TimeoutExpired if the conversion takes longer than
+    timeout, killing the libreoffice process.
+    """
+    timeout = timeout or settings.REPORT_PDF_CONVERSION_TIMEOUT
+    with conversion_slot(timeout):
+        return _convert(docx_path, outdir, timeout)
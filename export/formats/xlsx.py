@@ -1,6 +1,7 @@
 from collections import OrderedDict
 
 from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
 from openpyxl.writer.excel import save_virtual_workbook
 
 from utils.common import get_valid_xml_string as xstr
@@ -9,42 +10,97 @@ from utils.common import get_valid_xml_string as xstr
 class WorkBook:
     """
     An xlsx workbook
+
+    In write only mode, rows are streamed to temporary files as they are
+    appended instead of being kept in memory. Such a workbook can only be
+    saved once.
     """
-    def __init__(self):
-        self.wb = Workbook()
+    def __init__(self, write_only=False):
+        self.wb = Workbook(write_only=write_only)
+        self.write_only = write_only
+        self.sheets = []
 
     def get_active_sheet(self):
-        return WorkSheet(self.wb.active)
+        if self.write_only:
+            # Write only workbooks don't have any default sheet
+            return self.create_sheet(None)
+        return self._add_sheet(WorkSheet(self.wb.active))
 
     def create_sheet(self, title):
-        return WorkSheet(self.wb.create_sheet(title))
+        return self._add_sheet(WorkSheet(
+            self.wb.create_sheet(title),
+            write_only=self.write_only,
+        ))
+
+    def _add_sheet(self, sheet):
+        self.sheets.append(sheet)
+        return sheet
 
     def save(self):
+        [sheet.flush() for sheet in self.sheets]
         return save_virtual_workbook(self.wb)
 
+    def save_to_file(self, fp):
+        [sheet.flush() for sheet in self.sheets]
+        self.wb.save(fp)
+
 
 class WorkSheet:
     """
     A worksheet inside a workbook
+
+    Widths of the first few rows are tracked so that cells can be auto
+    fitted without reading back the rows.
+
+    For write only worksheets, column widths can't be changed once rows
+    are written, so these first rows are also held back until they are
+    auto fitted or more rows are appended.
     """
-    def __init__(self, ws):
+    TRACKED_ROWS = 10
+
+    def __init__(self, ws, write_only=False):
         self.ws = ws
+        self.row_count = 0
+        self.row_widths = {}
+        self.pending_rows = [] if write_only else None
 
     def set_title(self, title):
         self.ws.title = title
         return self
 
     def auto_fit_cells_in_row(self, row_id):
-        row = list(self.ws.rows)[row_id - 1]
-        for cell in row:
-            self.ws.column_dimensions[cell.column].width =\
-                max(len(cell.value), 15)
+        widths = self.row_widths.get(row_id, [])
+        for i, width in enumerate(widths):
+            self.ws.column_dimensions[get_column_letter(i + 1)].width =\
+                max(width, 15)
 
+        self.flush()
         return self
 
     def append(self, rows):
-        [self.ws.append(row) for row in rows]
+        for row in rows:
+            self.row_count += 1
+            if self.row_count <= self.TRACKED_ROWS:
+                self.row_widths[self.row_count] = [
+                    len(str(value)) if value else 0 for value in row
+                ]
+
+            if self.pending_rows is not None and \
+                    self.row_count <= self.TRACKED_ROWS:
+                self.pending_rows.append(row)
+            else:
+                self.flush()
+                self.ws.append(row)
+
+        return self
 
+    def flush(self):
+        """
+        Write rows held back from a write only worksheet
+        """
+        if self.pending_rows is not None:
+            [self.ws.append(row) for row in self.pending_rows]
+            self.pending_rows = None
         return self
 
 
@@ -59,6 +115,12 @@ class RowsBuilder:
         self.group_sheet = group_sheet
         self.split = split
 
+    def set_rows(self, rows, group_rows):
+        # Use already built rows
+        self.rows = rows
+        self.group_rows = group_rows
+        return self
+
     def add_value(self, value):
         val = xstr(value)
         if self.split:
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0007_merge_20180708_0706'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='export',
+            name='format',
+            field=models.CharField(blank=True, choices=[('xlsx', 'xlsx'), ('docx', 'docx'), ('pdf', 'pdf'), ('json', 'json'), ('jsonl', 'jsonl')], max_length=100),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry', '0016_entryfilterindex'),
+        ('export', '0008_auto_20181105_0900'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryExportCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('excel', 'Excel'), ('json', 'Json')], max_length=20)),
+                ('signature', models.CharField(max_length=40)),
+                ('version', models.CharField(max_length=100)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=None, null=True)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='entry.Entry')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='entryexportcache',
+            unique_together=set([('entry', 'export_type')]),
+        ),
+    ]
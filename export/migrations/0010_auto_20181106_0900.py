@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_statuses(apps, schema_editor):
+    """
+    Exports before status was added only have the pending flag
+    """
+    Export = apps.get_model('export', 'Export')
+    Export.objects.filter(pending=False).exclude(file='').exclude(
+        file__isnull=True,
+    ).update(status='success')
+    Export.objects.exclude(status='success').update(status='failure')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0009_entryexportcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='processed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='export',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('started', 'Started'), ('success', 'Success'), ('failure', 'Failure'), ('canceled', 'Canceled')], default='pending', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='export',
+            name='total_count',
+            field=models.IntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(set_statuses, migrations.RunPython.noop),
+    ]
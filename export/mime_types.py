@@ -6,3 +6,5 @@ EXCEL_MIME_TYPE = \
     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 JSON_MIME_TYPE = \
     'application/json'
+JSON_LINES_MIME_TYPE = \
+    'application/x-ndjson'
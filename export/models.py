@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import JSONField
 
+from entry.models import Entry
 from project.models import Project
 
 
@@ -15,12 +17,14 @@ class Export(models.Model):
     DOCX = 'docx'
     PDF = 'pdf'
     JSON = 'json'
+    JSON_LINES = 'jsonl'
 
     FORMATS = (
         (XLSX, 'xlsx'),
         (DOCX, 'docx'),
         (PDF, 'pdf'),
-        (JSON, 'json')
+        (JSON, 'json'),
+        (JSON_LINES, 'jsonl'),
     )
 
     ENTRIES = 'entries'
@@ -31,6 +35,20 @@ class Export(models.Model):
         (ASSESSMENTS, 'Assessments'),
     )
 
+    PENDING = 'pending'
+    STARTED = 'started'
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+    CANCELED = 'canceled'
+
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (STARTED, 'Started'),
+        (SUCCESS, 'Success'),
+        (FAILURE, 'Failure'),
+        (CANCELED, 'Canceled'),
+    )
+
     project = models.ForeignKey(Project, default=None,
                                 null=True, blank=True)
     is_preview = models.BooleanField(default=False)
@@ -47,12 +65,83 @@ class Export(models.Model):
     exported_at = models.DateTimeField(auto_now_add=True)
 
     pending = models.BooleanField(default=True)
+    status = models.CharField(max_length=30, choices=STATUSES,
+                              default=PENDING)
+
+    # Progress of the export
+    total_count = models.IntegerField(default=None, null=True, blank=True)
+    processed_count = models.IntegerField(default=0)
 
     def __str__(self):
         return self.title
 
+    def cancel(self):
+        """
+        Request the export to be canceled
+
+        The export task stops when it next reports its progress.
+        """
+        return Export.objects.filter(
+            id=self.id,
+            status__in=[Export.PENDING, Export.STARTED],
+        ).update(status=Export.CANCELED, pending=False) > 0
+
+    def save_exported(self):
+        """
+        Save the exported file and its details
+
+        The status is left to set_status so that a cancellation while
+        exporting is not overwritten.
+        """
+        self.save(update_fields=[
+            'title', 'format', 'type', 'mime_type', 'file', 'pending',
+        ])
+
+    def set_status(self, status):
+        """
+        Set the status unless the export has been canceled
+        """
+        updated = Export.objects.filter(id=self.id).exclude(
+            status=Export.CANCELED,
+        ).update(status=status)
+        self.status = status if updated else Export.CANCELED
+        return updated > 0
+
     @staticmethod
     def get_for(user):
         return Export.objects.filter(
             exported_by=user
         ).distinct()
+
+
+class EntryExportCache(models.Model):
+    """
+    Rendered export data of an entry
+
+    Exports reuse it instead of rendering the entry again as long as the
+    entry and its lead are not modified (version) and the export is
+    rendered with the same exportables and options (signature).
+
+    Caches of an entry are also deleted when its attributes, export
+    data, lead assignees, the creator's or assignees' names or its
+    widgets' keys change.
+    """
+    EXCEL = 'excel'
+    JSON = 'json'
+
+    EXPORT_TYPES = (
+        (EXCEL, 'Excel'),
+        (JSON, 'Json'),
+    )
+
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE)
+    export_type = models.CharField(max_length=20, choices=EXPORT_TYPES)
+    signature = models.CharField(max_length=40)
+    version = models.CharField(max_length=100)
+    data = JSONField(default=None, blank=True, null=True)
+
+    class Meta:
+        unique_together = ('entry', 'export_type')
+
+    def __str__(self):
+        return 'Export cache ({}, {})'.format(self.entry_id, self.export_type)
@@ -0,0 +1,63 @@
+from channels import Group
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from export.models import Export
+from utils.websocket.subscription import SubscriptionConsumer
+
+import json
+
+
+class ExportCanceled(Exception):
+    pass
+
+
+class ExportProgress:
+    """
+    Progress of an export task
+
+    Progress is saved in the export and sent to websocket clients
+    subscribed to the export. Since the export can be canceled in the
+    meantime, each update also checks for it and raises ExportCanceled
+    so that the task can stop.
+    """
+    def __init__(self, export, total):
+        self.export = export
+        self.export.status = Export.STARTED
+        self.export.total_count = total
+        self.export.processed_count = 0
+        self._save()
+
+    def update(self, count):
+        self.export.processed_count += count
+        self._save()
+
+    def _save(self):
+        updated = Export.objects.filter(
+            id=self.export.id,
+        ).exclude(status=Export.CANCELED).update(
+            status=self.export.status,
+            total_count=self.export.total_count,
+            processed_count=self.export.processed_count,
+        )
+        if not updated:
+            raise ExportCanceled()
+        self.notify()
+
+    def notify(self):
+        code = SubscriptionConsumer.encode({
+            'channel': 'exports',
+            'event': 'onProgress',
+            'exportId': self.export.id,
+        })
+
+        Group(code).send(json.loads(
+            JSONRenderer().render({
+                'code': code,
+                'timestamp': timezone.now(),
+                'type': 'notification',
+                'status': self.export.status,
+                'total': self.export.total_count,
+                'processed': self.export.processed_count,
+            }).decode('utf-8')
+        ))
@@ -0,0 +1,79 @@
+from django.dispatch import receiver
+from django.db.models.signals import (
+    post_save,
+    pre_save,
+    pre_delete,
+    m2m_changed,
+)
+
+from analysis_framework.models import Widget
+from entry.models import Entry
+from entry.widgets.utils import invalidate_export_cache
+from lead.models import Lead
+from export.models import EntryExportCache
+from user.models import User
+
+
+# User fields rendered in exports, through their display names
+USER_EXPORT_FIELDS = {'first_name', 'last_name', 'username'}
+
+
+# Attributes invalidate their entries themselves, which along with
+# the entry are invalidated once when saved in a batch
+@receiver(post_save, sender=Entry)
+def invalidate_export_cache_entry_saved(sender, instance, **kwargs):
+    invalidate_export_cache([instance.id])
+
+
+@receiver(post_save, sender=Lead)
+def invalidate_export_cache_lead_saved(sender, instance, **kwargs):
+    EntryExportCache.objects.filter(entry__lead=instance).delete()
+
+
+@receiver(m2m_changed, sender=Lead.assignee.through)
+def invalidate_export_cache_lead_assignee_changed(sender, instance, action,
+                                                  reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            EntryExportCache.objects.filter(entry__lead=instance).delete()
+        return
+
+    # Changed from the user side, instance is the user
+    if action == 'pre_clear':
+        leads = instance.lead_set.all()
+    elif action in ('post_add', 'post_remove'):
+        leads = pk_set
+    else:
+        return
+    EntryExportCache.objects.filter(entry__lead__in=leads).delete()
+
+
+@receiver(post_save, sender=User)
+def invalidate_export_cache_user_saved(sender, instance, update_fields,
+                                       **kwargs):
+    # Skip saves such as last_login updates
+    if update_fields is not None and \
+            not USER_EXPORT_FIELDS.intersection(update_fields):
+        return
+    EntryExportCache.objects.filter(entry__created_by=instance).delete()
+    EntryExportCache.objects.filter(entry__lead__assignee=instance).delete()
+
+
+@receiver(pre_save, sender=Widget)
+def invalidate_export_cache_widget_saved(sender, instance, **kwargs):
+    # Widget keys are rendered in json exports
+    if not instance.pk or not Widget.objects.filter(
+        pk=instance.pk,
+    ).exclude(key=instance.key).exists():
+        return
+    EntryExportCache.objects.filter(
+        entry__attribute__widget=instance,
+    ).delete()
+
+
+@receiver(pre_delete, sender=Widget)
+def invalidate_export_cache_widget_deleted(sender, instance, **kwargs):
+    # Attributes of the widget are deleted along with it
+    EntryExportCache.objects.filter(
+        entry__attribute__widget=instance,
+    ).delete()
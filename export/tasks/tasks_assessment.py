@@ -26,6 +26,8 @@ def _export_assessments(export_type, export_id, user_id, project_id, filters):
         ExcelExporter(decoupled=False)\
             .add_assessments(arys)\
             .export(export)
+
+    export.set_status(Export.SUCCESS)
     return True
 
 
@@ -40,10 +42,9 @@ def export_assessment(export_type, export_id, user_id, project_id, filters):
             filters,
         )
     except Exception:
-        export = Export.objects.filter(id=export_id).first()
-        if export:
-            export.pending = False
-            export.save()
+        Export.objects.filter(id=export_id).exclude(
+            status=Export.CANCELED,
+        ).update(pending=False, status=Export.FAILURE)
         logger.error(traceback.format_exc())
         return_value = False
     return return_value
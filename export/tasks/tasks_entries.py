@@ -5,6 +5,7 @@ from django.db import models
 from analysis_framework.models import Exportable
 from entry.filter_set import EntryFilterSet, get_filtered_entries
 from export.models import Export
+from export.progress import ExportProgress, ExportCanceled
 from export.entries.excel_exporter import ExcelExporter
 from export.entries.report_exporter import ReportExporter
 from export.entries.json_exporter import JsonExporter
@@ -41,27 +42,33 @@ def _export_entries(export_type, export_id, user_id, project_id, filters):
         project__id=project_id
     ).distinct()
 
+    progress = ExportProgress(export, queryset.count())
+
     if export_type == 'excel':
         decoupled = filters.get('decoupled', True)
-        ExcelExporter(decoupled)\
+        exporter = ExcelExporter(decoupled)\
             .load_exportables(exportables, regions)\
-            .add_entries(queryset)\
-            .export(export)
+            .add_entries(queryset, progress=progress)
+        exporter.export(export)
 
     elif export_type == 'report':
         report_structure = filters.get('report_structure')
         pdf = filters.get('pdf', False)
-        ReportExporter()\
+        exporter = ReportExporter()\
             .load_exportables(exportables)\
             .load_structure(report_structure)\
-            .add_entries(queryset)\
-            .export(export, pdf)
+            .add_entries(queryset, progress=progress)
+        exporter.export(export, pdf)
 
     elif export_type == 'json':
-        JsonExporter()\
+        json_lines = filters.get('json_lines', False)
+        exporter = JsonExporter(json_lines)\
             .load_exportables(exportables)\
-            .add_entries(queryset)\
-            .export(export)
+            .add_entries(queryset, progress=progress)
+        exporter.export(export)
+
+    export.set_status(Export.SUCCESS)
+    progress.notify()
 
     return True
 
@@ -76,11 +83,13 @@ def export_entries(export_type, export_id, user_id, project_id, filters):
             project_id,
             filters,
         )
+    except ExportCanceled:
+        logger.info('Export {} canceled'.format(export_id))
+        return_value = False
     except Exception:
-        export = Export.objects.filter(id=export_id).first()
-        if export:
-            export.pending = False
-            export.save()
+        Export.objects.filter(id=export_id).exclude(
+            status=Export.CANCELED,
+        ).update(pending=False, status=Export.FAILURE)
         logger.error(traceback.format_exc())
         return_value = False
 
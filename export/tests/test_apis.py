@@ -1,5 +1,6 @@
 from deep.tests import TestCase
 from export.models import Export
+from export.exporters import JsonExporter
 
 
 class ExportTests(TestCase):
@@ -25,3 +26,34 @@ class ExportTests(TestCase):
         export = Export.objects.get(id=response.data['export_triggered'])
         self.assertTrue(export.pending)
         self.assertEqual(export.exported_by, self.user)
+
+    def test_cancel_export(self):
+        export = self.create(Export, exported_by=self.user)
+        url = '/api/v1/exports/{}/cancel/'.format(export.id)
+
+        self.authenticate()
+        response = self.client.post(url)
+        self.assert_200(response)
+
+        self.assertEqual(response.data['status'], Export.CANCELED)
+        self.assertFalse(response.data['pending'])
+
+        # Can't cancel an export which has already been canceled
+        response = self.client.post(url)
+        self.assert_400(response)
+
+    def test_canceled_while_exporting(self):
+        export = self.create(
+            Export, exported_by=self.user, status=Export.STARTED,
+        )
+        # Canceled by the user while the task is building the export
+        Export.objects.get(id=export.id).cancel()
+
+        exporter = JsonExporter()
+        exporter.data = {}
+        exporter.export(export)
+        self.assertFalse(export.set_status(Export.SUCCESS))
+
+        export = Export.objects.get(id=export.id)
+        self.assertEqual(export.status, Export.CANCELED)
+        self.assertTrue(export.file)
@@ -0,0 +1,100 @@
+from deep.tests import TestCase
+from analysis_framework.models import AnalysisFramework, Widget
+from entry.models import Entry, Attribute
+from entry.widgets.utils import attribute_data_batch
+from export.models import EntryExportCache
+from lead.models import Lead
+from project.models import Project
+from user.models import User
+
+
+class EntryExportCacheTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        analysis_framework = self.create(AnalysisFramework)
+        project = self.create(
+            Project, analysis_framework=analysis_framework,
+            role=self.admin_role,
+        )
+        self.assignee = self.create(User)
+        self.lead = self.create(Lead, project=project)
+        self.entry = self.create(
+            Entry, lead=self.lead, project=project,
+            analysis_framework=analysis_framework,
+        )
+        self.widget = self.create(
+            Widget, analysis_framework=analysis_framework, key='widget',
+        )
+        self.attribute = self.create(
+            Attribute, entry=self.entry, widget=self.widget, data={},
+        )
+
+    def cache(self):
+        EntryExportCache.objects.filter(entry=self.entry).delete()
+        EntryExportCache.objects.create(
+            entry=self.entry,
+            export_type=EntryExportCache.EXCEL,
+            signature='signature',
+            version='version',
+            data={},
+        )
+
+    def assert_cached(self, cached=True):
+        self.assertEqual(
+            EntryExportCache.objects.filter(entry=self.entry).exists(),
+            cached,
+        )
+
+    def test_attribute_changed(self):
+        self.cache()
+        self.attribute.data = {'value': 1}
+        self.attribute.save()
+        self.assert_cached(False)
+
+        self.cache()
+        self.attribute.delete()
+        self.assert_cached(False)
+
+    def test_batch_invalidated_once(self):
+        self.cache()
+        with attribute_data_batch():
+            self.entry.save()
+            self.attribute.save()
+            # Invalidated when the batch is written
+            self.assert_cached()
+        self.assert_cached(False)
+
+    def test_assignee_changed(self):
+        self.cache()
+        self.lead.assignee.add(self.assignee)
+        self.assert_cached(False)
+
+        self.cache()
+        self.assignee.lead_set.clear()
+        self.assert_cached(False)
+
+    def test_user_renamed(self):
+        self.lead.assignee.add(self.assignee)
+
+        self.cache()
+        self.user.save(update_fields=['last_login'])
+        self.assert_cached()
+
+        self.user.first_name = 'New'
+        self.user.save()
+        self.assert_cached(False)
+
+        self.cache()
+        self.assignee.last_name = 'Name'
+        self.assignee.save(update_fields=['last_name'])
+        self.assert_cached(False)
+
+    def test_widget_key_changed(self):
+        self.cache()
+        self.widget.title = 'New title'
+        self.widget.save()
+        self.assert_cached()
+
+        self.widget.key = 'new-widget'
+        self.widget.save()
+        self.assert_cached(False)
@@ -0,0 +1,25 @@
+from deep.tests import TestCase
+from analysis_framework.models import AnalysisFramework, Exportable
+from export.entries.excel_exporter import ExcelExporter
+from geo.models import Region, AdminLevel
+
+
+class ExcelExporterTest(TestCase):
+    def test_geo_titles(self):
+        analysis_framework = self.create(AnalysisFramework)
+        exportable = self.create(
+            Exportable,
+            analysis_framework=analysis_framework,
+            data={'excel': {'type': 'geo'}},
+        )
+        region = self.create(Region)
+        self.create(AdminLevel, region=region, level=1, title='District')
+        self.create(AdminLevel, region=region, level=0, title='Country')
+
+        exporter = ExcelExporter()
+        exporter.load_exportables(
+            Exportable.objects.filter(id=exportable.id), [region],
+        )
+
+        # Titles are in the order of admin levels
+        self.assertEqual(exporter.titles[-2:], ['Country', 'District'])
@@ -0,0 +1,35 @@
+from django.test import TestCase, override_settings
+from docx import Document
+from export.formats.pdf import conversion_slot, convert_docx_to_pdf
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+
+class PdfConversionTest(TestCase):
+    @override_settings(REPORT_PDF_CONVERSION_WORKERS=1)
+    def test_conversion_slots(self):
+        with conversion_slot(60):
+            # The only slot is taken
+            with self.assertRaises(subprocess.TimeoutExpired):
+                with conversion_slot(0):
+                    pass
+
+        # and freed afterwards
+        with conversion_slot(0):
+            pass
+
+    @unittest.skipUnless(shutil.which('libreoffice'), 'needs libreoffice')
+    def test_convert_docx_to_pdf(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            docx_path = os.path.join(tmp_dir, 'report.docx')
+            document = Document()
+            document.add_paragraph('Hello')
+            document.save(docx_path)
+
+            pdf_path = convert_docx_to_pdf(docx_path, tmp_dir)
+            self.assertEqual(pdf_path, os.path.join(tmp_dir, 'report.pdf'))
+            self.assertTrue(os.path.getsize(pdf_path) > 0)
@@ -1,5 +1,8 @@
 from django.test import TestCase
-from export.formats.xlsx import RowsBuilder
+from openpyxl import load_workbook
+from export.formats.xlsx import WorkBook, RowsBuilder
+
+import io
 
 
 class RowsBuilderTest(TestCase):
@@ -32,3 +35,28 @@ class RowsBuilderTest(TestCase):
 
         self.assertEqual(result, builder.rows)
         self.assertEqual(group_result, builder.group_rows)
+
+
+class WorkBookTest(TestCase):
+    def test_write_only(self):
+        wb = WorkBook(write_only=True)
+        ws = wb.get_active_sheet().set_title('Entries')
+
+        title = 'A very long title for auto fitting'
+        ws.append([[title, 'Short']])
+        ws.auto_fit_cells_in_row(1)
+        RowsBuilder(None, ws, split=False)\
+            .add_value_list(['Hello', 'World'])\
+            .apply()
+
+        fp = io.BytesIO()
+        wb.save_to_file(fp)
+        fp.seek(0)
+
+        sheet = load_workbook(fp)['Entries']
+        self.assertEqual(
+            [[cell.value for cell in row] for row in sheet.rows],
+            [[title, 'Short'], ['Hello', 'World']],
+        )
+        self.assertEqual(sheet.column_dimensions['A'].width, len(title))
+        self.assertEqual(sheet.column_dimensions['B'].width, 15)
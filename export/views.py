@@ -1,15 +1,18 @@
 from django.conf import settings
 from django.db import transaction
 from rest_framework import (
+    exceptions,
     permissions,
     response,
     views,
     viewsets,
     status,
 )
+from rest_framework.decorators import detail_route
 
 from export.serializers import ExportSerializer
 from export.models import Export
+from entry.models import Entry
 from project.models import Project
 
 from export.tasks import export_entries, export_assessment
@@ -32,6 +35,24 @@ class ExportViewSet(viewsets.ReadOnlyModelViewSet):
 
         return exports
 
+    @detail_route(permission_classes=[permissions.IsAuthenticated],
+                  methods=['post'],
+                  url_path='cancel')
+    def cancel(self, request, pk=None, version=None):
+        export = self.get_object()
+        if export.exported_by != request.user:
+            raise exceptions.PermissionDenied()
+
+        if not export.cancel():
+            raise exceptions.ValidationError({
+                'status': 'Export has already completed',
+            })
+
+        export.refresh_from_db()
+        return response.Response(
+            self.get_serializer(export).data,
+        )
+
 
 class ExportTriggerView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -72,13 +93,23 @@ class ExportTriggerView(views.APIView):
             is_preview=is_preview,
         )
 
+        # Large entries exports are run by separate workers
+        queue = None
+        if export_item == 'entry' and project_id and \
+                Entry.objects.filter(project_id=project_id).count() > \
+                settings.EXPORT_LARGE_ENTRIES_THRESHOLD:
+            queue = settings.EXPORT_LARGE_QUEUE
+
         if not settings.TESTING:
-            transaction.on_commit(lambda: export_task.delay(
-                export_type,
-                export.id,
-                request.user.id,
-                project_id,
-                filters,
+            transaction.on_commit(lambda: export_task.apply_async(
+                (
+                    export_type,
+                    export.id,
+                    request.user.id,
+                    project_id,
+                    filters,
+                ),
+                queue=queue,
             ))
 
         return response.Response({
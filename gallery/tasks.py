@@ -4,6 +4,7 @@ from gallery.models import (
     File,
     FilePreview,
 )
+from lead.models import ExtractionCache
 from lead.tasks import _preprocess
 from utils.extractor.file_document import FileDocument
 
@@ -30,12 +31,23 @@ def _extract_from_file_core(file_preview_id):
 
         for i, file in enumerate(files):
             try:
-                text, images = FileDocument(
+                document = FileDocument(
                     file.file,
                     file.file.name,
-                ).extract()
-
-                text = _preprocess(text)
+                )
+
+                # Reuse previous extraction of the same file
+                cache_key = document.get_cache_key()
+                cache = ExtractionCache.get_for(cache_key)
+                if cache:
+                    text = cache.text
+                else:
+                    text, images = document.extract()
+                    text = _preprocess(text)
+                    for image in images or []:
+                        image.close()
+                    if text:
+                        ExtractionCache.set_for(cache_key, text)
 
                 if i != 0:
                     all_text += '\n\n'
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GeoConfig(AppConfig):
     name = 'geo'
+
+    def ready(self):
+        from . import receivers # noqa
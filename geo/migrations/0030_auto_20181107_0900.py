@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0029_region_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminlevel',
+            name='bounds',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='adminlevel',
+            name='geojson_etag',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='adminlevel',
+            name='geojson_file',
+            field=models.FileField(blank=True, default=None, max_length=255, null=True, upload_to='geojson/'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0030_auto_20181107_0900'),
+        ('user', '0004_auto_20171129_0851'),
+    ]
+
+    # Trigram index for prefix search (title__istartswith) of geo areas
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX geo_geoarea_title_trgm ON geo_geoarea '
+            'USING gin (UPPER(title::text) gin_trgm_ops)',
+            'DROP INDEX geo_geoarea_title_trgm',
+        ),
+    ]
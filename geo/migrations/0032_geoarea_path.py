@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# Same as geo.models.GEO_AREA_PATH_QUERY
+GEO_AREA_PATH_QUERY = '''
+WITH RECURSIVE tree(id, path) AS (
+    SELECT geo_area.id, ARRAY[]::integer[]
+    FROM geo_geoarea geo_area
+    INNER JOIN geo_adminlevel admin_level
+        ON admin_level.id = geo_area.admin_level_id
+    WHERE geo_area.parent_id IS NULL AND admin_level.region_id = %s
+    UNION ALL
+    SELECT geo_area.id, tree.path || geo_area.parent_id
+    FROM geo_geoarea geo_area
+    INNER JOIN tree ON geo_area.parent_id = tree.id
+    WHERE NOT geo_area.id = ANY(tree.path)
+)
+UPDATE geo_geoarea SET path = tree.path
+FROM tree WHERE geo_geoarea.id = tree.id
+'''
+
+
+def update_paths(apps, schema_editor):
+    Region = apps.get_model('geo', 'Region')
+    for region_id in Region.objects.values_list('id', flat=True):
+        schema_editor.execute(GEO_AREA_PATH_QUERY, [region_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0031_geoarea_title_trgm_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geoarea',
+            name='path',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='geoarea',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['path'], name='geo_geoarea_path'),
+        ),
+        migrations.RunPython(update_paths, migrations.RunPython.noop),
+    ]
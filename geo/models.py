@@ -1,8 +1,15 @@
 from django.contrib.gis.db import models
-from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, transaction
+from django.core.files.base import ContentFile
+from django.core.serializers import serialize
 from user_resource.models import UserResource
 from gallery.models import File
 
+import gzip
+import hashlib
+
 
 class Region(UserResource):
     """
@@ -45,15 +52,22 @@ class Region(UserResource):
 
         region.created_by = user
         region.modified_by = user
-        region.save()
 
-        root_levels = AdminLevel.objects.filter(
-            region=self,
-            parent=None,
-        ).distinct()
+        with transaction.atomic():
+            region.save()
+
+            root_levels = AdminLevel.objects.filter(
+                region=self,
+                parent=None,
+            ).distinct()
+
+            # old admin level id -> new admin level id
+            level_map = {}
+            for root_level in root_levels:
+                root_level.clone_to(region, level_map=level_map)
 
-        for root_level in root_levels:
-            root_level.clone_to(region)
+            GeoArea.clone_for_admin_levels(level_map)
+            GeoArea.update_paths(region.id)
 
         return region
 
@@ -115,13 +129,70 @@ class AdminLevel(models.Model):
 
     stale_geo_areas = models.BooleanField(default=True)
 
+    # Cache of geojson (gzip compressed) and bounds of geo areas
+    geojson_file = models.FileField(upload_to='geojson/', max_length=255,
+                                    null=True, blank=True, default=None)
+    geojson_etag = models.CharField(max_length=255, blank=True)
+    bounds = JSONField(default=None, blank=True, null=True)
+
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['level']
 
-    def clone_to(self, region, parent=None):
+    def get_geojson(self):
+        return serialize(
+            'geojson',
+            self.geoarea_set.all(),
+            geometry_field='polygons',
+            fields=('pk', 'title', 'code', 'parent'),
+        )
+
+    def get_bounds(self):
+        extent = self.geoarea_set.filter(
+            polygons__isnull=False,
+        ).aggregate(extent=models.Extent('polygons'))['extent']
+        if not extent:
+            return None
+
+        min_x, min_y, max_x, max_y = extent
+        return {
+            'min_x': min_x,
+            'min_y': min_y,
+            'max_x': max_x,
+            'max_y': max_y,
+        }
+
+    def calc_cache(self, save=True):
+        """
+        Generate cache of geojson and bounds of the geo areas
+        """
+        geojson = gzip.compress(self.get_geojson().encode('utf-8'))
+
+        if self.geojson_file:
+            self.geojson_file.delete(save=False)
+        self.geojson_file.save(
+            'admin-level-{}.geojson.gz'.format(self.id),
+            ContentFile(geojson),
+            save=False,
+        )
+        self.geojson_etag = hashlib.sha1(geojson).hexdigest()
+        self.bounds = self.get_bounds()
+
+        if save:
+            self.save()
+
+    def clone_to(self, region, parent=None, level_map=None):
+        """
+        Clone this and all children admin levels to the region
+
+        Geo areas are not cloned here but can be, for all cloned admin
+        levels at once, with the ids collected in level_map.
+        """
+        if level_map is None:
+            level_map = {}
+
         admin_level = AdminLevel(
             region=region,
             parent=parent,
@@ -134,20 +205,17 @@ class AdminLevel(models.Model):
             geo_shape_file=self.geo_shape_file,
             tolerance=self.tolerance,
         )
-        admin_level.stale_geo_areas = True
+        admin_level.stale_geo_areas = self.stale_geo_areas
+        # The geojson file is generated again for the clone
+        # since the cached file is replaced when regenerated
+        admin_level.bounds = self.bounds
         admin_level.save()
-
-        # new_parent_areas = []
-        # for area in self.geoarea_set.all():
-        #     parent = None
-        #     if area.parent:
-        #         parent = next((p for p in new_parent_areas
-        #                       if p.title == area.parent.title and
-        #                       p.code == area.parent.code), None)
-        #     new_parent_areas.append(area.clone_to(self, parent))
+        level_map[self.id] = admin_level.id
 
         for child_level in self.adminlevel_set.all():
-            child_level.clone_to(region, admin_level)
+            # Cyclic check
+            if child_level.id not in level_map:
+                child_level.clone_to(region, admin_level, level_map)
 
         return admin_level
 
@@ -167,6 +235,59 @@ class AdminLevel(models.Model):
     def can_modify(self, user):
         return self.region.can_modify(user)
 
+    def get_geo_areas_containing(self, geo_area_ids):
+        """
+        Geo areas of this admin level which are, or are ancestors of,
+        the given geo areas
+        """
+        return self.geoarea_set.filter(
+            models.Q(id__in=geo_area_ids) |
+            models.Q(id__in=GeoArea.get_ancestor_ids(geo_area_ids))
+        )
+
+
+GEO_AREA_PATH_QUERY = '''
+WITH RECURSIVE tree(id, path) AS (
+    SELECT geo_area.id, ARRAY[]::integer[]
+    FROM geo_geoarea geo_area
+    INNER JOIN geo_adminlevel admin_level
+        ON admin_level.id = geo_area.admin_level_id
+    WHERE geo_area.parent_id IS NULL AND admin_level.region_id = %s
+    UNION ALL
+    SELECT geo_area.id, tree.path || geo_area.parent_id
+    FROM geo_geoarea geo_area
+    INNER JOIN tree ON geo_area.parent_id = tree.id
+    WHERE NOT geo_area.id = ANY(tree.path)
+)
+UPDATE geo_geoarea SET path = tree.path
+FROM tree WHERE geo_geoarea.id = tree.id
+'''
+
+
+GEO_AREA_CLONE_QUERY = '''
+WITH area_map AS (
+    SELECT id AS old_id,
+        nextval(pg_get_serial_sequence('geo_geoarea', 'id')) AS new_id
+    FROM geo_geoarea
+    WHERE admin_level_id = ANY(%(old_level_ids)s)
+),
+level_map AS (
+    SELECT
+        unnest(%(old_level_ids)s::integer[]) AS old_id,
+        unnest(%(new_level_ids)s::integer[]) AS new_id
+)
+INSERT INTO geo_geoarea
+    (id, admin_level_id, parent_id, title, code, data, polygons, path)
+SELECT
+    area_map.new_id, level_map.new_id, parent_map.new_id,
+    geo_area.title, geo_area.code, geo_area.data, geo_area.polygons,
+    ARRAY[]::integer[]
+FROM geo_geoarea geo_area
+INNER JOIN area_map ON area_map.old_id = geo_area.id
+INNER JOIN level_map ON level_map.old_id = geo_area.admin_level_id
+LEFT JOIN area_map parent_map ON parent_map.old_id = geo_area.parent_id
+'''
+
 
 class GeoArea(models.Model):
     """
@@ -183,20 +304,60 @@ class GeoArea(models.Model):
     # TODO Rename to geometry
     polygons = models.GeometryField(null=True, blank=True, default=None)
 
+    # Materialized path: ids of all ancestors, starting from the root
+    path = ArrayField(models.IntegerField(), default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['path'], name='geo_geoarea_path'),
+        ]
+
     def __str__(self):
         return self.title
 
-    def clone_to(self, admin_level, parent):
-        geo_area = GeoArea(
-            admin_level=admin_level,
-            parent=parent,
-            title='{} (cloned)'.format(self.title),
-            code=self.code,
-            data=self.data
+    @staticmethod
+    def update_paths(region_id):
+        """
+        Update paths of all geo areas of the region in one query
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(GEO_AREA_PATH_QUERY, [region_id])
+
+    @staticmethod
+    def get_ancestor_ids(geo_area_ids):
+        return set(
+            id
+            for path in GeoArea.objects.filter(
+                id__in=geo_area_ids,
+            ).values_list('path', flat=True)
+            for id in path
         )
-        geo_area.save()
 
-        return geo_area
+    def get_ancestors(self):
+        return GeoArea.objects.filter(id__in=self.path)
+
+    def get_descendants(self):
+        return GeoArea.objects.filter(path__contains=[self.id])
+
+    @staticmethod
+    def clone_for_admin_levels(level_map):
+        """
+        Clone all geo areas of the admin levels in one query
+
+        level_map: old admin level id -> new admin level id
+
+        Parents are remapped to the cloned geo areas.
+        Paths need to be updated afterwards.
+        """
+        if not level_map:
+            return
+
+        old_level_ids, new_level_ids = zip(*level_map.items())
+        with connection.cursor() as cursor:
+            cursor.execute(GEO_AREA_CLONE_QUERY, {
+                'old_level_ids': list(old_level_ids),
+                'new_level_ids': list(new_level_ids),
+            })
 
     # Permissions are same as region
     @staticmethod
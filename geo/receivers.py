@@ -0,0 +1,16 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from geo.models import Region, AdminLevel
+from geo.utils import invalidate_geo_options
+
+
+@receiver(post_save, sender=Region)
+def invalidate_geo_options_region_saved(sender, instance, **kwargs):
+    invalidate_geo_options(instance.id)
+
+
+@receiver(post_save, sender=AdminLevel)
+@receiver(post_delete, sender=AdminLevel)
+def invalidate_geo_options_admin_level_changed(sender, instance, **kwargs):
+    invalidate_geo_options(instance.region_id)
@@ -1,15 +1,17 @@
-from celery import shared_task
-from django.conf import settings
+from celery import chain, group, shared_task
 from django.contrib.gis.gdal import DataSource
 from django.contrib.gis.geos import GEOSGeometry
-from django.db.models import Q
+from django.db import connection, transaction
 from geo.models import Region, AdminLevel, GeoArea
 
 from redis_store import redis
 
+from collections import OrderedDict
 import os
 import reversion
+import shutil
 import tempfile
+import time
 import zipfile
 
 import traceback
@@ -27,183 +29,411 @@ def add(x, y):
     return x + y
 
 
-def _save_geo_area(admin_level, parent, feature):
-    name = None
-    code = None
+GEO_AREA_CHUNK_SIZE = 500
 
-    if admin_level.name_prop:
-        name = feature.get(admin_level.name_prop)
-    if admin_level.code_prop:
-        code = feature.get(admin_level.code_prop)
+GEO_AREA_UPDATE_QUERY = '''
+UPDATE geo_geoarea AS geo_area SET
+    title = value.title,
+    code = value.code,
+    parent_id = value.parent_id::integer,
+    polygons = ST_SetSRID(ST_GeomFromWKB(value.polygons::bytea), %s)
+FROM (VALUES {}) AS value(id, title, code, parent_id, polygons)
+WHERE geo_area.id = value.id
+'''
 
-    name = name or ''
 
-    geo_area = GeoArea.objects.filter(
-        Q(code=None, title=name) | Q(code=code),
-        admin_level=admin_level,
-    ).first()
-
-    if not geo_area:
-        geo_area = GeoArea()
+class GeoAreaImporter:
+    """
+    Import all features of a layer as geo areas of an admin level
 
-    geo_area.title = name
-    geo_area.code = code if code else name
-    geo_area.admin_level = admin_level
+    Existing geo areas of the admin level and the geo areas of its parent
+    are loaded once and matched in memory. New geo areas are then bulk
+    created and existing ones updated in chunks.
 
-    geom = feature.geom
-    geom = GEOSGeometry(geom.wkt).simplify(
-        tolerance=admin_level.tolerance,
-        preserve_topology=True,
-    )
+    Bulk writes record no revisions of the geo areas, so a revision of
+    the whole region is recorded once all its admin levels are loaded.
+    """
+    def __init__(self, admin_level, parent):
+        self.admin_level = admin_level
+        self.parent = parent
+
+        # Existing geo areas by code and by title (for ones without code)
+        self.areas_by_code = {}
+        self.areas_by_title = {}
+        for geo_area in GeoArea.objects.filter(
+            admin_level=admin_level,
+        ).defer('polygons').order_by('-pk'):
+            if geo_area.code is None:
+                self.areas_by_title[geo_area.title] = geo_area
+            else:
+                self.areas_by_code[geo_area.code] = geo_area
+
+        # Parent geo areas by title, by (title, code) and by code
+        # keeping the first one, which the lookups used to return
+        self.parents_by_title = {}
+        self.parents_by_title_code = {}
+        self.parents_by_code = {}
+        if parent:
+            for id, title, code in GeoArea.objects.filter(
+                admin_level=parent,
+            ).order_by('-pk').values_list('id', 'title', 'code'):
+                self.parents_by_title[title] = id
+                self.parents_by_title_code[(title, code)] = id
+                self.parents_by_code[code] = id
 
-    # if geom.geom_type == 'Polygon':
-    #     geom = MultiPolygon(geom)
-    # elif geom.geom_type != 'MultiPolygon':
-    #     raise Exception('Invalid geometry type for geoarea')
+        # Added geo areas in order, keyed by their object id
+        # since new ones don't have pk yet
+        self.areas = OrderedDict()
+        self.new_areas = []
 
-    geo_area.polygons = geom
-    feature_names = [f.decode('utf-8') for f in feature.fields]
+    def get_parent_id(self, feature, feature_names, default=None):
+        admin_level = self.admin_level
 
-    if parent:
         if admin_level.parent_name_prop and \
                 admin_level.parent_name_prop in feature_names:
-            candidates = GeoArea.objects.filter(
-                admin_level=parent,
-                title=feature.get(admin_level.parent_name_prop)
-            )
-
+            title = feature.get(admin_level.parent_name_prop)
             if admin_level.parent_code_prop:
-                candidates = candidates.filter(
-                    code=feature.get(admin_level.parent_code_prop)
-                )
-            geo_area.parent = candidates.first()
+                return self.parents_by_title_code.get((
+                    title, feature.get(admin_level.parent_code_prop),
+                ))
+            return self.parents_by_title.get(title)
 
         elif admin_level.parent_code_prop and \
                 admin_level.parent_code_prop in feature_names:
-            geo_area.parent = GeoArea.objects.filter(
-                admin_level=parent,
-                code=feature.get(admin_level.parent_code_prop)
-            ).first()
+            return self.parents_by_code.get(
+                feature.get(admin_level.parent_code_prop)
+            )
+
+        return default
+
+    def add_feature(self, feature):
+        admin_level = self.admin_level
+
+        name = None
+        code = None
+
+        if admin_level.name_prop:
+            name = feature.get(admin_level.name_prop)
+        if admin_level.code_prop:
+            code = feature.get(admin_level.code_prop)
+
+        name = name or ''
+
+        geo_area = self.areas_by_code.get(code) or \
+            self.areas_by_title.get(name)
+
+        if not geo_area:
+            geo_area = GeoArea(admin_level=admin_level)
+            self.new_areas.append(geo_area)
+        self.areas[id(geo_area)] = geo_area
+
+        geo_area.title = name
+        geo_area.code = code if code else name
+        # Later features with the same code update the same geo area
+        self.areas_by_code[geo_area.code] = geo_area
+
+        geo_area.polygons = GEOSGeometry(
+            memoryview(feature.geom.wkb),
+        ).simplify(
+            tolerance=admin_level.tolerance,
+            preserve_topology=True,
+        )
+
+        if self.parent:
+            feature_names = [f.decode('utf-8') for f in feature.fields]
+            geo_area.parent_id = self.get_parent_id(
+                feature, feature_names, geo_area.parent_id,
+            )
+
+    def save(self, chunk_size=GEO_AREA_CHUNK_SIZE):
+        new_area_ids = set(id(geo_area) for geo_area in self.new_areas)
+        updated_areas = [
+            geo_area for key, geo_area in self.areas.items()
+            if key not in new_area_ids
+        ]
+
+        with transaction.atomic():
+            GeoArea.objects.bulk_create(self.new_areas, batch_size=chunk_size)
 
-    geo_area.save()
-    return geo_area
+            for i in range(0, len(updated_areas), chunk_size):
+                self.update(updated_areas[i:i + chunk_size])
+
+            # Delete all previous geo areas that have not been added
+            GeoArea.objects.filter(
+                admin_level=self.admin_level
+            ).exclude(
+                id__in=[geo_area.id for geo_area in self.areas.values()],
+            ).delete()
+
+        return len(self.new_areas), len(updated_areas)
+
+    def update(self, geo_areas):
+        params = []
+        for geo_area in geo_areas:
+            params.extend([
+                geo_area.id,
+                geo_area.title,
+                geo_area.code,
+                geo_area.parent_id,
+                bytes(geo_area.polygons.wkb)
+                if geo_area.polygons is not None else None,
+            ])
+
+        srid = GeoArea._meta.get_field('polygons').srid
+        query = GEO_AREA_UPDATE_QUERY.format(
+            ', '.join(['(%s, %s, %s, %s, %s)'] * len(geo_areas))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(query, [srid] + params)
+
+
+def _open_data_source(geo_shape_file, tmpdirname):
+    """
+    Copy the geo shape file to a local temporary directory, extracting
+    it if it is zipped, and open it with GDAL.
+
+    This is necessary in server where the file is originally in s3 server
+    and GDAL expects file in local disk.
+    """
+    filename, extension = os.path.splitext(geo_shape_file.file.name)
+    local_path = os.path.join(tmpdirname, 'geo_shape{}'.format(extension))
+
+    geo_shape_file.file.open('rb')
+    with open(local_path, 'wb') as f:
+        shutil.copyfileobj(geo_shape_file.file, f)
+    geo_shape_file.file.close()
+
+    if extension == '.zip':
+        shape_dir = os.path.join(tmpdirname, 'shape')
+        zipfile.ZipFile(local_path, 'r').extractall(shape_dir)
+        files = os.listdir(shape_dir)
+        shape_file = next((f for f in files if f.endswith('.shp')), None)
+        return DataSource(os.path.join(shape_dir, shape_file))
+    return DataSource(local_path)
 
 
 def _generate_geo_areas(admin_level, parent):
     # Get the geo shape file
     geo_shape_file = admin_level.geo_shape_file
     if geo_shape_file:
-        # Create temporary file with same content
-        # This is necessary in server where the file is
-        # originally in s3 server and GDAL expects file in local
-        # disk.
-        # Then load data from that file
-        filename, extension = os.path.splitext(geo_shape_file.file.name)
-        f = tempfile.NamedTemporaryFile(suffix=extension,
-                                        dir=settings.BASE_DIR)
-        f.write(geo_shape_file.file.read())
-
-        # Flush the file before reading it with GDAL
-        # Otherwise, for small files, GDAL may attempt to read before
-        # the write is complete and will raise an exception.
-        f.flush()
-
-        if extension == '.zip':
-            with tempfile.TemporaryDirectory(
-                dir=settings.BASE_DIR
-            ) as tmpdirname:
-                zipfile.ZipFile(f.name, 'r').extractall(tmpdirname)
-                files = os.listdir(tmpdirname)
-                shape_file = next((f for f in files if f.endswith('.shp')),
-                                  None)
-                data_source = DataSource(os.path.join(tmpdirname, shape_file))
-        else:
-            data_source = DataSource(f.name)
-
-        f.close()
-
-        # If more than one layer exists, extract from the first layer
-        if data_source.layer_count == 1:
-            layer = data_source[0]
-
-            added_areas = []
-            for feature in layer:
-                # Each feature is a geo area
-                geo_area = _save_geo_area(
-                    admin_level, parent,
-                    feature,
-                )
-                added_areas.append(geo_area.id)
-
-            # Delete all previous geo areas that have not been added
-            GeoArea.objects.filter(
-                admin_level=admin_level
-            ).exclude(id__in=added_areas).delete()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            data_source = _open_data_source(geo_shape_file, tmpdirname)
+            _import_data_source(admin_level, parent, data_source)
 
     admin_level.stale_geo_areas = False
+    admin_level.calc_cache(save=False)
     admin_level.save()
 
 
-def _extract_from_admin_levels(admin_levels, parent, completed_levels):
-    for admin_level in admin_levels:
-        # Cyclic check
-        if admin_level.id in completed_levels:
-            continue
-        completed_levels.append(admin_level.id)
-
-        # Generate geo areas
-        _generate_geo_areas(admin_level, parent)
-
-        # Extract children areas
-        children_levels = AdminLevel.objects.filter(parent=admin_level)
-        if children_levels.count() > 0:
-            _extract_from_admin_levels(
-                children_levels,
-                admin_level,
-                completed_levels,
+def _import_data_source(admin_level, parent, data_source):
+    # If more than one layer exists, extract from the first layer
+    if data_source.layer_count == 1:
+        layer = data_source[0]
+
+        start = time.time()
+        importer = GeoAreaImporter(admin_level, parent)
+        for feature in layer:
+            # Each feature is a geo area
+            importer.add_feature(feature)
+        read_time = time.time() - start
+
+        created, updated = importer.save()
+        logger.info(
+            'Admin level {}: {} geo areas created and {} updated '
+            'in {:.2f}s (read: {:.2f}s, write: {:.2f}s)'.format(
+                admin_level.id, created, updated,
+                time.time() - start, read_time,
+                time.time() - start - read_time,
             )
+        )
 
 
-def _load_geo_areas(region_id):
+def get_progress_key(region_id):
+    return 'load_geo_areas_progress_{}'.format(region_id)
+
+
+def get_lock_key(region_id):
+    return 'load_geo_areas_{}'.format(region_id)
+
+
+# Lifetime of the region lock, in case the load never finishes
+LOAD_GEO_AREAS_LOCK_TIMEOUT = 60 * 60 * 2
+
+
+def get_load_progress(region_id):
     """
-    The main load geo areas procedure
+    Status of loading geo areas of each admin level of the region
 
-    Basically, it  starts with root admin level and iterate through all the
-    children.
+    admin level id -> pending/started/completed/failed/skipped/locked
     """
+    return {
+        int(admin_level_id): status.decode('utf-8')
+        for admin_level_id, status in redis.get_connection().hgetall(
+            get_progress_key(region_id),
+        ).items()
+    }
 
-    with reversion.create_revision():
-        region = Region.objects.get(pk=region_id)
 
-        if AdminLevel.objects.filter(region=region).count() == 0:
-            return True
+def _set_progress(region_id, admin_level_id, status):
+    key = get_progress_key(region_id)
+    r = redis.get_connection()
+    r.hset(key, admin_level_id, status)
+    r.expire(key, 60 * 60 * 24)
 
-        parent_admin_levels = AdminLevel.objects.filter(
-            region=region, parent=None
-        )
-        completed_levels = []
-        _extract_from_admin_levels(
-            parent_admin_levels,
-            None,
-            completed_levels,
-        )
+    progress = get_load_progress(region_id)
+    done = [s for s in progress.values() if s not in ['pending', 'started']]
+    logger.info('Region {}: admin level {} {} ({}/{} done)'.format(
+        region_id, admin_level_id, status, len(done), len(progress),
+    ))
+
+
+def _get_level_waves(region):
+    """
+    Group admin levels of the region by their depth, so that each level
+    comes after its parent and levels of the same depth are independent
+    """
+    waves = []
+    completed_levels = set()
+
+    admin_levels = list(AdminLevel.objects.filter(
+        region=region, parent=None,
+    ))
+    while admin_levels:
+        # Cyclic check
+        admin_levels = [
+            admin_level for admin_level in admin_levels
+            if admin_level.id not in completed_levels
+        ]
+        if not admin_levels:
+            break
+
+        completed_levels.update(admin_level.id for admin_level in admin_levels)
+        waves.append([admin_level.id for admin_level in admin_levels])
+        admin_levels = list(AdminLevel.objects.filter(
+            parent__in=admin_levels,
+        ))
+
+    return waves
+
+
+def _load_admin_level_geo_areas(admin_level_id):
+    admin_level = AdminLevel.objects.select_related(
+        'parent', 'geo_shape_file',
+    ).get(pk=admin_level_id)
+    region_id = admin_level.region_id
+    parent = admin_level.parent
+
+    # Geo areas can't be linked to parents which failed to load
+    if parent and get_load_progress(region_id).get(parent.id) in \
+            ['failed', 'skipped', 'locked']:
+        _set_progress(region_id, admin_level_id, 'skipped')
+        return False
 
+    _set_progress(region_id, admin_level_id, 'started')
+    _generate_geo_areas(admin_level, parent)
+    _set_progress(region_id, admin_level_id, 'completed')
     return True
 
 
 @shared_task
-def load_geo_areas(region_id):
-    key = 'load_geo_areas_{}'.format(region_id)
+def load_admin_level_geo_areas(admin_level_id):
+    key = 'load_admin_level_geo_areas_{}'.format(admin_level_id)
     lock = redis.get_lock(key, 60 * 30)  # Lock lifetime 30 minutes
     have_lock = lock.acquire(blocking=False)
     if not have_lock:
+        # Already being loaded elsewhere, eg: by a stale region load
+        region_id = AdminLevel.objects.filter(
+            pk=admin_level_id,
+        ).values_list('region_id', flat=True).first()
+        if region_id:
+            _set_progress(region_id, admin_level_id, 'locked')
         return False
 
     try:
-        return_value = _load_geo_areas(region_id)
+        return_value = _load_admin_level_geo_areas(admin_level_id)
     except Exception:
         logger.error(traceback.format_exc())
+        admin_level = AdminLevel.objects.filter(pk=admin_level_id).first()
+        if admin_level:
+            _set_progress(admin_level.region_id, admin_level_id, 'failed')
         return_value = False
 
     lock.release()
     return return_value
+
+
+@shared_task
+def finish_load_geo_areas(region_id):
+    try:
+        GeoArea.update_paths(region_id)
+        # Admin levels and geo areas are recorded along with the region
+        with reversion.create_revision():
+            reversion.add_to_revision(Region.objects.get(pk=region_id))
+            reversion.set_comment('Loaded geo areas')
+    finally:
+        # Acquired by _load_geo_areas in another task
+        redis.get_connection().delete(get_lock_key(region_id))
+
+    progress = get_load_progress(region_id)
+    logger.info('Region {}: geo areas loaded {}'.format(region_id, progress))
+    return all(status == 'completed' for status in progress.values())
+
+
+def _load_geo_areas(region_id):
+    """
+    The main load geo areas procedure
+
+    Admin levels of the same depth are loaded in parallel as separate
+    tasks, each depth after the previous one has completed.
+
+    The region stays locked until the last task has finished, so that
+    only one load of the region runs at a time.
+    """
+    region = Region.objects.get(pk=region_id)
+
+    waves = _get_level_waves(region)
+    if not waves:
+        return True
+
+    r = redis.get_connection()
+    lock_key = get_lock_key(region_id)
+    if not r.set(lock_key, 1, nx=True, ex=LOAD_GEO_AREAS_LOCK_TIMEOUT):
+        logger.warning(
+            'Region {}: geo areas are already being loaded'.format(region_id)
+        )
+        return False
+
+    key = get_progress_key(region_id)
+    r.delete(key)
+    r.hmset(key, {
+        admin_level_id: 'pending'
+        for wave in waves
+        for admin_level_id in wave
+    })
+    r.expire(key, 60 * 60 * 24)
+
+    workflow = chain(*[
+        group(
+            load_admin_level_geo_areas.si(admin_level_id)
+            for admin_level_id in wave
+        )
+        for wave in waves
+    ], finish_load_geo_areas.si(region_id))
+
+    try:
+        workflow.apply_async()
+    except Exception:
+        r.delete(lock_key)
+        raise
+    return True
+
+
+@shared_task
+def load_geo_areas(region_id):
+    try:
+        return_value = _load_geo_areas(region_id)
+    except Exception:
+        logger.error(traceback.format_exc())
+        return_value = False
+
+    return return_value
@@ -1,7 +1,12 @@
+from django.contrib.gis.geos import GEOSGeometry
+
 from deep.tests import TestCase
 from geo.models import Region, AdminLevel, GeoArea
+from geo.tiles import TILE_MIME_TYPE, supports_tiles
 from project.models import Project
 
+import json
+
 
 class RegionTests(TestCase):
     def test_create_region(self):
@@ -47,6 +52,33 @@ class RegionTests(TestCase):
         new_region = Region.objects.get(id=response.data['id'])
         self.assertTrue(new_region in project.regions.all())
 
+    def test_clone_region_geo_areas(self):
+        region = self.create(Region)
+        admin_level1 = self.create(AdminLevel, region=region, parent=None)
+        admin_level2 = self.create(AdminLevel, region=region,
+                                   parent=admin_level1)
+        geo_area1 = self.create(GeoArea, admin_level=admin_level1,
+                                parent=None)
+        self.create(GeoArea, admin_level=admin_level2, parent=geo_area1)
+
+        url = '/api/v1/clone-region/{}/'.format(region.id)
+
+        self.authenticate()
+        response = self.client.post(url)
+        self.assert_201(response)
+
+        new_areas = GeoArea.objects.filter(
+            admin_level__region__id=response.data['id'],
+        )
+        self.assertEqual(new_areas.count(), 2)
+
+        new_child = new_areas.get(parent__isnull=False)
+        self.assertEqual(new_child.admin_level.parent.region.id,
+                         response.data['id'])
+        self.assertEqual(new_child.parent.title, geo_area1.title)
+        self.assertNotEqual(new_child.parent.id, geo_area1.id)
+        self.assertEqual(new_child.path, [new_child.parent.id])
+
     def test_trigger_api(self):
         region = self.create(Region)
         url = '/api/v1/geo-areas-load-trigger/{}/'.format(region.id)
@@ -98,3 +130,130 @@ class GeoOptionsApi(TestCase):
         self.assertEqual(response.data[str(region.id)][1].get('label'),
                          '{} / {}'.format(admin_level2.title,
                                           geo_area2.title))
+
+        # Only the given admin levels
+        response = self.client.get('{}?regions={}&admin_levels={}'.format(
+            url, region.id, admin_level1.id,
+        ))
+        self.assert_200(response)
+
+        self.assertEqual(len(response.data[str(region.id)]), 1)
+        self.assertEqual(response.data[str(region.id)][0].get('key'),
+                         str(geo_area1.id))
+
+        # Options are regenerated when admin level changes
+        admin_level1.title = 'New title'
+        admin_level1.save()
+
+        response = self.client.get(url)
+        self.assert_200(response)
+
+        self.assertEqual(response.data[str(region.id)][0].get('label'),
+                         '{} / {}'.format('New title', geo_area1.title))
+
+    def test_geo_area_search(self):
+        region = self.create(Region, public=True)
+        admin_level = self.create(AdminLevel, region=region)
+        self.create(GeoArea, admin_level=admin_level, title='Kathmandu')
+        self.create(GeoArea, admin_level=admin_level, title='Bhaktapur')
+
+        url = '/api/v1/geo-areas/search/?search=kath'
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Kathmandu')
+
+        # Invalid limits fall back to the default or are clamped
+        for limit in ['abc', '-1', '0']:
+            response = self.client.get(
+                '/api/v1/geo-areas/search/?search=k&limit={}'.format(limit)
+            )
+            self.assert_200(response)
+            self.assertEqual(len(response.data['results']), 1)
+
+
+class GeoTileApi(TestCase):
+    def test_invalid_tile(self):
+        admin_level = self.create(AdminLevel)
+
+        url = '/api/v1/admin-levels/{}/tiles/1/2/0/'.format(admin_level.id)
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_404(response)
+
+        # Zoom beyond the max zoom
+        url = '/api/v1/admin-levels/{}/tiles/1000/0/0/'.format(
+            admin_level.id,
+        )
+        response = self.client.get(url)
+        self.assert_404(response)
+
+    def test_tile(self):
+        if not supports_tiles():
+            self.skipTest('needs PostGIS 2.4 or later built with protobuf')
+
+        region = self.create(Region, public=True)
+        admin_level = self.create(AdminLevel, region=region, level=1)
+        self.create(
+            GeoArea,
+            admin_level=admin_level,
+            title='Kathmandu',
+            polygons=GEOSGeometry(
+                'MULTIPOLYGON(((85 27, 86 27, 86 28, 85 28, 85 27)))',
+                srid=4326,
+            ),
+        )
+
+        # Tile at zoom 1 with the polygon and one without it
+        url = '/api/v1/admin-levels/{}/tiles/1/1/0/'.format(admin_level.id)
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertEqual(response['Content-Type'], TILE_MIME_TYPE)
+        self.assertIn(b'admin_level_1', response.content)
+        self.assertIn(b'Kathmandu', response.content)
+
+        url = '/api/v1/admin-levels/{}/tiles/1/0/1/'.format(admin_level.id)
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertEqual(response.content, b'')
+
+
+class GeoJsonApi(TestCase):
+    def test_geojson_etag(self):
+        admin_level = self.create(AdminLevel)
+        self.create(GeoArea, admin_level=admin_level, polygons=None)
+
+        url = '/api/v1/admin-levels/{}/geojson/'.format(admin_level.id)
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertEqual(len(json.loads(response.content)['features']), 1)
+
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_bounds_etag(self):
+        admin_level = self.create(AdminLevel)
+
+        url = '/api/v1/admin-levels/{}/geojson/bounds/'.format(
+            admin_level.id,
+        )
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertIsNone(response.data['bounds'])
+
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
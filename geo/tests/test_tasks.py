@@ -1,14 +1,24 @@
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 
 from deep.tests import TestCase
-from geo.tasks import load_geo_areas
+from geo.tasks import (
+    load_geo_areas,
+    get_load_progress,
+    get_lock_key,
+    get_progress_key,
+)
 from geo.models import Region, AdminLevel, GeoArea
 from gallery.models import File
+from redis_store import redis
+from reversion.models import Version
 
+import json
 import os
 
 
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
 class LoadGeoAreasTaskTest(TestCase):
     def setUp(self):
         super().setUp()
@@ -64,6 +74,13 @@ class LoadGeoAreasTaskTest(TestCase):
         self.admin_level1 = admin_level1
 
     def tearDown(self):
+        r = redis.get_connection()
+        r.delete(get_lock_key(self.region.pk))
+        r.delete(get_progress_key(self.region.pk))
+        r.delete(
+            'load_admin_level_geo_areas_{}'.format(self.admin_level0.pk),
+        )
+
         if os.path.isfile(self.admin_level0.geo_shape_file.file.path):
             os.unlink(self.admin_level0.geo_shape_file.file.path)
         if os.path.isfile(self.admin_level1.geo_shape_file.file.path):
@@ -78,6 +95,10 @@ class LoadGeoAreasTaskTest(TestCase):
         self.assertFalse(latest_a0.stale_geo_areas)
         self.assertFalse(latest_a1.stale_geo_areas)
 
+        progress = get_load_progress(self.region.pk)
+        self.assertEqual(progress[self.admin_level0.pk], 'completed')
+        self.assertEqual(progress[self.admin_level1.pk], 'completed')
+
         # Test if a geo area in admin level 0 is correctly set
         bagmati = GeoArea.objects.filter(
             title='Bagmati',
@@ -99,6 +120,52 @@ class LoadGeoAreasTaskTest(TestCase):
 
         self.assertIsNotNone(sindhupalchowk)
 
+        # A revision of the region is recorded once loaded
+        self.assertEqual(
+            Version.objects.get_for_object(self.region).count(), 1,
+        )
+
+        # The region is unlocked once loaded
+        self.assertFalse(
+            redis.get_connection().exists(get_lock_key(self.region.pk))
+        )
+
+        # Test geo area hierarchy
+        self.assertIn(bagmati, sindhupalchowk.get_ancestors())
+        self.assertIn(sindhupalchowk, bagmati.get_descendants())
+        self.assertIn(
+            bagmati,
+            self.admin_level0.get_geo_areas_containing([sindhupalchowk.id]),
+        )
+
+    def test_load_areas_locked_region(self):
+        r = redis.get_connection()
+        r.set(get_lock_key(self.region.pk), 1)
+        r.hset(get_progress_key(self.region.pk), self.admin_level0.pk,
+               'started')
+
+        # Progress of the running load is kept
+        result = load_geo_areas(self.region.pk)
+        self.assertFalse(result)
+        self.assertEqual(
+            get_load_progress(self.region.pk),
+            {self.admin_level0.pk: 'started'},
+        )
+        self.assertFalse(GeoArea.objects.exists())
+
+    def test_load_areas_locked_admin_level(self):
+        lock = redis.get_lock(
+            'load_admin_level_geo_areas_{}'.format(self.admin_level0.pk),
+        )
+        lock.acquire(blocking=False)
+
+        load_geo_areas(self.region.pk)
+        lock.release()
+
+        progress = get_load_progress(self.region.pk)
+        self.assertEqual(progress[self.admin_level0.pk], 'locked')
+        self.assertEqual(progress[self.admin_level1.pk], 'skipped')
+
     def test_geojson_api(self):
         result = load_geo_areas(self.region.pk)
         self.assertTrue(result)
@@ -110,9 +177,10 @@ class LoadGeoAreasTaskTest(TestCase):
         response = self.client.get(url)
         self.assert_200(response)
 
-        self.assertEqual(response.data['type'], 'FeatureCollection')
-        self.assertIsNotNone(response.data['features'])
-        self.assertTrue(len(response.data['features']) > 0)
+        data = json.loads(response.content)
+        self.assertEqual(data['type'], 'FeatureCollection')
+        self.assertIsNotNone(data['features'])
+        self.assertTrue(len(data['features']) > 0)
 
         # Test if geobounds also works
         url = '/api/v1/admin-levels/{}/geojson/bounds/'.format(
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.db import connection
+
+
+# Half of the web mercator world width in meters
+WEB_MERCATOR_MAX = 20037508.342789244
+
+# Resolution of the tile geometries
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+TILE_MIME_TYPE = 'application/vnd.mapbox-vector-tile'
+
+ADMIN_LEVEL_TILE_QUERY = '''
+WITH bounds AS (
+    SELECT ST_MakeEnvelope(%(min_x)s, %(min_y)s, %(max_x)s, %(max_y)s, 3857)
+        AS geom
+),
+tile AS (
+    SELECT
+        geo_area.id,
+        geo_area.title,
+        geo_area.code,
+        geo_area.parent_id AS parent,
+        ST_AsMVTGeom(
+            ST_SimplifyPreserveTopology(
+                ST_Transform(geo_area.polygons, 3857),
+                %(tolerance)s
+            ),
+            bounds.geom,
+            %(extent)s, %(buffer)s, true
+        ) AS geom
+    FROM geo_geoarea geo_area, bounds
+    WHERE geo_area.admin_level_id = %(admin_level_id)s
+        AND geo_area.polygons && ST_Transform(bounds.geom, 4326)
+)
+SELECT ST_AsMVT(tile, %(layer)s, %(extent)s, 'geom')
+FROM tile
+WHERE tile.geom IS NOT NULL
+'''
+
+
+# Whether the database supports vector tiles, checked once per process
+_supports_tiles = None
+
+
+def supports_tiles():
+    """
+    ST_AsMVT is only available since PostGIS 2.4, when built with protobuf
+    """
+    global _supports_tiles
+    if _supports_tiles is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT EXISTS(SELECT 1 FROM pg_proc WHERE proname = %s)",
+                ['st_asmvt'],
+            )
+            _supports_tiles = cursor.fetchone()[0]
+    return _supports_tiles
+
+
+def is_valid_tile(z, x, y):
+    if not 0 <= z <= settings.GEO_TILE_MAX_ZOOM:
+        return False
+    return 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def get_tile_bounds(z, x, y):
+    """
+    Bounds of the tile z/x/y in web mercator
+    """
+    size = 2 * WEB_MERCATOR_MAX / 2 ** z
+    min_x = -WEB_MERCATOR_MAX + x * size
+    max_y = WEB_MERCATOR_MAX - y * size
+    return min_x, max_y - size, min_x + size, max_y
+
+
+def get_admin_level_tile(admin_level, z, x, y):
+    """
+    Mapbox vector tile z/x/y containing geo areas of the admin level
+
+    Geometries are simplified to the resolution of the tile,
+    so that lower zoom levels only carry the detail that can be seen.
+    """
+    min_x, min_y, max_x, max_y = get_tile_bounds(z, x, y)
+
+    with connection.cursor() as cursor:
+        cursor.execute(ADMIN_LEVEL_TILE_QUERY, {
+            'min_x': min_x,
+            'min_y': min_y,
+            'max_x': max_x,
+            'max_y': max_y,
+            'tolerance': (max_x - min_x) / TILE_EXTENT,
+            'extent': TILE_EXTENT,
+            'buffer': TILE_BUFFER,
+            'admin_level_id': admin_level.id,
+            'layer': 'admin_level_{}'.format(admin_level.level or 0),
+        })
+        row = cursor.fetchone()
+
+    return bytes(row[0]) if row and row[0] else b''
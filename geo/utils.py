@@ -0,0 +1,78 @@
+from redis_store import redis
+
+import json
+
+
+# Cached geo options expire after a week of not being regenerated
+GEO_OPTIONS_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def get_geo_area_option(geo_area):
+    return {
+        'label': '{} / {}'.format(geo_area.admin_level.title,
+                                  geo_area.title),
+        'title': geo_area.title,
+        'key': str(geo_area.id),
+        'admin_level': geo_area.admin_level.level,
+        'admin_level_id': geo_area.admin_level.id,
+        'admin_level_title': geo_area.admin_level.title,
+        'region': geo_area.admin_level.region.id,
+        'region_title': geo_area.admin_level.region.title,
+    }
+
+
+def _get_version_key(region_id):
+    return 'geo_options_version_{}'.format(region_id)
+
+
+def get_geo_options_version(region_id):
+    version = redis.get_connection().get(_get_version_key(region_id))
+    return int(version) if version else 0
+
+
+def invalidate_geo_options(region_id):
+    """
+    Geo options of the region are regenerated on the next request
+    """
+    redis.get_connection().incr(_get_version_key(region_id))
+
+
+def get_geo_options(region, admin_level_ids=None):
+    """
+    Geo options of all geo areas of the region
+
+    Options are cached per version of the region's geo options.
+    """
+    version = get_geo_options_version(region.id)
+    key = 'geo_options_{}_{}'.format(region.id, version)
+
+    r = redis.get_connection()
+    options = r.get(key)
+    if options:
+        options = json.loads(options.decode('utf-8'))
+    else:
+        options = [
+            get_geo_area_option(geo_area)
+            for geo_area in region.get_geo_areas()
+        ]
+        r.set(key, json.dumps(options), ex=GEO_OPTIONS_TIMEOUT)
+
+    if admin_level_ids is not None:
+        options = [
+            option for option in options
+            if option['admin_level_id'] in admin_level_ids
+        ]
+    return options
+
+
+def search_geo_areas(geo_areas, search, limit=50):
+    """
+    Geo areas whose title starts with search
+
+    The prefix search uses the trigram index on upper(title).
+    """
+    return geo_areas.filter(
+        title__istartswith=search,
+    ).select_related(
+        'admin_level', 'admin_level__region',
+    ).order_by('title', 'admin_level__level')[:limit]
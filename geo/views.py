@@ -1,7 +1,7 @@
 from django.conf import settings
-from django.contrib.gis.gdal import Envelope
-from django.core.serializers import serialize
 from django.db import models
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
 from rest_framework import (
     exceptions,
     filters,
@@ -24,6 +24,20 @@ from .serializers import (
 )
 
 from geo.tasks import load_geo_areas
+from geo.utils import (
+    get_geo_area_option,
+    get_geo_options,
+    get_geo_options_version,
+    search_geo_areas,
+)
+from geo.tiles import (
+    TILE_MIME_TYPE,
+    get_admin_level_tile,
+    is_valid_tile,
+    supports_tiles,
+)
+import gzip
+import hashlib
 import json
 
 
@@ -144,6 +158,29 @@ class GeoAreasLoadTriggerView(views.APIView):
         })
 
 
+def _get_id_list(value):
+    if value is None:
+        return None
+    try:
+        return [int(id) for id in value.split(',') if id]
+    except ValueError:
+        raise exceptions.ValidationError('Invalid id list: {}'.format(value))
+
+
+def _etag_response(request, etag, get_response):
+    """
+    Respond with 304 if the client already has the content with given
+    etag, otherwise with the response from get_response
+    """
+    etag = '"{}"'.format(etag)
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = get_response()
+    response['ETag'] = etag
+    return response
+
+
 class GeoJsonView(views.APIView):
     """
     A view that returns geojson for given admin level
@@ -160,17 +197,64 @@ class GeoJsonView(views.APIView):
         if not admin_level.can_get(request.user):
             raise exceptions.PermissionDenied()
 
-        return response.Response(json.loads(serialize(
-            'geojson',
-            admin_level.geoarea_set.all(),
-            geometry_field='polygons',
-            fields=('pk', 'title', 'code', 'parent'),
-        )))
+        if not admin_level.geojson_file:
+            admin_level.calc_cache()
+
+        # The geojson is stored gzip compressed and is sent as it is
+        # to clients that accept gzip
+        gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        def get_response():
+            admin_level.geojson_file.open('rb')
+            content = admin_level.geojson_file.read()
+            admin_level.geojson_file.close()
+
+            if not gzipped:
+                content = gzip.decompress(content)
+            response = HttpResponse(content, content_type='application/json')
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+            return response
+
+        etag = admin_level.geojson_etag
+        if not gzipped:
+            etag = '{}-identity'.format(etag)
+
+        response = _etag_response(request, etag, get_response)
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class GeoTileView(views.APIView):
+    """
+    A view that returns mapbox vector tile z/x/y for given admin level
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, admin_level_id, z, x, y, version=None):
+        z, x, y = int(z), int(x), int(y)
+        if not is_valid_tile(z, x, y):
+            raise exceptions.NotFound()
+
+        admin_level = get_object_or_404(AdminLevel, id=admin_level_id)
+        if not admin_level.can_get(request.user):
+            raise exceptions.PermissionDenied()
+
+        if not supports_tiles():
+            return response.Response({
+                'error': 'Vector tiles need PostGIS 2.4 or later '
+                         'built with protobuf',
+            }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        return HttpResponse(
+            get_admin_level_tile(admin_level, z, x, y),
+            content_type=TILE_MIME_TYPE,
+        )
 
 
 class GeoBoundsView(views.APIView):
     """
-    A view that returns geojson for given admin level
+    A view that returns bounds of geo areas of given admin level
     """
     permission_classes = [permissions.IsAuthenticated]
 
@@ -182,32 +266,24 @@ class GeoBoundsView(views.APIView):
         if not admin_level.can_get(request.user):
             raise exceptions.PermissionDenied()
 
-        areas = admin_level.geoarea_set.filter(polygons__isnull=False)
-        if areas.count() > 0:
-            try:
-                envelope = Envelope(*areas[0].polygons.extent)
-                for area in areas[1:]:
-                    envelope.expand_to_include(*area.polygons.extent)
-
-                return response.Response({
-                    'bounds': {
-                        'min_x': envelope.min_x,
-                        'min_y': envelope.min_y,
-                        'max_x': envelope.max_x,
-                        'max_y': envelope.max_y,
-                    }
-                })
-            except ValueError:
-                return response.Response({
-                    'bounds': None,
-                })
+        if not admin_level.geojson_file:
+            admin_level.calc_cache()
 
-        return response.Response({
-            'bounds': None,
-        })
+        data = {'bounds': admin_level.bounds}
+        etag = hashlib.sha1(
+            json.dumps(data, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return _etag_response(
+            request, etag,
+            lambda: response.Response(data),
+        )
 
 
 class GeoOptionsView(views.APIView):
+    """
+    Geo options of regions, optionally of only given regions
+    and admin levels
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, version=None):
@@ -221,24 +297,59 @@ class GeoOptionsView(views.APIView):
 
             regions = regions.filter(project=project)
 
-        regions = regions.distinct()
-        result = {}
-        for region in regions:
-            result[str(region.id)] = [
-                {
-                    'label': '{} / {}'.format(geo_area.admin_level.title,
-                                              geo_area.title),
-                    'title': geo_area.title,
-                    'key': str(geo_area.id),
-                    'admin_level': geo_area.admin_level.level,
-                    'admin_level_title': geo_area.admin_level.title,
-                    'region': geo_area.admin_level.region.id,
-                    'region_title': geo_area.admin_level.region.title,
-                } for geo_area in GeoArea.objects.select_related(
-                    'admin_level', 'admin_level__region',
-                ).filter(
-                    admin_level__region=region
-                ).order_by('admin_level__level').distinct()
-            ]
-
-        return response.Response(result)
+        region_ids = _get_id_list(request.GET.get('regions'))
+        if region_ids is not None:
+            regions = regions.filter(id__in=region_ids)
+
+        admin_level_ids = _get_id_list(request.GET.get('admin_levels'))
+
+        regions = list(regions.distinct())
+        etag = hashlib.sha1(json.dumps([
+            (region.id, get_geo_options_version(region.id))
+            for region in regions
+        ] + [admin_level_ids]).encode('utf-8')).hexdigest()
+
+        def get_response():
+            return response.Response({
+                str(region.id): get_geo_options(region, admin_level_ids)
+                for region in regions
+            })
+        return _etag_response(request, etag, get_response)
+
+
+class GeoAreaSearchView(views.APIView):
+    """
+    Search geo areas by prefix of their titles
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, version=None):
+        search = request.GET.get('search')
+        if not search:
+            raise exceptions.ValidationError({
+                'search': 'This field is required',
+            })
+
+        geo_areas = GeoArea.objects.filter(
+            admin_level__region__in=Region.get_for(request.user),
+        )
+
+        region_ids = _get_id_list(request.GET.get('regions'))
+        if region_ids is not None:
+            geo_areas = geo_areas.filter(admin_level__region__in=region_ids)
+
+        admin_level_ids = _get_id_list(request.GET.get('admin_levels'))
+        if admin_level_ids is not None:
+            geo_areas = geo_areas.filter(admin_level__in=admin_level_ids)
+
+        try:
+            limit = int(request.GET.get('limit', 50))
+        except ValueError:
+            limit = 50
+        limit = max(1, min(limit, 500))
+        return response.Response({
+            'results': [
+                get_geo_area_option(geo_area)
+                for geo_area in search_geo_areas(geo_areas, search, limit)
+            ],
+        })
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.utils.deprecation import CallableTrue, CallableFalse
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+
+from jwt_auth.errors import UserNotFoundError
+from redis_store import redis
+from user.models import User
+
+import json
+
+
+# Fields of the user that are known without loading the user
+USER_CACHE_FIELDS = ('id', 'is_active')
+
+
+def _get_cache_key(user_id):
+    return 'jwt_user_{}'.format(user_id)
+
+
+def _load(user_id):
+    user = User.objects.filter(id=user_id).values(*USER_CACHE_FIELDS).first()
+    if user is None:
+        raise User.DoesNotExist()
+    return user
+
+
+def get_user_data(user_id):
+    """
+    Cached fields of the user
+
+    They are cached in redis only, shared by all processes, so that
+    invalidating them takes effect everywhere at once.
+    """
+    key = _get_cache_key(user_id)
+    r = redis.get_connection()
+    data = r.get(key)
+    if data:
+        return json.loads(data.decode('utf-8'))
+
+    data = _load(user_id)
+    r.set(key, json.dumps(data), ex=settings.JWT_USER_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_user(user_id):
+    """
+    Reload the cached fields of the user on next use
+
+    Called when the user is saved or deleted. Bulk changes which send no
+    signals, eg: User.objects.update(is_active=False), must call this for
+    each user, otherwise they take effect only after the cache timeout.
+    """
+    if settings.JWT_USER_CACHE_TIMEOUT:
+        redis.get_connection().delete(_get_cache_key(user_id))
+
+
+def _get_user(user_id):
+    try:
+        return User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        # Deleted since its fields were cached
+        invalidate_user(user_id)
+        raise AuthenticationFailed(UserNotFoundError.message)
+
+
+class LazyUser(SimpleLazyObject):
+    """
+    User which is only loaded from the database when a field other than
+    the cached ones is accessed
+    """
+    def __init__(self, data):
+        super().__init__(lambda: _get_user(data['id']))
+        self.__dict__['_user_data'] = data
+
+    @property
+    def id(self):
+        return self._user_data['id']
+
+    pk = id
+
+    @property
+    def is_active(self):
+        return self._user_data['is_active']
+
+    @property
+    def is_authenticated(self):
+        return CallableTrue
+
+    @property
+    def is_anonymous(self):
+        return CallableFalse
+
+    def __bool__(self):
+        return True
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def get_user(user_id):
+    """
+    User with given id, loaded lazily when caching is enabled
+    """
+    if not settings.JWT_USER_CACHE_TIMEOUT:
+        return User.objects.get(id=user_id)
+    return LazyUser(get_user_data(user_id))
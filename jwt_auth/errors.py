@@ -21,7 +21,7 @@ class UserInactiveError(Exception):
     code = USER_INACTIVE
     message = 'User account is deactivated'
 
-    def __init__(self, message):
+    def __init__(self, message=None):
         if (message):
             self.message = message
 
@@ -1,4 +1,9 @@
+from django.test import override_settings
+from rest_framework.exceptions import AuthenticationFailed
+
 from deep.tests import TestCase
+from jwt_auth.cache import LazyUser, invalidate_user
+from jwt_auth.token import AccessToken
 from user.models import User
 
 
@@ -37,3 +42,40 @@ class JwtApiTests(TestCase):
 
         response = self.client.post(url, data)
         self.assert_200(response)
+
+    @override_settings(JWT_USER_CACHE_TIMEOUT=60)
+    def test_cached_user(self):
+        access, _ = self.authenticate()
+        self.addCleanup(invalidate_user, self.user.pk)
+
+        user = AccessToken(access).get_user()
+        self.assertTrue(isinstance(user, LazyUser))
+        with self.assertNumQueries(0):
+            self.assertEqual(AccessToken(access).get_user().pk, self.user.pk)
+
+        url = '/api/v1/users/{}/'.format(self.user.pk)
+        response = self.client.get(url)
+        self.assert_200(response)
+
+        # Deactivated users are not authenticated from the cache
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_USER_CACHE_TIMEOUT=60)
+    def test_cached_deleted_user(self):
+        access, _ = self.authenticate()
+        self.addCleanup(invalidate_user, self.user.pk)
+
+        user = AccessToken(access).get_user()
+        self.user.delete()
+
+        # Loading the deleted user fails authentication instead of
+        # raising DoesNotExist
+        with self.assertRaises(AuthenticationFailed):
+            user.email
+
+        url = '/api/v1/users/{}/'.format(self.user.pk)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
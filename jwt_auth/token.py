@@ -3,6 +3,7 @@ from django.conf import settings
 import datetime
 import jwt
 
+from .cache import get_user
 from .errors import (
     UnknownTokenError,
     UserNotFoundError,
@@ -109,7 +110,7 @@ class AccessToken(Token):
             raise UnknownTokenError()
 
         try:
-            user = User.objects.get(id=user_id)
+            user = get_user(user_id)
         except User.DoesNotExist:
             raise UserNotFoundError()
 
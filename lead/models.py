@@ -1,13 +1,16 @@
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import ArrayField
 from django.db import models, transaction
 from django.dispatch import receiver
 
-from project.models import Project
+from project.models import Project, ProjectStats
 from project.mixins import ProjectEntityMixin
 from user_resource.models import UserResource
 from gallery.models import File
 
+import hashlib
+
 
 class LeadGroup(UserResource):
     title = models.CharField(max_length=255, blank=True)
@@ -135,21 +138,31 @@ class Lead(UserResource, ProjectEntityMixin):
             'text': self.text,
             'url': self.url,
             'attachment': self.attachment,
+            'project_id': self.project_id,
         }
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         from lead.tasks import extract_from_lead
+
+        d1 = self.__initial
+        d2 = self.get_dict()
+        self.__initial = d2
+        if d1 and d1.get('project_id') != d2.get('project_id'):
+            # Stats of the new project are bumped when saved
+            ProjectStats.bump(d1.get('project_id'))
+
+        if d1 and d1.get('text') == d2.get('text') and \
+                d1.get('url') == d2.get('url') and \
+                d1.get('attachment') == d2.get('attachment'):
+            # Previews are still valid
+            return
+
         LeadPreview.objects.filter(lead=self).delete()
         LeadPreviewImage.objects.filter(lead=self).delete()
 
         if not settings.TESTING:
-            d1 = self.__initial
-            d2 = self.get_dict()
-            if not d1 or d1.get('text') != d2.get('text') or \
-                    d1.get('url') != d2.get('url') or \
-                    d1.get('attachment') != d2.get('attachment'):
-                transaction.on_commit(lambda: extract_from_lead.delay(self.id))
+            transaction.on_commit(lambda: extract_from_lead.delay(self.id))
 
     @classmethod
     def get_for(cls, user):
@@ -189,3 +202,56 @@ class LeadPreviewImage(models.Model):
 def on_lead_saved(sender, **kwargs):
     project = kwargs.get('instance').project
     project.update_status()
+    ProjectStats.bump(project.id)
+
+
+@receiver(models.signals.post_delete, sender=Lead)
+def on_lead_deleted(sender, instance, **kwargs):
+    ProjectStats.bump(instance.project_id)
+
+
+class ExtractionCache(models.Model):
+    """
+    Extracted text and images of a document, shared by all leads
+    and files with the same content
+
+    See utils.extractor.document.Document.get_cache_key
+    """
+    # sha256 of the document's cache key
+    key = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    # Names of stored lead preview images,
+    # None if images were not extracted
+    images = ArrayField(
+        models.CharField(max_length=255),
+        default=None, blank=True, null=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_for(key):
+        if not key:
+            return None
+        return ExtractionCache.objects.filter(
+            key=ExtractionCache.hash_key(key),
+        ).first()
+
+    @staticmethod
+    def set_for(key, text, images=None):
+        if not key:
+            return None
+        cache, _ = ExtractionCache.objects.update_or_create(
+            key=ExtractionCache.hash_key(key),
+            defaults={
+                'text': text,
+                'images': images,
+            },
+        )
+        return cache
@@ -4,12 +4,14 @@ from django.core.files import File
 from django.utils import timezone
 from django.conf import settings
 from lead.models import (
+    ExtractionCache,
     Lead,
     LeadPreview,
     LeadPreviewImage,
 )
 from redis_store import redis
 from rest_framework.renderers import JSONRenderer
+from utils.extractor.fetch import is_retryable
 from utils.extractor.file_document import FileDocument
 from utils.extractor.web_document import WebDocument
 from utils.websocket.subscription import SubscriptionConsumer
@@ -19,6 +21,7 @@ import reversion
 import os
 import re
 import requests
+import time
 
 import traceback
 import logging
@@ -40,6 +43,29 @@ def _preprocess(text):
     return text.strip()
 
 
+class PreviewProgress:
+    """
+    Saves partially extracted text to the lead preview,
+    at most once every few seconds
+
+    Called with the list of pages extracted so far, which are only
+    joined when saved.
+    """
+    INTERVAL = 5
+
+    def __init__(self, lead_preview):
+        self.lead_preview = lead_preview
+        self.saved_at = time.time()
+
+    def __call__(self, pages):
+        if time.time() - self.saved_at < self.INTERVAL:
+            return
+        LeadPreview.objects.filter(id=self.lead_preview.id).update(
+            text_extract=_preprocess(''.join(pages)),
+        )
+        self.saved_at = time.time()
+
+
 def _extract_from_lead_core(lead_id):
     """
     The core lead extraction method.
@@ -50,68 +76,149 @@ def _extract_from_lead_core(lead_id):
     # Get the lead to be extracted
     lead = Lead.objects.get(id=lead_id)
 
-    with reversion.create_revision():
-        text, images = '', []
-
-        # Extract either using FileDocument or WebDocument
-        # as per the document type
-        try:
-            if lead.text:
-                text = lead.text
-                images = []
-            elif lead.attachment:
-                text, images = FileDocument(
-                    lead.attachment.file,
-                    lead.attachment.file.name,
-                ).extract()
-
-            elif lead.url:
-                text, images = WebDocument(lead.url).extract()
-
-            text = _preprocess(text)
-        except Exception:
-            logger.error(traceback.format_exc())
-            if images:
-                for image in images:
-                    image.close()
-            # return False
-
-        # Save extracted text as LeadPreview
-        if text:
-            # Classify the text and get doc id
-
-            try:
-                data = {
-                    'deeper': 1,
-                    'group_id': lead.project.id,
-                    'text': text,
-                }
-                response = requests.post(DEEPL_CLASSIFY_URL,
-                                         data=data).json()
-                classified_doc_id = response.get('id')
-            except Exception:
-                logger.error(traceback.format_exc())
-                classified_doc_id = None
-
-        # Make sure there isn't existing lead preview
-        LeadPreview.objects.filter(lead=lead).delete()
-        # and create new one
-        LeadPreview.objects.create(
-            lead=lead,
-            text_extract=text,
-            classified_doc_id=classified_doc_id,
-        )
+    text, images = '', []
+    document, cache_key, cache = None, None, None
 
-        # Save extracted images as LeadPreviewImage instances
+    # Make sure there isn't existing lead preview
+    LeadPreview.objects.filter(lead=lead).delete()
+    # and create new one, which is updated with partially
+    # extracted text while extracting.
+    # Outside of the revision, so that the partial text is visible
+    # to other connections before the extraction has finished
+    lead_preview = LeadPreview.objects.create(lead=lead)
+    progress = PreviewProgress(lead_preview)
+
+    # Extract either using FileDocument or WebDocument
+    # as per the document type
+    try:
+        if lead.text:
+            text = lead.text
+            images = []
+        elif lead.attachment:
+            document = FileDocument(
+                lead.attachment.file,
+                lead.attachment.file.name,
+            )
+        elif lead.url:
+            document = WebDocument(lead.url)
+
+        if document:
+            # Reuse previous extraction of the same document
+            cache_key = document.get_cache_key()
+            cache = ExtractionCache.get_for(cache_key)
+            if cache and cache.images is not None:
+                text = cache.text
+            else:
+                cache = None
+                text, images = document.extract(progress=progress)
+
+        text = _preprocess(text)
+    except Exception:
+        logger.error(traceback.format_exc())
         if images:
-            LeadPreviewImage.objects.filter(lead=lead).delete()
             for image in images:
+                image.close()
+        images = []
+        # return False
+
+    with reversion.create_revision():
+        lead_preview.text_extract = text
+        lead_preview.save()
+
+        LeadPreviewImage.objects.filter(lead=lead).delete()
+        if cache:
+            # Images of cached extraction are already stored
+            LeadPreviewImage.objects.bulk_create([
+                LeadPreviewImage(lead=lead, file=name)
+                for name in cache.images
+            ])
+        else:
+            # Save extracted images as LeadPreviewImage instances
+            image_names = []
+            for image in images or []:
                 lead_image = LeadPreviewImage(lead=lead)
                 lead_image.file.save(os.path.basename(image.name),
                                      File(image), True)
                 lead_image.save()
                 image.close()
+                image_names.append(lead_image.file.name)
+
+            if cache_key and text:
+                ExtractionCache.set_for(cache_key, text, image_names)
+
+    # Classify the text separately so that a slow or unavailable
+    # classifier doesn't hold up the extraction
+    if text and not settings.TESTING:
+        classify_lead_preview.delay(lead_id)
+
+    return True
+
+
+def _send_lead_notification(lead_id, status):
+    """
+    Send signal to all pending websocket clients
+    that the lead extraction has completed.
+    """
+    code = SubscriptionConsumer.encode({
+        'channel': 'leads',
+        'event': 'onPreviewExtracted',
+        'leadId': lead_id,
+    })
+
+    # TODO: Discuss and decide the notification response format
+    # Also TODO: Should a handler be added during subscription
+    # to immediately reply with already extracted lead?
+
+    Group(code).send(json.loads(
+        JSONRenderer().render({
+            'code': code,
+            'timestamp': timezone.now(),
+            'type': 'notification',
+            'status': status,
+        }).decode('utf-8')
+    ))
+
+
+@shared_task(bind=True, max_retries=5)
+def classify_lead_preview(self, lead_id):
+    """
+    A task to classify the extracted text of a lead with DEEPL.
+
+    Requests failing with connection errors, timeouts, server errors or
+    429 responses are retried with exponential backoff.
+    """
+    lead_preview = LeadPreview.objects.filter(
+        lead_id=lead_id,
+    ).select_related('lead').first()
+    if not lead_preview or not lead_preview.text_extract:
+        return False
+
+    try:
+        data = {
+            'deeper': 1,
+            'group_id': lead_preview.lead.project_id,
+            'text': lead_preview.text_extract,
+        }
+        response = requests.post(
+            DEEPL_CLASSIFY_URL,
+            data=data,
+            timeout=settings.EXTRACTOR_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        classified_doc_id = response.json().get('id')
+    except requests.exceptions.RequestException as exc:
+        if not is_retryable(exc):
+            logger.error(traceback.format_exc())
+            return False
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries)
+    except Exception:
+        logger.error(traceback.format_exc())
+        return False
 
+    LeadPreview.objects.filter(id=lead_preview.id).update(
+        classified_doc_id=classified_doc_id,
+    )
+    _send_lead_notification(lead_id, True)
     return True
 
 
@@ -140,27 +247,7 @@ def extract_from_lead(lead_id):
         # Actual extraction process
         return_value = _extract_from_lead_core(lead_id)
 
-        # Send signal to all pending websocket clients
-        # that the lead extraction has completed.
-
-        code = SubscriptionConsumer.encode({
-            'channel': 'leads',
-            'event': 'onPreviewExtracted',
-            'leadId': lead_id,
-        })
-
-        # TODO: Discuss and decide the notification response format
-        # Also TODO: Should a handler be added during subscription
-        # to immediately reply with already extracted lead?
-
-        Group(code).send(json.loads(
-            JSONRenderer().render({
-                'code': code,
-                'timestamp': timezone.now(),
-                'type': 'notification',
-                'status': return_value,
-            }).decode('utf-8')
-        ))
+        _send_lead_notification(lead_id, return_value)
     except Exception:
         logger.error(traceback.format_exc())
         return_value = False
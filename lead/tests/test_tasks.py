@@ -1,8 +1,10 @@
 from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from deep.tests import TestCase
 
-from lead.tasks import extract_from_lead, _preprocess
-from lead.models import Lead
+from lead.tasks import extract_from_lead, _preprocess, PreviewProgress
+from lead.models import Lead, LeadPreview, ExtractionCache
+from gallery.models import File
 
 from utils.common import get_or_write_file, makedirs
 from utils.extractor.tests.test_web_document import HTML_URL
@@ -54,3 +56,53 @@ class ExtractFromLeadTaskTest(TestCase):
             logger.warning('LEAD EXTRACTION ERROR:')
             logger.warning(traceback.format_exc())
             return
+
+
+class ExtractionCacheTest(TestCase):
+    def test_extraction_cache(self):
+        content = (
+            '<html><body><p>{}</p></body></html>'.format(
+                'Extraction of the same document is reused. ' * 20
+            )
+        ).encode('utf-8')
+
+        leads = []
+        for i in range(2):
+            attachment = File.objects.create(
+                title='test',
+                file=SimpleUploadedFile(name='test.html', content=content),
+            )
+            leads.append(self.create(
+                Lead, text='', url='', attachment=attachment,
+            ))
+
+        self.assertTrue(extract_from_lead(leads[0].id))
+        self.assertEqual(ExtractionCache.objects.count(), 1)
+
+        # Second lead with the same content uses the cached extraction
+        ExtractionCache.objects.update(text='Cached text')
+        self.assertTrue(extract_from_lead(leads[1].id))
+        self.assertEqual(
+            LeadPreview.objects.get(lead=leads[1]).text_extract,
+            'Cached text',
+        )
+
+
+class PreviewProgressTest(TestCase):
+    def test_partial_preview(self):
+        lead = self.create(Lead)
+        lead_preview = LeadPreview.objects.create(lead=lead)
+        progress = PreviewProgress(lead_preview)
+
+        # Not saved again within the interval
+        progress(['First page.\n'])
+        lead_preview.refresh_from_db()
+        self.assertEqual(lead_preview.text_extract, '')
+
+        progress.saved_at -= PreviewProgress.INTERVAL
+        progress(['First page.\n', 'Second page.'])
+        lead_preview.refresh_from_db()
+        self.assertEqual(
+            lead_preview.text_extract,
+            'First page. Second page.',
+        )
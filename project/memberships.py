@@ -0,0 +1,129 @@
+from functools import reduce
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from project.resolver import invalidate
+
+import operator
+
+
+def _get_pairs_query(pairs, project_field, member_field):
+    by_project = {}
+    for project_id, member_id in pairs:
+        by_project.setdefault(project_id, []).append(member_id)
+
+    return reduce(operator.or_, [
+        models.Q(**{
+            project_field: project_id,
+            '{}__in'.format(member_field): member_ids,
+        })
+        for project_id, member_ids in by_project.items()
+    ])
+
+
+def reconcile_memberships(project_ids, user_ids, exclude=None):
+    """
+    Reconcile memberships of the users in the projects with the user
+    groups of the projects
+
+    Users in any user group of a project are added as members and
+    members not in any of them are removed unless directly added.
+    Group memberships matching exclude, a dict of filters, eg: those
+    being deleted, are not considered.
+
+    Returns the number of added and removed memberships.
+    """
+    from project.models import (
+        ProjectJoinRequest,
+        ProjectMembership,
+        get_default_role_id,
+    )
+    from user_group.models import GroupMembership
+
+    if not project_ids or not user_ids:
+        return 0, 0
+
+    group_memberships = GroupMembership.objects.filter(
+        member_id__in=user_ids,
+        group__projectusergroupmembership__project_id__in=project_ids,
+    )
+    if exclude:
+        group_memberships = group_memberships.exclude(**exclude)
+
+    target = set(group_memberships.values_list(
+        'group__projectusergroupmembership__project_id', 'member_id',
+    ).distinct())
+
+    existing = dict(
+        ((project_id, member_id), is_directly_added)
+        for project_id, member_id, is_directly_added in
+        ProjectMembership.objects.filter(
+            project_id__in=project_ids,
+            member_id__in=user_ids,
+        ).values_list('project_id', 'member_id', 'is_directly_added')
+    )
+
+    new_pairs = target.difference(existing)
+    removed_pairs = [
+        pair for pair, is_directly_added in existing.items()
+        if not is_directly_added and pair not in target
+    ]
+
+    with transaction.atomic():
+        if new_pairs:
+            role_id = get_default_role_id()
+            ProjectMembership.objects.bulk_create([
+                ProjectMembership(
+                    project_id=project_id,
+                    member_id=member_id,
+                    role_id=role_id,
+                    added_by_id=member_id,
+                )
+                for project_id, member_id in new_pairs
+            ])
+
+            # Bulk create sends no signals, so accept pending join
+            # requests and reload memberships here
+            ProjectJoinRequest.objects.filter(
+                _get_pairs_query(new_pairs, 'project_id', 'requested_by_id'),
+                status='pending',
+            ).update(
+                status='accepted',
+                responded_by=models.F('requested_by'),
+                responded_at=timezone.now(),
+            )
+            member_ids = set(member_id for _, member_id in new_pairs)
+
+            def invalidate_members():
+                for member_id in member_ids:
+                    invalidate(member_id)
+
+            # Now for the rest of this request, and again once committed
+            # in case memberships were reloaded before the commit
+            invalidate_members()
+            transaction.on_commit(invalidate_members)
+
+        if removed_pairs:
+            ProjectMembership.objects.filter(
+                _get_pairs_query(removed_pairs, 'project_id', 'member_id'),
+            ).delete()
+
+    return len(new_pairs), len(removed_pairs)
+
+
+def update_memberships(project_ids, user_ids, exclude=None):
+    """
+    Reconcile memberships, in a background task when many memberships
+    can change
+    """
+    project_ids = list(project_ids)
+    user_ids = list(user_ids)
+    count = len(project_ids) * len(user_ids)
+    if count <= settings.PROJECT_MEMBERSHIP_ASYNC_THRESHOLD:
+        return reconcile_memberships(project_ids, user_ids, exclude)
+
+    from project.tasks import reconcile_project_memberships
+    transaction.on_commit(lambda: reconcile_project_memberships.delay(
+        project_ids, user_ids, exclude,
+    ))
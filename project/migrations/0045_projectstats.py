@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2018-11-08 09:00
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_stats(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    ProjectStats = apps.get_model('project', 'ProjectStats')
+    # Stats are created stale and refreshed when first read
+    ProjectStats.objects.bulk_create([
+        ProjectStats(project_id=project_id)
+        for project_id in Project.objects.values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0044_auto_20181012_0653'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number_of_leads', models.IntegerField(default=0)),
+                ('number_of_entries', models.IntegerField(default=0)),
+                ('leads_activity', models.IntegerField(default=0)),
+                ('entries_activity', models.IntegerField(default=0)),
+                ('leads_timeseries', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('entries_timeseries', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('version', models.IntegerField(default=1)),
+                ('refreshed_version', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='project.Project')),
+            ],
+            options={
+                'verbose_name_plural': 'project stats',
+            },
+        ),
+        migrations.RunPython(create_stats, migrations.RunPython.noop),
+    ]
@@ -29,4 +29,4 @@ class ProjectEntityMixin:
 
     @classmethod
     def get_for(cls, user):
-        return get_project_entities(cls, user, action='view').distinct()
+        return get_project_entities(cls, user, action='view')
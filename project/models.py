@@ -5,10 +5,13 @@ from django.dispatch import receiver
 
 from user_resource.models import UserResource
 from geo.models import Region
-from user_group.models import UserGroup
+from user_group.models import UserGroup, GroupMembership
 from analysis_framework.models import AnalysisFramework
 from category_editor.models import CategoryEditor
+from project.memberships import update_memberships
 from project.permissions import PROJECT_PERMISSIONS
+from project.resolver import get_role, invalidate
+from redis_store import redis
 
 from utils.common import generate_timeseries
 
@@ -142,32 +145,22 @@ class Project(UserResource):
 
     @staticmethod
     def get_annotated():
-        from entry.models import Lead, Entry
-
-        pk = models.OuterRef('pk')
-
-        threshold = timezone.now() - timedelta(days=30)
-        return Project.objects.annotate(
-            number_of_leads=models.Count('lead', distinct=True),
-            number_of_entries=models.Count('lead__entry', distinct=True),
-
-            leads_activity=models.functions.Coalesce(models.Subquery(
-                Lead.objects.filter(
-                    project=pk,
-                    created_at__gt=threshold,
-                ).order_by().values('project')
-                .annotate(c=models.Count('*')).values('c')[:1],
-                output_field=models.IntegerField(),
-            ), 0),
-
-            entries_activity=models.functions.Coalesce(models.Subquery(
-                Entry.objects.filter(
-                    lead__project=pk,
-                    created_at__gt=threshold,
-                ).order_by().values('lead__project')
-                .annotate(c=models.Count('*')).values('c')[:1],
-                output_field=models.IntegerField(),
-            ), 0),
+        # Stats are refreshed in the background after changes, so these
+        # may lag behind for ordering. Serialized stats come from
+        # get_stats, refreshed in batch by the project serializer.
+        return Project.objects.select_related('stats').annotate(
+            number_of_leads=models.functions.Coalesce(
+                models.F('stats__number_of_leads'), 0,
+            ),
+            number_of_entries=models.functions.Coalesce(
+                models.F('stats__number_of_entries'), 0,
+            ),
+            leads_activity=models.functions.Coalesce(
+                models.F('stats__leads_activity'), 0,
+            ),
+            entries_activity=models.functions.Coalesce(
+                models.F('stats__entries_activity'), 0,
+            ),
         )
 
     @staticmethod
@@ -205,15 +198,12 @@ class Project(UserResource):
         return True
 
     def is_member(self, user):
-        return self in Project.get_for_member(user)
+        # Members of user groups of the project are added as members
+        return get_role(user, self.id) is not None
 
     def get_role(self, user):
-        membership = ProjectMembership.objects.filter(
-            project=self,
-            member=user,
-        )
         # this will return None if not exists
-        return membership.first() and membership.first().role
+        return get_role(user, self.id)
 
     def can_modify(self, user):
         role = self.get_role(user)
@@ -250,26 +240,21 @@ class Project(UserResource):
             status=self.calc_status()
         )
 
-    def get_entries_activity(self):
-        from entry.models import Entry
-        min_date = timezone.now() - timedelta(days=30)
-        max_date = timezone.now()
+    def get_stats(self):
+        """
+        Stored stats of the project, see ProjectStats.load_for to
+        refresh them
+        """
+        try:
+            return self.stats
+        except ProjectStats.DoesNotExist:
+            return ProjectStats.objects.create(project=self)
 
-        return generate_timeseries(
-            Entry.objects.filter(lead__project=self).distinct(),
-            min_date,
-            max_date,
-        )
+    def get_entries_activity(self):
+        return self.get_stats().get_timeseries('entries_timeseries')
 
     def get_leads_activity(self):
-        min_date = timezone.now() - timedelta(days=30)
-        max_date = timezone.now()
-
-        return generate_timeseries(
-            self.lead_set.all(),
-            min_date,
-            max_date,
-        )
+        return self.get_stats().get_timeseries('leads_timeseries')
 
     def get_admins(self):
         return User.objects.filter(
@@ -284,6 +269,205 @@ class Project(UserResource):
         ).distinct().count()
 
 
+class ProjectStats(models.Model):
+    """
+    Cached lead and entry statistics of a project
+
+    Lead and entry changes bump the version once committed, which marks
+    the stats as stale and refreshes them in the background. Since
+    activities are of the last days, stats are also stale the day after
+    they are refreshed. Stale stats of projects being read are refreshed
+    together by load_for.
+    """
+    ACTIVITY_DAYS = 30
+
+    project = models.OneToOneField(Project, on_delete=models.CASCADE,
+                                   related_name='stats')
+    number_of_leads = models.IntegerField(default=0)
+    number_of_entries = models.IntegerField(default=0)
+    # Leads and entries created in the last ACTIVITY_DAYS
+    leads_activity = models.IntegerField(default=0)
+    entries_activity = models.IntegerField(default=0)
+    # Leads and entries created on each day with any, by iso date
+    leads_timeseries = JSONField(default=dict)
+    entries_timeseries = JSONField(default=dict)
+
+    version = models.IntegerField(default=1)
+    refreshed_version = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True, default=None)
+
+    class Meta:
+        verbose_name_plural = 'project stats'
+
+    def __str__(self):
+        return 'Stats of {}'.format(self.project.title)
+
+    def is_stale(self):
+        today = timezone.localtime(timezone.now()).date()
+        return self.version > self.refreshed_version or \
+            self.refreshed_at is None or \
+            timezone.localtime(self.refreshed_at).date() < today
+
+    @staticmethod
+    def bump(*project_ids):
+        """
+        Mark stats of the projects stale once the current transaction
+        commits, and refresh them in the background
+        """
+        transaction.on_commit(
+            lambda: ProjectStats._mark_stale(project_ids),
+        )
+
+    @staticmethod
+    def _mark_stale(project_ids):
+        from project.tasks import get_refresh_stats_key, refresh_project_stats
+
+        ProjectStats.objects.filter(project_id__in=project_ids).update(
+            version=models.F('version') + 1,
+        )
+
+        # Queue a refresh only for projects without one already queued
+        r = redis.get_connection()
+        project_ids = [
+            project_id for project_id in project_ids
+            if r.set(
+                get_refresh_stats_key(project_id), 1,
+                nx=True, ex=60 * 60,
+            )
+        ]
+        if project_ids:
+            refresh_project_stats.delay(project_ids)
+
+    @staticmethod
+    def load_for(projects):
+        """
+        Refresh stale stats of the projects in one batch and set them
+        to the projects
+        """
+        stale_ids = []
+        for project in projects:
+            try:
+                stats = project.stats
+            except ProjectStats.DoesNotExist:
+                stats = None
+            if stats is None or stats.is_stale():
+                stale_ids.append(project.id)
+        if not stale_ids:
+            return
+
+        existing_ids = set(ProjectStats.objects.filter(
+            project_id__in=stale_ids,
+        ).values_list('project_id', flat=True))
+        ProjectStats.objects.bulk_create([
+            ProjectStats(project_id=project_id)
+            for project_id in stale_ids if project_id not in existing_ids
+        ])
+        ProjectStats.refresh_stale(stale_ids)
+
+        stats = {
+            stats.project_id: stats
+            for stats in ProjectStats.objects.filter(project_id__in=stale_ids)
+        }
+        for project in projects:
+            if project.id in stats:
+                project.stats = stats[project.id]
+
+    @staticmethod
+    def _count_by_project(queryset, project_field):
+        return dict(
+            queryset.order_by().values(project_field)
+            .annotate(count=models.Count('id'))
+            .values_list(project_field, 'count')
+        )
+
+    @staticmethod
+    def _count_by_day(queryset, project_field, min_date):
+        counts = {}
+        for project_id, date, count in queryset.filter(
+            created_at__date__gte=min_date,
+        ).annotate(
+            date=models.functions.TruncDate('created_at'),
+        ).order_by().values(project_field, 'date').annotate(
+            count=models.Count('id'),
+        ).values_list(project_field, 'date', 'count'):
+            counts.setdefault(project_id, {})[date.isoformat()] = count
+        return counts
+
+    @staticmethod
+    def refresh_stale(project_ids):
+        """
+        Refresh stale stats of the projects at once, with a query per
+        statistic
+        """
+        from entry.models import Lead, Entry
+
+        now = timezone.localtime(timezone.now())
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        stale = ProjectStats.objects.filter(
+            models.Q(version__gt=models.F('refreshed_version')) |
+            models.Q(refreshed_at__isnull=True) |
+            models.Q(refreshed_at__lt=today),
+            project_id__in=project_ids,
+        )
+        versions = dict(stale.values_list('project_id', 'version'))
+        if not versions:
+            return 0
+
+        min_date = (now - timedelta(days=ProjectStats.ACTIVITY_DAYS)).date()
+        leads = Lead.objects.filter(project_id__in=versions)
+        entries = Entry.objects.filter(lead__project_id__in=versions)
+
+        number_of_leads = ProjectStats._count_by_project(
+            leads, 'project_id',
+        )
+        number_of_entries = ProjectStats._count_by_project(
+            entries, 'lead__project_id',
+        )
+        leads_timeseries = ProjectStats._count_by_day(
+            leads, 'project_id', min_date,
+        )
+        entries_timeseries = ProjectStats._count_by_day(
+            entries, 'lead__project_id', min_date,
+        )
+
+        def get_activity(timeseries):
+            return sum(
+                count for date, count in timeseries.items()
+                if date > min_date.isoformat()
+            )
+
+        with transaction.atomic():
+            for project_id, version in versions.items():
+                # Changes while refreshing bump the version further,
+                # so those stats stay stale
+                ProjectStats.objects.filter(project_id=project_id).update(
+                    number_of_leads=number_of_leads.get(project_id, 0),
+                    number_of_entries=number_of_entries.get(project_id, 0),
+                    leads_activity=get_activity(
+                        leads_timeseries.get(project_id, {}),
+                    ),
+                    entries_activity=get_activity(
+                        entries_timeseries.get(project_id, {}),
+                    ),
+                    leads_timeseries=leads_timeseries.get(project_id, {}),
+                    entries_timeseries=entries_timeseries.get(project_id, {}),
+                    refreshed_version=version,
+                    refreshed_at=now,
+                )
+        return len(versions)
+
+    def get_timeseries(self, field):
+        max_date = timezone.now()
+        min_date = max_date - timedelta(days=ProjectStats.ACTIVITY_DAYS)
+        return generate_timeseries(getattr(self, field), min_date, max_date)
+
+
+@receiver(models.signals.post_save, sender=Project)
+def on_project_saved(sender, instance, created, **kwargs):
+    if created:
+        ProjectStats.objects.create(project=instance)
+
+
 def get_default_role_id():
     return ProjectRole.get_normal_role().id
 
@@ -401,6 +585,13 @@ def on_membership_saved(sender, **kwargs):
     )
 
 
+# Whenever a membership changes, reload memberships of the member
+@receiver(models.signals.post_save, sender=ProjectMembership)
+@receiver(models.signals.post_delete, sender=ProjectMembership)
+def on_membership_changed(sender, instance, **kwargs):
+    invalidate(instance.member_id)
+
+
 # Whenever a project status value is changed, update all projects' statuses
 @receiver(models.signals.post_save, sender=ProjectStatus)
 @receiver(models.signals.post_delete, sender=ProjectStatus)
@@ -476,42 +667,28 @@ class ProjectRole(models.Model):
 @receiver(models.signals.post_save, sender=ProjectUserGroupMembership)
 def refresh_project_memberships_usergroup_added(sender, instance, **kwargs):
     """
-    Update project memberships when a project is saved(update/created)
-    @instance: Project instance
-    NOTE: sent after project update/created
+    Add members of the user group to the project
+    @instance: ProjectUserGroupMembership instance
     """
-    project = instance.project
-    project_ug_members = User.objects.filter(
-        groupmembership__group__project=project
+    update_memberships(
+        [instance.project_id],
+        GroupMembership.objects.filter(
+            group_id=instance.usergroup_id,
+        ).values_list('member_id', flat=True),
     )
-    new_users = project_ug_members.difference(project.get_all_members()).\
-        distinct()
-    for user in new_users:
-        project.add_member(user)
 
 
 @receiver(models.signals.pre_delete, sender=ProjectUserGroupMembership)
 def refresh_project_memberships_usergroup_removed(sender, instance, **kwargs):
-    # Also, when usergroup is deleted from project,
-    # remove membereships if necessary
-    # The logic is: project_members.diff(directly_added.union(all_ug_members))
-    project = instance.project
-    all_members = project.get_all_members()
-
-    direct_members = project.get_direct_members()
-
-    other_ugs = project.user_groups.exclude(id=instance.usergroup.id)
-
-    all_ug_members = User.objects.filter(
-        groupmembership__group__in=other_ugs,
-    ).distinct()
-
-    remove_members = all_members.difference(
-        direct_members.union(all_ug_members)
+    """
+    Remove members of the user group from the project, unless directly
+    added or in other user groups of the project
+    @instance: ProjectUserGroupMembership instance
+    """
+    update_memberships(
+        [instance.project_id],
+        GroupMembership.objects.filter(
+            group_id=instance.usergroup_id,
+        ).values_list('member_id', flat=True),
+        exclude={'group_id': instance.usergroup_id},
     )
-
-    remove_members = list(remove_members.values_list('id', flat=True))
-
-    ProjectMembership.objects.filter(
-        project=project, member__id__in=remove_members
-    ).delete()
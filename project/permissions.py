@@ -2,6 +2,7 @@ from functools import reduce
 from django.db import models
 from rest_framework import permissions
 
+from project.resolver import get_resolver
 from utils.data_structures import Dict
 
 PROJECT_PERMISSIONS = Dict(
@@ -88,16 +89,12 @@ def get_project_entities(Entity, user, action=None):
     # TODO: camelcase to snakecase instead of just lower()
     item = Entity.__name__.lower()
 
-    item_permissions = item + '_permissions'
     permission = PROJECT_PERMISSIONS.get(item, {}).get(action)
-    if permission is None:
+    if permission is None or not user.is_authenticated:
         return Entity.objects.none()
 
-    fieldname = 'project__projectmembership__role__{}'.format(item_permissions)
-    return Entity.objects.filter(
-        project__projectmembership__member=user,
-    ).annotate(
-        new_permission_col=models.F(fieldname).bitand(permission)
-    ).filter(
-        new_permission_col=permission
-    ).distinct()
+    # Filter by project ids instead of joining memberships and roles,
+    # so that the project foreign key index is used and no distinct is
+    # needed
+    project_ids = get_resolver(user).get_project_ids(item, permission)
+    return Entity.objects.filter(project_id__in=project_ids)
@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from django.conf import settings
+
+from redis_store import redis
+
+import json
+import threading
+
+
+_local = threading.local()
+
+
+def _get_user_id(user):
+    # user can also be an id, eg: from the query params
+    return int(getattr(user, 'pk', user))
+
+
+def _get_cache_key(user_id):
+    return 'project_roles_{}'.format(user_id)
+
+
+class PermissionResolver:
+    """
+    Resolves project roles of a user from their memberships, which are
+    loaded once along with the roles and then answered from memory.
+
+    Memberships are also cached in redis when enabled by
+    PROJECT_PERMISSION_CACHE_TIMEOUT.
+    """
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.role_ids = None
+        self.roles = {}
+        self.project_ids = {}
+
+    def _load_role_ids(self):
+        from project.models import ProjectMembership
+
+        timeout = settings.PROJECT_PERMISSION_CACHE_TIMEOUT
+        key = _get_cache_key(self.user_id)
+        if timeout:
+            role_ids = redis.get_connection().get(key)
+            if role_ids:
+                return {
+                    int(project_id): role_id
+                    for project_id, role_id in
+                    json.loads(role_ids.decode('utf-8')).items()
+                }
+
+        role_ids = dict(ProjectMembership.objects.filter(
+            member_id=self.user_id,
+        ).values_list('project_id', 'role_id'))
+        if timeout:
+            redis.get_connection().set(key, json.dumps(role_ids), ex=timeout)
+        return role_ids
+
+    def load(self):
+        from project.models import ProjectRole
+
+        if self.role_ids is not None:
+            return self
+        self.role_ids = self._load_role_ids()
+        self.roles = ProjectRole.objects.in_bulk(set(self.role_ids.values()))
+        return self
+
+    def get_role(self, project_id):
+        self.load()
+        return self.roles.get(self.role_ids.get(project_id))
+
+    def is_member(self, project_id):
+        self.load()
+        return project_id in self.role_ids
+
+    def get_project_ids(self, item, permission):
+        """
+        Ids of projects where the user has the permission for the item
+        """
+        self.load()
+        key = (item, permission)
+        if key not in self.project_ids:
+            permissions_field = '{}_permissions'.format(item)
+            self.project_ids[key] = sorted(
+                project_id
+                for project_id, role_id in self.role_ids.items()
+                if role_id in self.roles and
+                getattr(
+                    self.roles[role_id], permissions_field,
+                ) & permission == permission
+            )
+        return self.project_ids[key]
+
+
+def get_resolver(user):
+    """
+    Resolver for the user, shared within the current request
+    """
+    user_id = _get_user_id(user)
+    resolvers = getattr(_local, 'resolvers', None)
+    if resolvers is None:
+        return PermissionResolver(user_id)
+
+    if user_id not in resolvers:
+        resolvers[user_id] = PermissionResolver(user_id)
+    return resolvers[user_id]
+
+
+def get_role(user, project_id):
+    resolvers = getattr(_local, 'resolvers', None)
+    if resolvers is None and settings.PROJECT_PERMISSION_CACHE_TIMEOUT == 0:
+        # Outside a request, a single membership is cheaper to load
+        # than all memberships of the user
+        from project.models import ProjectMembership
+        membership = ProjectMembership.objects.filter(
+            project_id=project_id,
+            member_id=_get_user_id(user),
+        ).select_related('role').first()
+        return membership and membership.role
+    return get_resolver(user).get_role(project_id)
+
+
+def invalidate(user):
+    """
+    Reload the memberships of the user on next use
+    """
+    user_id = _get_user_id(user)
+    resolvers = getattr(_local, 'resolvers', None)
+    if resolvers is not None:
+        resolvers.pop(user_id, None)
+    if settings.PROJECT_PERMISSION_CACHE_TIMEOUT:
+        redis.get_connection().delete(_get_cache_key(user_id))
+
+
+@contextmanager
+def permission_resolvers():
+    """
+    Within this context, memberships of each user are loaded only once
+    """
+    if getattr(_local, 'resolvers', None) is not None:
+        yield
+        return
+
+    _local.resolvers = {}
+    try:
+        yield
+    finally:
+        _local.resolvers = None
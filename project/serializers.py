@@ -1,3 +1,4 @@
+from django.db import models
 from drf_dynamic_fields import DynamicFieldsMixin
 from rest_framework import serializers
 from rest_framework.exceptions import PermissionDenied
@@ -10,6 +11,7 @@ from project.models import (
     ProjectMembership,
     ProjectJoinRequest,
     ProjectRole,
+    ProjectStats,
     ProjectUserGroupMembership,
 )
 from project.permissions import PROJECT_PERMISSIONS
@@ -125,6 +127,16 @@ class ProjectUsergroupMembershipSerializer(RemoveNullFieldsMixin,
         return resource
 
 
+class ProjectListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Refresh stale stats of all the projects at once
+        projects = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        ProjectStats.load_for(projects)
+        return super().to_representation(projects)
+
+
 class ProjectSerializer(RemoveNullFieldsMixin,
                         DynamicFieldsMixin, UserResourceSerializer):
     memberships = ProjectMembershipSerializer(
@@ -154,8 +166,14 @@ class ProjectSerializer(RemoveNullFieldsMixin,
         source='get_number_of_users',
         read_only=True,
     )
-    number_of_leads = serializers.IntegerField(read_only=True)
-    number_of_entries = serializers.IntegerField(read_only=True)
+    number_of_leads = serializers.IntegerField(
+        source='get_stats.number_of_leads',
+        read_only=True,
+    )
+    number_of_entries = serializers.IntegerField(
+        source='get_stats.number_of_entries',
+        read_only=True,
+    )
 
     entries_activity = serializers.ReadOnlyField(
         source='get_entries_activity',
@@ -169,6 +187,13 @@ class ProjectSerializer(RemoveNullFieldsMixin,
     class Meta:
         model = Project
         exclude = ('members', )
+        list_serializer_class = ProjectListSerializer
+
+    def to_representation(self, instance):
+        # Stats of listed projects are loaded by the list serializer
+        if not isinstance(self.parent, ProjectListSerializer):
+            ProjectStats.load_for([instance])
+        return super().to_representation(instance)
 
     def create(self, validated_data):
         project = super().create(validated_data)
@@ -207,13 +232,8 @@ class ProjectSerializer(RemoveNullFieldsMixin,
         request = self.context['request']
         user = request.GET.get('user', request.user)
 
-        membership = ProjectMembership.objects.filter(
-            project=project,
-            member=user
-        ).first()
-        if membership:
-            return membership.role.id
-        return None
+        role = project.get_role(user)
+        return role and role.id
 
     # Validations
     def validate_user_groups(self, user_groups):
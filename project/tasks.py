@@ -0,0 +1,75 @@
+from celery import shared_task
+from channels import Group
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from project.memberships import reconcile_memberships
+from project.models import ProjectStats
+from redis_store import redis
+from utils.websocket.subscription import SubscriptionConsumer
+
+import json
+import time
+
+import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _send_memberships_notification(project_id):
+    """
+    Send signal to websocket clients that memberships of the project
+    have been updated
+    """
+    code = SubscriptionConsumer.encode({
+        'channel': 'projects',
+        'event': 'onMembershipsUpdated',
+        'projectId': project_id,
+    })
+
+    Group(code).send(json.loads(
+        JSONRenderer().render({
+            'code': code,
+            'timestamp': timezone.now(),
+            'type': 'notification',
+        }).decode('utf-8')
+    ))
+
+
+@shared_task
+def reconcile_project_memberships(project_ids, user_ids, exclude=None):
+    try:
+        start = time.time()
+        added, removed = reconcile_memberships(
+            project_ids, user_ids, exclude,
+        )
+        logger.info(
+            'Added %s and removed %s memberships of %s projects in %.2fs',
+            added, removed, len(project_ids), time.time() - start,
+        )
+
+        for project_id in project_ids:
+            _send_memberships_notification(project_id)
+        return True
+    except Exception:
+        logger.error(traceback.format_exc())
+        return False
+
+
+def get_refresh_stats_key(project_id):
+    return 'refresh_project_stats_{}'.format(project_id)
+
+
+@shared_task
+def refresh_project_stats(project_ids):
+    try:
+        # Changes from now on queue another refresh
+        redis.get_connection().delete(*[
+            get_refresh_stats_key(project_id) for project_id in project_ids
+        ])
+        ProjectStats.refresh_stale(project_ids)
+        return True
+    except Exception:
+        logger.error(traceback.format_exc())
+        return False
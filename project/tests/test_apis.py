@@ -5,13 +5,19 @@ from project.models import (
     Project,
     ProjectMembership,
     ProjectJoinRequest,
+    ProjectStats,
     ProjectStatus,
     ProjectStatusCondition,
     ProjectUserGroupMembership,
 )
 
+from project.permissions import get_project_entities
+from project.resolver import permission_resolvers
+from project.tasks import get_refresh_stats_key
+from redis_store import redis
 from user_group.models import UserGroup
 
+from django.test import override_settings
 from django.utils import timezone
 from datetime import timedelta
 
@@ -414,6 +420,34 @@ class ProjectApiTest(TestCase):
         assert project.can_modify(self.user)
         assert not project.can_modify(test_user)
 
+    def test_role_resolved_once(self):
+        project = self.create(Project, role=self.admin_role)
+        test_user = self.create(User)
+
+        with permission_resolvers():
+            with self.assertNumQueries(2):
+                assert project.can_modify(self.user)
+                assert project.is_member(self.user)
+                assert project.get_role(self.user) == self.admin_role
+
+            # Memberships are reloaded when changed within the request
+            assert not project.is_member(test_user)
+            project.add_member(test_user)
+            assert project.is_member(test_user)
+
+    def test_project_entities(self):
+        project1 = self.create(Project, role=self.admin_role)
+        project2 = self.create(Project, role=self.view_only_role)
+        self.create(Project)
+        lead1 = self.create(Lead, project=project1)
+        lead2 = self.create(Lead, project=project2)
+
+        leads = get_project_entities(Lead, self.user, action='view')
+        self.assertEqual(set(leads), {lead1, lead2})
+
+        leads = get_project_entities(Lead, self.user, action='modify')
+        self.assertEqual(list(leads), [lead1])
+
     def test_auto_accept(self):
         # When a project member is added, if there is a pending
         # request for that user, auto accept that request
@@ -430,6 +464,64 @@ class ProjectApiTest(TestCase):
         self.assertEqual(request.status, 'accepted')
         self.assertEqual(request.responded_by, self.user)
 
+    def test_usergroup_memberships(self):
+        project = self.create(Project, role=self.admin_role)
+        direct_user = self.create(User)
+        ProjectMembership.objects.create(
+            project=project,
+            member=direct_user,
+            is_directly_added=True,
+        )
+        self.ug1.add_member(direct_user)
+        request = ProjectJoinRequest.objects.create(
+            project=project,
+            requested_by=self.user1,
+            role=self.normal_role,
+        )
+
+        project_ug = ProjectUserGroupMembership.objects.create(
+            usergroup=self.ug1,
+            project=project,
+        )
+        self.assertEqual(
+            set(project.get_all_members()),
+            {self.user, self.user1, self.user2, direct_user},
+        )
+        request = ProjectJoinRequest.objects.get(id=request.id)
+        self.assertEqual(request.status, 'accepted')
+
+        # Directly added members stay when the user group is removed
+        project_ug.delete()
+        members = set(project.get_all_members())
+        self.assertIn(direct_user, members)
+        self.assertNotIn(self.user1, members)
+        self.assertNotIn(self.user2, members)
+
+    @override_settings(
+        PROJECT_MEMBERSHIP_ASYNC_THRESHOLD=1,
+        CELERY_TASK_ALWAYS_EAGER=True,
+    )
+    def test_usergroup_memberships_async(self):
+        project = self.create(Project, role=self.admin_role)
+
+        # Many memberships are reconciled in a task once committed
+        with self.execute_on_commit():
+            project_ug = ProjectUserGroupMembership.objects.create(
+                usergroup=self.ug1,
+                project=project,
+            )
+            self.assertNotIn(self.user1, project.get_all_members())
+        self.assertEqual(
+            set(project.get_all_members()),
+            {self.user, self.user1, self.user2},
+        )
+
+        with self.execute_on_commit():
+            project_ug.delete()
+        members = set(project.get_all_members())
+        self.assertNotIn(self.user1, members)
+        self.assertNotIn(self.user2, members)
+
     def _test_status_filter(self, and_conditions):
         status = self.create(ProjectStatus, and_conditions=and_conditions)
         self.create(
@@ -494,6 +586,91 @@ class ProjectApiTest(TestCase):
         self.assertEqual(response.data['count'], len(expected))
         self.assertTrue(sorted(expected) == sorted(obtained))
 
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_project_stats(self):
+        project = self.create(Project, role=self.admin_role)
+        with self.execute_on_commit():
+            lead = self.create(Lead, project=project)
+            self.create(Entry, lead=lead, project=project)
+            old_lead = self.create(Lead, project=project)
+            old_lead.created_at = timezone.now() - timedelta(days=40)
+            old_lead.save()
+
+        url = '/api/v1/projects/{}/'.format(project.id)
+
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        self.assertEqual(response.data['number_of_leads'], 2)
+        self.assertEqual(response.data['number_of_entries'], 1)
+        self.assertEqual(len(response.data['leads_activity']), 31)
+        self.assertEqual(
+            sum(day['count'] for day in response.data['leads_activity']),
+            1,
+        )
+
+        # Stats are refreshed in the background after changes
+        with self.execute_on_commit():
+            lead.delete()
+        self.assertFalse(ProjectStats.objects.get(project=project).is_stale())
+        response = self.client.get(url)
+        self.assertEqual(response.data['number_of_leads'], 1)
+        self.assertEqual(response.data['number_of_entries'], 0)
+        self.assertEqual(
+            sum(day['count'] for day in response.data['entries_activity']),
+            0,
+        )
+
+        # Stats of both projects are refreshed when a lead moves
+        other_project = self.create(Project, role=self.admin_role)
+        with self.execute_on_commit():
+            old_lead.project = other_project
+            old_lead.save()
+        self.assertEqual(
+            ProjectStats.objects.get(project=project).number_of_leads, 0,
+        )
+        self.assertEqual(
+            ProjectStats.objects.get(project=other_project).number_of_leads,
+            1,
+        )
+
+    def test_project_list_stats(self):
+        projects = [
+            self.create(Project, role=self.admin_role) for _ in range(2)
+        ]
+        for project in projects:
+            self.create(Lead, project=project)
+
+        # Stale stats of the listed projects are refreshed
+        url = '/api/v1/projects/'
+        self.authenticate()
+        response = self.client.get(url)
+        self.assert_200(response)
+        results = {r['id']: r for r in response.data['results']}
+        for project in projects:
+            self.assertEqual(results[project.id]['number_of_leads'], 1)
+
+        # and fresh ones are serialized as stored
+        ProjectStats.objects.filter(project__in=projects).update(
+            number_of_leads=5,
+        )
+        response = self.client.get(url)
+        results = {r['id']: r for r in response.data['results']}
+        for project in projects:
+            self.assertEqual(results[project.id]['number_of_leads'], 5)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_project_stats_refresh_queued_once(self):
+        project = self.create(Project, role=self.admin_role)
+        key = get_refresh_stats_key(project.id)
+        redis.get_connection().set(key, 1)
+        self.addCleanup(redis.get_connection().delete, key)
+
+        # Not queued again while a refresh is already queued
+        with self.execute_on_commit():
+            self.create(Lead, project=project)
+        self.assertTrue(ProjectStats.objects.get(project=project).is_stale())
+
     def test_status_filter_or_conditions(self):
         self._test_status_filter(False)
 
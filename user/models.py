@@ -1,7 +1,7 @@
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 
@@ -92,3 +92,16 @@ def save_user_profile(sender, instance, created, **kwargs):
         assign_to_default_project(instance)
     else:
         instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Reload the user of access tokens when it changes, eg: is deactivated
+
+    Bulk updates send no signals and need to invalidate the users
+    themselves.
+    """
+    from jwt_auth.cache import invalidate_user
+    invalidate_user(instance.id)
@@ -1,3 +1,4 @@
+from django.utils import timezone
 from xml.sax.saxutils import escape
 from datetime import timedelta
 
@@ -73,27 +74,41 @@ def generate_filename(title, extension):
     )
 
 
-def generate_timeseries(entities, min_date, max_date):
-    entities = entities.order_by('created_at')
-    timeseries = []
+def generate_timeseries(counts, min_date, max_date):
+    """
+    Daily counts from min_date to max_date
 
-    oldest_date = min_date
-    latest_date = max_date
+    counts maps iso dates, in the current timezone, to their counts.
+    """
+    timeseries = []
 
-    current_date = oldest_date
-    while current_date <= latest_date:
-        subset = entities.filter(
-            created_at__date=current_date
-        )
+    current_date = min_date
+    while current_date <= max_date:
+        date = timezone.localtime(current_date).date().isoformat()
         current_date = current_date + timedelta(days=1)
         timeseries.append({
             'date': current_date,
-            'count': subset.count()
+            'count': counts.get(date, 0),
         })
 
     return timeseries
 
 
+def iterate_in_chunks(queryset, chunk_size=500):
+    """
+    Iterate a queryset using a server side cursor, yielding lists of
+    chunk_size objects so that related data can be fetched per chunk
+    """
+    chunk = []
+    for item in queryset.iterator():
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 def identity(x):
     return x
 
@@ -23,13 +23,25 @@ class Document:
         self.type = type
         self.doc = doc
 
-    def extract(self):
+    def get_cache_key(self):
+        """
+        Key identifying the content of the document, used to reuse
+        previous extractions of the same content
+
+        None if the content can't be identified without extracting it.
+        """
+        return None
+
+    def extract(self, progress=None):
         """
         Extracts text and images from the document
 
         Returns a tuple of text as string and images as list
+
+        progress is called with the pages extracted so far by
+        extractors that extract incrementally.
         """
         extractor = EXTRACTORS.get(self.type)
         if extractor:
-            return extractor(self.doc).extract()
+            return extractor(self.doc).extract(progress=progress)
         return '', []
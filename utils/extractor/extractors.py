@@ -17,7 +17,7 @@ class BaseExtractor:
     def __init__(self, doc):
         self.doc = doc
 
-    def extract(self):
+    def extract(self, progress=None):
         """
         Return text, images
         """
@@ -49,6 +49,15 @@ class PdfExtractor(BaseExtractor):
     ERROR_MSG = "Not a pdf document"
     EXTRACT_METHOD = pdf_extract
 
+    def extract(self, progress=None):
+        """
+        Return text, images
+
+        Text is extracted page by page, reporting progress
+        """
+        self.verify()
+        return pdf_extract(self.doc, progress=progress)
+
 
 class DocxExtractor(BaseExtractor):
     """
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import requests
+
+from utils.common import DEFAULT_HEADERS
+from .exception import ExtractError
+
+import tempfile
+import time
+
+
+# Connection pooled session and bounded pool of concurrent fetches
+# shared by the worker
+session = None
+pool = None
+
+
+def get_session():
+    global session
+    if not session:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=settings.EXTRACTOR_FETCH_WORKERS,
+            pool_maxsize=settings.EXTRACTOR_FETCH_WORKERS,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+
+def get_pool():
+    global pool
+    if not pool:
+        pool = ThreadPoolExecutor(
+            max_workers=settings.EXTRACTOR_FETCH_WORKERS,
+        )
+    return pool
+
+
+def is_retryable(exc):
+    """
+    Whether the request which raised exc may succeed when retried
+
+    Connection errors, timeouts, server errors and 429 responses are
+    retried, other client errors aren't.
+    """
+    if isinstance(exc, (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError) and \
+            exc.response is not None:
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    return False
+
+
+def head(url):
+    return get_session().head(
+        url,
+        allow_redirects=True,
+        timeout=settings.EXTRACTOR_REQUEST_TIMEOUT,
+    )
+
+
+def fetch(url, fp, max_size=None, timeout=None):
+    """
+    Download url into fp and return the response
+
+    Raises ExtractError if the content is larger than max_size bytes
+    or the whole download takes longer than timeout seconds.
+    """
+    max_size = max_size or settings.EXTRACTOR_MAX_DOCUMENT_SIZE
+    timeout = timeout or settings.EXTRACTOR_REQUEST_TIMEOUT
+    start = time.time()
+
+    with get_session().get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+
+        length = r.headers.get('content-length')
+        if length and length.isdigit() and int(length) > max_size:
+            raise ExtractError('Document too large: {}'.format(url))
+
+        size = 0
+        for chunk in r.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > max_size:
+                raise ExtractError('Document too large: {}'.format(url))
+            if time.time() - start > timeout:
+                raise ExtractError('Document download timed out: {}'.format(
+                    url,
+                ))
+            fp.write(chunk)
+
+    fp.flush()
+    fp.seek(0)
+    return r
+
+
+def fetch_all(urls, max_size=None):
+    """
+    Download urls concurrently into temporary files
+
+    Returns the files in the order of the urls, skipping the ones
+    which could not be downloaded.
+    """
+    def _fetch(url):
+        fp = tempfile.NamedTemporaryFile(dir=settings.BASE_DIR)
+        try:
+            fetch(url, fp, max_size)
+            return fp
+        except Exception:
+            fp.close()
+            return None
+
+    return [fp for fp in get_pool().map(_fetch, urls) if fp]
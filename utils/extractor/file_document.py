@@ -1,3 +1,4 @@
+import hashlib
 import os
 from .document import (
     Document,
@@ -32,3 +33,17 @@ class FileDocument(Document):
             type = PPTX
 
         super().__init__(doc, type)
+
+    def get_cache_key(self):
+        """
+        Hash of the file content
+        """
+        if not self.doc:
+            return None
+
+        sha256 = hashlib.sha256()
+        self.doc.seek(0)
+        for chunk in iter(lambda: self.doc.read(64 * 1024), b''):
+            sha256.update(chunk)
+        self.doc.seek(0)
+        return 'file:{}'.format(sha256.hexdigest())
@@ -1,12 +1,10 @@
 from readability.readability import Document
 import re
-import requests
-import tempfile
 from bs4 import BeautifulSoup
 
 from django.conf import settings
 
-from utils.common import write_file
+from utils.extractor.fetch import fetch_all
 
 
 def _replace_with_newlines(element):
@@ -32,16 +30,16 @@ def process(doc):
     html_body = Document(doc)
     summary = html_body.summary()
     title = html_body.short_title()
-    images = []
-
-    for img in html_body.reverse_tags(html_body.html, 'img'):
-        try:
-            fp = tempfile.NamedTemporaryFile(dir=settings.BASE_DIR)
-            r = requests.get(img.get('src'), stream=True)
-            write_file(r, fp)
-            images.append(fp)
-        except Exception:
-            pass
+
+    # Download all images concurrently
+    images = fetch_all(
+        [
+            img.get('src')
+            for img in html_body.reverse_tags(html_body.html, 'img')
+            if img.get('src')
+        ][:settings.EXTRACTOR_MAX_IMAGES],
+        max_size=settings.EXTRACTOR_MAX_IMAGE_SIZE,
+    )
 
     html = '<h1>' + title + '</h1>' + summary
 
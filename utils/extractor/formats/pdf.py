@@ -1,23 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from functools import partial
 from pdfminer.converter import TextConverter  # , HTMLConverter
 from pdfminer.layout import LAParams
-from pdfminer.pdfinterp import PDFResourceManager, process_pdf
-import tempfile
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfparser import PDFParser, PDFDocument
+import io
+import logging
+import os
+import time
 
+logger = logging.getLogger(__name__)
 
-def process(doc):
+
+def _get_pages(fp):
+    parser = PDFParser(fp)
+    document = PDFDocument()
+    parser.set_document(document)
+    document.set_parser(parser)
+    document.initialize('')
+    return document.get_pages()
+
+
+def iter_pages(fp, start=0, end=None, max_pages=None, timeout=None):
+    """
+    Yield text of each page of the pdf, from page start to end
+
+    Stops after max_pages pages or after timeout seconds.
+    """
+    outfp = io.StringIO()
+    rmgr = PDFResourceManager()
+    device = TextConverter(rmgr, outfp, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rmgr, device)
+
+    began = time.time()
+    count = 0
+    for page_number, page in enumerate(_get_pages(fp)):
+        if page_number < start:
+            continue
+        if end is not None and page_number >= end:
+            break
+        if max_pages and count >= max_pages:
+            logger.info('Pdf extraction stopped at page cap')
+            break
+        if timeout and time.time() - began > timeout:
+            logger.info('Pdf extraction stopped at time budget')
+            break
+
+        interpreter.process_page(page)
+        count += 1
+
+        yield outfp.getvalue()
+        outfp.seek(0)
+        outfp.truncate()
+
+
+def _process_range(path, timeout, start, end):
+    with open(path, 'rb') as fp:
+        return ''.join(iter_pages(fp, start, end, timeout=timeout))
+
+
+def process_parallel(path, processes, max_pages=None, timeout=None):
+    """
+    Extract text of the pdf at path, splitting its pages in ranges
+    extracted by separate processes
+    """
+    with open(path, 'rb') as fp:
+        page_count = sum(1 for _ in _get_pages(fp))
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    size = max(1, -(-page_count // processes))
+    starts = list(range(0, page_count, size))
+    ends = [min(start + size, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return ''.join(executor.map(
+            partial(_process_range, path, timeout), starts, ends,
+        ))
+
+
+def process(doc, progress=None):
+    """
+    Extract text of the pdf page by page
+
+    progress, if given, is called with the list of pages extracted so
+    far after each page.
+    """
     fp = doc
     fp.seek(0)
-    outfp = tempfile.TemporaryFile("w+", encoding='utf-8')
 
-    rmgr = PDFResourceManager()
-    params = LAParams()
-    device = TextConverter(rmgr, outfp, laparams=params)
-    process_pdf(rmgr, device, fp, None, 0)
+    max_pages = settings.EXTRACTOR_PDF_MAX_PAGES
+    timeout = settings.EXTRACTOR_PDF_TIMEOUT
+    processes = settings.EXTRACTOR_PDF_PROCESSES
 
-    fp.close()
+    path = getattr(fp, 'name', None)
+    if processes > 1 and not progress and \
+            isinstance(path, str) and os.path.isfile(path):
+        try:
+            content = process_parallel(path, processes, max_pages, timeout)
+            fp.close()
+            return content, None
+        except (AssertionError, OSError):
+            # Daemonic processes, like celery workers, can't have children
+            logger.warning('Parallel pdf extraction not possible')
+            fp.seek(0)
 
-    outfp.seek(0)
-    content = outfp.read()
-    outfp.close()
+    pages = []
+    for page in iter_pages(fp, max_pages=max_pages, timeout=timeout):
+        pages.append(page)
+        if progress:
+            progress(pages)
+
+    fp.close()
 
-    return content, None
+    return ''.join(pages), None
@@ -0,0 +1,23 @@
+from django.test import TestCase
+import requests
+
+from ..fetch import is_retryable
+
+
+def _http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response=response)
+
+
+class FetchTest(TestCase):
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(requests.exceptions.ConnectionError()))
+        self.assertTrue(is_retryable(requests.exceptions.ReadTimeout()))
+        self.assertTrue(is_retryable(_http_error(503)))
+        self.assertTrue(is_retryable(_http_error(429)))
+
+        # Other client errors fail fast
+        self.assertFalse(is_retryable(_http_error(404)))
+        self.assertFalse(is_retryable(_http_error(403)))
+        self.assertFalse(is_retryable(requests.exceptions.InvalidURL()))
@@ -53,3 +53,21 @@ class FileDocumentTest(TestCase):
         Test Pdf import
         """
         self.extract(PDF_FILE)
+
+    def test_pdf_progress(self):
+        """
+        Test Pdf import reports the pages extracted so far
+        """
+        page_counts = []
+
+        def progress(pages):
+            page_counts.append(len(pages))
+
+        with open(join(self.documents, PDF_FILE), 'rb') as file:
+            text, images = FileDocument(file, PDF_FILE).extract(
+                progress=progress,
+            )
+
+        self.assertTrue(text)
+        self.assertEqual(page_counts, list(range(1, len(page_counts) + 1)))
+        self.assertTrue(page_counts)
@@ -1,8 +1,10 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import io
 import requests
 import tempfile
 from django.conf import settings
 
-from utils.common import (write_file, DEFAULT_HEADERS)
+from . import fetch
 from .document import (
     Document,
     HTML, PDF, DOCX, PPTX,
@@ -22,39 +24,74 @@ class WebDocument(Document):
                   '.presentationml.presentation', ]
 
     def __init__(self, url):
-
-        type = HTML
-        doc = None
+        self.url = url
+        self.headers = {}
 
         try:
-            r = requests.head(url, headers=DEFAULT_HEADERS)
+            self.headers = fetch.head(url).headers
         except requests.exceptions.RequestException:
             # If we can't get header, assume html and try to continue.
-            r = requests.get(url, headers=DEFAULT_HEADERS)
-            doc = r.content
-            super().__init__(doc, type)
-            return
-
-        if not r.headers.get('content-type') or \
-                any(x in r.headers["content-type"] for x in self.HTML_TYPES):
-            r = requests.get(url, headers=DEFAULT_HEADERS)
-            doc = r.content
+            pass
+
+        # The document is downloaded only when extracting
+        super().__init__(None, HTML)
+
+    def get_cache_key(self):
+        """
+        Normalized url along with the ETag or Last-Modified header
+
+        None if the server gives neither, since then changes of the
+        document can't be detected.
+        """
+        validator = self.headers.get('etag') or \
+            self.headers.get('last-modified')
+        if not validator:
+            return None
+        return 'url:{}:{}'.format(normalize_url(self.url), validator)
+
+    def load(self):
+        type = HTML
+        content_type = self.headers.get('content-type')
+
+        if not content_type or \
+                any(x in content_type for x in self.HTML_TYPES):
+            fp = io.BytesIO()
+            fetch.fetch(self.url, fp)
+            doc = fp.getvalue()
         else:
             fp = tempfile.NamedTemporaryFile(dir=settings.BASE_DIR)
-            r = requests.get(url, stream=True, headers=DEFAULT_HEADERS)
-            write_file(r, fp)
+            r = fetch.fetch(self.url, fp)
+            content_type = r.headers.get('content-type') or content_type
 
             doc = fp
-            if any(x in r.headers["content-type"]
-                   for x in self.PDF_TYPES):
+            if any(x in content_type for x in self.PDF_TYPES):
                 type = PDF
 
-            elif any(x in r.headers["content-type"]
-                     for x in self.DOCX_TYPES):
+            elif any(x in content_type for x in self.DOCX_TYPES):
                 type = DOCX
 
-            elif any(x in r.headers["content-type"]
-                     for x in self.PPTX_TYPES):
+            elif any(x in content_type for x in self.PPTX_TYPES):
                 type = PPTX
 
-        super().__init__(doc, type)
+        self.doc = doc
+        self.type = type
+
+    def extract(self, progress=None):
+        if self.doc is None:
+            self.load()
+        return super().extract(progress=progress)
+
+
+def normalize_url(url):
+    """
+    Lowercase scheme and host, sort query parameters
+    and remove the fragment
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or '/',
+        urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True))),
+        '',
+    ))
@@ -22,4 +22,10 @@ subcription_channels = {
         'onEdited': ['leadId'],
         'onPreviewExtracted': ['leadId'],
     },
+    'exports': {
+        'onProgress': ['exportId'],
+    },
+    'projects': {
+        'onMembershipsUpdated': ['projectId'],
+    },
 }
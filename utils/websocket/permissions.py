@@ -6,6 +6,24 @@ def lead_permissions(user, event, request):
     return False
 
 
+def export_permissions(user, event, request):
+    from export.models import Export
+    return Export.objects.filter(
+        id=request.get('exportId'),
+        exported_by=user,
+    ).exists()
+
+
+def project_permissions(user, event, request):
+    from project.models import ProjectMembership
+    return ProjectMembership.objects.filter(
+        project_id=request.get('projectId'),
+        member=user,
+    ).exists()
+
+
 permissions = {
     'leads': lead_permissions,
+    'exports': export_permissions,
+    'projects': project_permissions,
 }